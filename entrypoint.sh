@@ -1,5 +1,10 @@
 #!/bin/sh
 
+# prometheus_client writes its samples here as soon as a metric is imported
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+  mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 echo "Waiting for postgres..."
 while ! nc -z db 5432; do
   sleep 0.5
@@ -8,6 +13,7 @@ done
 echo "Postgres is up — running migrations..."
 
 python manage.py migrate --noinput
+python manage.py manage_transaction_partitions
 python manage.py collectstatic --noinput
 
 # Create superuser if not exists
@@ -23,4 +29,15 @@ if not User.objects.filter(phone_number="09125129188").exists():
     user = User.objects.create(phone_number="09125129188", password="admin123", user_type=3)
 EOF
 
+# Load every wallet into Redis up front instead of lazily on first use
+if [ "$WALLET_WARM_CACHE" = "1" ]; then
+  python manage.py warm_wallet_cache --workers "${WALLET_WARM_WORKERS:-4}"
+fi
+
+# Samples of previous runs and of the commands above would be summed into /metrics
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+  rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+  mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 exec "$@"
\ No newline at end of file
@@ -0,0 +1,6 @@
+from prometheus_client import multiprocess
+
+
+def child_exit(server, worker):
+    # Drops the exited worker's live gauges (e.g. executor queue depth) from /metrics
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,115 @@
+import time
+import uuid
+import redis
+
+# Tokens are "<owner>|<deadline in ms, Redis clock>". A holder's token names
+# it and says when its hold runs out; a free token in the queue is
+# "free|<deadline>", so a waiter that moves it out with BLMOVE and dies before
+# claiming it still leaves a hold that can be recognised as stale.
+_NOW = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+"""
+
+# KEYS: queue, held   ARGV: owner, lock timeout in ms
+# Takes the lock unless someone holds it and their deadline hasn't passed:
+# the token may be waiting in the queue, never have existed, have idled out,
+# or belong to a holder that died or overran. Returns the new token, or false.
+_TRY_ACQUIRE_SCRIPT = _NOW + """
+local held = redis.call('LINDEX', KEYS[2], 0)
+if held then
+    local deadline = tonumber(string.match(held, '|(%d+)$'))
+    if deadline and deadline > now then
+        return false
+    end
+end
+local token = ARGV[1] .. '|' .. (now + tonumber(ARGV[2]))
+redis.call('DEL', KEYS[1], KEYS[2])
+redis.call('RPUSH', KEYS[2], token)
+redis.call('PEXPIRE', KEYS[2], ARGV[2])
+return token
+"""
+
+# KEYS: held   ARGV: token moved by BLMOVE, owner, lock timeout in ms
+# Stamps the moved token with the new owner and deadline, unless it was taken
+# over as stale in the meantime. Returns the new token, or false.
+_CLAIM_SCRIPT = _NOW + """
+if redis.call('LLEN', KEYS[1]) ~= 1 or redis.call('LINDEX', KEYS[1], 0) ~= ARGV[1] then
+    return false
+end
+local token = ARGV[2] .. '|' .. (now + tonumber(ARGV[3]))
+redis.call('LSET', KEYS[1], 0, token)
+redis.call('PEXPIRE', KEYS[1], ARGV[3])
+return token
+"""
+
+# KEYS: queue, held   ARGV: holder's token, idle expiry of the queued token in ms
+# Hands the token back if the caller still holds it; Redis passes it straight
+# to the longest-blocked waiter. A hold taken over after expiring is left alone.
+_RELEASE_SCRIPT = _NOW + """
+if redis.call('LINDEX', KEYS[2], 0) ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[2])
+redis.call('RPUSH', KEYS[1], 'free|' .. (now + tonumber(ARGV[2])))
+redis.call('PEXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+class FairRedisLock:
+    """Distributed lock that wakes waiters on release instead of polling.
+
+    The lock is a single token moving between ``{key}:queue`` and ``{key}:held``.
+    Waiters block in ``BLMOVE`` on the queue, and Redis serves blocked clients
+    in arrival order, so the lock is handed over FIFO as soon as it is released.
+    Every token carries the deadline of its hold, written in the same script
+    that takes it, so a holder that crashes at any point (even between
+    ``BLMOVE`` and claiming the token) can't wedge the wallet: after
+    ``lock_timeout`` the next waiter takes the lock over, re-checking every
+    ``recovery_interval``. Release only returns a token its caller still owns.
+    """
+
+    def __init__(self, redis_client: redis.Redis, lock_key: str, lock_timeout: int = 60,
+                 recovery_interval: float = 1.0):
+        self.redis = redis_client
+        self.lock_key = lock_key
+        self.queue_key = f"{lock_key}:queue"
+        self.held_key = f"{lock_key}:held"
+        self.lock_timeout = lock_timeout
+        self.recovery_interval = recovery_interval
+        self.owner = uuid.uuid4().hex
+        self.token = None
+        self._try_acquire = self.redis.register_script(_TRY_ACQUIRE_SCRIPT)
+        self._claim = self.redis.register_script(_CLAIM_SCRIPT)
+        self._release = self.redis.register_script(_RELEASE_SCRIPT)
+
+    @property
+    def timeout_ms(self) -> int:
+        return int(self.lock_timeout * 1000)
+
+    def acquire(self, timeout: float = 0) -> bool:
+        """Wait up to ``timeout`` seconds for the lock."""
+        deadline = time.monotonic() + timeout
+        while True:
+            token = self._try_acquire(keys=[self.queue_key, self.held_key], args=[self.owner, self.timeout_ms])
+            if token:
+                self.token = token
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            moved = self.redis.blmove(
+                self.queue_key, self.held_key, min(remaining, self.recovery_interval), "LEFT", "RIGHT"
+            )
+            if moved is not None:
+                token = self._claim(keys=[self.held_key], args=[moved, self.owner, self.timeout_ms])
+                if token:
+                    self.token = token
+                    return True
+
+    def release(self) -> None:
+        if self.token is None:
+            return
+        token, self.token = self.token, None
+        self._release(keys=[self.queue_key, self.held_key], args=[token, self.timeout_ms])
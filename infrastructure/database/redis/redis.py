@@ -1,4 +1,138 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+from django.conf import settings
 import redis
+import redis.asyncio
 
 
-redis_client = redis.Redis(host='redis', port=6379, db=0, decode_responses=True)
+class InstrumentedBlockingConnectionPool(redis.BlockingConnectionPool):
+    """Bounded pool that blocks for a free connection and records how busy it gets.
+
+    Callers wait up to ``timeout`` seconds once every connection is checked
+    out, then get ``ConnectionError("No connection available.")``. ``stats()``
+    reports current and peak usage plus how often callers had to wait or gave
+    up, which is what shows a pool that is too small for the load.
+    """
+
+    def reset(self):
+        super().reset()
+        self._stats_lock = threading.Lock()
+        self.peak_in_use = 0
+        self.checkouts = 0
+        self.waited = 0
+        self.exhausted = 0
+        self.wait_seconds = 0.0
+
+    def get_connection(self, *args, **kwargs):
+        started = time.monotonic()
+        must_wait = self.pool.empty()
+        try:
+            connection = super().get_connection(*args, **kwargs)
+        except redis.ConnectionError as e:
+            if str(e) == "No connection available.":
+                with self._stats_lock:
+                    self.exhausted += 1
+                    self.waited += 1
+                    self.wait_seconds += time.monotonic() - started
+            raise
+        in_use = self.max_connections - self.pool.qsize()
+        with self._stats_lock:
+            self.checkouts += 1
+            self.peak_in_use = max(self.peak_in_use, in_use)
+            if must_wait:
+                self.waited += 1
+                self.wait_seconds += time.monotonic() - started
+        return connection
+
+    def stats(self) -> dict:
+        in_use = self.max_connections - self.pool.qsize()
+        created = len(self._connections)
+        return {
+            "max_connections": self.max_connections,
+            "created": created,
+            "in_use": in_use,
+            "idle": max(created - in_use, 0),
+            "peak_in_use": self.peak_in_use,
+            "checkouts": self.checkouts,
+            "waited": self.waited,
+            "exhausted": self.exhausted,
+            "wait_seconds": round(self.wait_seconds, 6),
+        }
+
+
+_pools = {}
+
+
+def create_redis_client(name: str = "default", url: str = None) -> redis.Redis:
+    """Build a client on its own bounded pool configured from the ``REDIS_*`` settings."""
+    pool = InstrumentedBlockingConnectionPool.from_url(
+        url or settings.REDIS_URL,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        socket_keepalive=True,
+        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+        decode_responses=True,
+    )
+    _pools[name] = pool
+    return redis.Redis(connection_pool=pool)
+
+
+def pool_stats() -> dict:
+    """Utilization of every pool in this process, keyed by client name."""
+    return {name: pool.stats() for name, pool in _pools.items()}
+
+
+def _reset_pools_after_fork() -> None:
+    # Sockets inherited from the parent are shared with it, and a pool lock held
+    # by another parent thread at fork time would never be released here, so
+    # every pool starts over with fresh locks and no connections.
+    for pool in _pools.values():
+        pool._fork_lock = threading.RLock()
+        pool._lock = threading.RLock()
+        pool.reset()
+
+
+os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_redis_client(name: str = "default", url: str = None) -> redis.asyncio.Redis:
+    """``redis.asyncio`` client named ``name`` for the running event loop.
+
+    Async connections belong to the loop that opened them, so each loop (one
+    per uvicorn worker, or one per ``async_to_sync`` call under WSGI) gets its
+    own bounded pool.
+    """
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.setdefault(loop, {})
+    client = clients.get(name)
+    if client is None:
+        pool = redis.asyncio.BlockingConnectionPool.from_url(
+            url or settings.REDIS_URL,
+            max_connections=settings.REDIS_ASYNC_MAX_CONNECTIONS,
+            timeout=settings.REDIS_POOL_TIMEOUT,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+            socket_keepalive=True,
+            health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+            decode_responses=True,
+        )
+        client = clients[name] = redis.asyncio.Redis(connection_pool=pool)
+    return client
+
+
+def get_async_wallet_redis_client() -> redis.asyncio.Redis:
+    """Async counterpart of ``wallet_redis_client``."""
+    return get_async_redis_client("wallet", settings.WALLET_REDIS_URL)
+
+
+# Caches only (phone -> user lookups); entries may be evicted at any time
+redis_client = create_redis_client()
+# Balances, ledgers, locks, queues and event streams: never evicted, see configs/redis-wallet.conf
+wallet_redis_client = create_redis_client("wallet", settings.WALLET_REDIS_URL)
@@ -33,6 +33,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'utils.middleware.RequestProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'tabdeal_code_challenge.urls'
@@ -106,4 +107,72 @@ SPECTACULAR_SETTINGS = {
     'DESCRIPTION': 'Charge Sale Code Challenger',
     'VERSION': '1.0.0',
     'SERVE_INCLUDE_SCHEMA': False,
-}
\ No newline at end of file
+}
+
+
+# Wallet engine
+# With write-behind enabled charge sales commit in Redis only and publish to
+# WALLET_EVENT_STREAM; run `python manage.py flush_wallet_events` to persist them.
+WALLET_WRITE_BEHIND = os.environ.get("WALLET_WRITE_BEHIND", "0") == "1"
+WALLET_EVENT_STREAM = "wallet:events"
+WALLET_EVENT_GROUP = "wallet-ledger-writers"
+# Group commit batches concurrent sales from one seller into a single Redis
+# reservation and DB transaction, waiting at most the window (seconds) or max batch
+WALLET_GROUP_COMMIT = os.environ.get("WALLET_GROUP_COMMIT", "0") == "1"
+WALLET_GROUP_COMMIT_WINDOW = float(os.environ.get("WALLET_GROUP_COMMIT_WINDOW", "0.002"))
+WALLET_GROUP_COMMIT_MAX_BATCH = int(os.environ.get("WALLET_GROUP_COMMIT_MAX_BATCH", "100"))
+# Total time a request may wait, across both wallets, for the Redis wallet locks
+WALLET_LOCK_WAIT_BUDGET = float(os.environ.get("WALLET_LOCK_WAIT_BUDGET", "4.0"))
+# With async submission the charge-sale POST only queues the sale (202, PENDING)
+# and `python manage.py run_charge_sale_workers` executes it
+WALLET_ASYNC_SUBMISSION = os.environ.get("WALLET_ASYNC_SUBMISSION", "0") == "1"
+WALLET_CHARGE_SALE_QUEUE = "wallet:charge_sales"
+# Redis keeps only a recent window of each user's ledger; `python manage.py
+# compact_wallet_ledgers` drops older entries once they are durable in Postgres
+WALLET_LEDGER_MAX_ENTRIES = int(os.environ.get("WALLET_LEDGER_MAX_ENTRIES", "1000"))
+WALLET_LEDGER_MAX_AGE = int(os.environ.get("WALLET_LEDGER_MAX_AGE", str(7 * 24 * 3600)))
+
+# Request profiler: share of requests profiled, and a token that profiles any
+# request sending it as X-Profile-Token (empty disables it). Profiles keep
+# the PROFILER_RETENTION slowest per endpoint for PROFILER_TTL seconds.
+PROFILER_SAMPLE_RATE = float(os.environ.get("PROFILER_SAMPLE_RATE", "0"))
+PROFILER_TOKEN = os.environ.get("PROFILER_TOKEN", "")
+PROFILER_INTERVAL = float(os.environ.get("PROFILER_INTERVAL", "0.005"))
+PROFILER_RETENTION = int(os.environ.get("PROFILER_RETENTION", "50"))
+PROFILER_TTL = int(os.environ.get("PROFILER_TTL", str(24 * 3600)))
+
+# Phase-level tracing of charge sales and credit approvals (wallet.services.tracing).
+# Traces are sampled at WALLET_TRACE_SAMPLE_RATE and exported only when they took at
+# least WALLET_TRACE_SLOW_MS or failed: to an OTLP/HTTP collector if
+# WALLET_TRACE_OTLP_ENDPOINT is set, otherwise as OTLP/JSON lines to WALLET_TRACE_FILE
+WALLET_TRACING = os.environ.get("WALLET_TRACING", "0") == "1"
+WALLET_TRACE_SAMPLE_RATE = float(os.environ.get("WALLET_TRACE_SAMPLE_RATE", "1.0"))
+WALLET_TRACE_SLOW_MS = float(os.environ.get("WALLET_TRACE_SLOW_MS", "0"))
+WALLET_TRACE_FILE = os.environ.get("WALLET_TRACE_FILE", "/tmp/wallet-traces.jsonl")
+WALLET_TRACE_OTLP_ENDPOINT = os.environ.get("WALLET_TRACE_OTLP_ENDPOINT", "")
+
+# Redis
+REDIS_URL = os.environ.get("REDIS_URL", "redis://redis:6379/0")
+# Wallet state (balances, ledgers, locks, queues, event streams) must never be
+# evicted, so it lives on its own noeviction instance; REDIS_URL only holds caches.
+WALLET_REDIS_URL = os.environ.get("WALLET_REDIS_URL", REDIS_URL)
+# Every process (gunicorn worker) gets its own bounded pool. It must cover the
+# worker's request threads plus the WalletService executor (MAX_THREADS), each
+# of which holds one connection at a time, including while blocked on a lock.
+GUNICORN_THREADS = int(os.environ.get("GUNICORN_THREADS", "1"))
+REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", str(GUNICORN_THREADS + 10 + 4)))
+# Seconds to wait for a free pooled connection before failing the command
+REDIS_POOL_TIMEOUT = float(os.environ.get("REDIS_POOL_TIMEOUT", "2.0"))
+# Must stay above the longest blocking command (lock BLMOVE, stream XREADGROUP)
+REDIS_SOCKET_TIMEOUT = float(os.environ.get("REDIS_SOCKET_TIMEOUT", "5.0"))
+REDIS_SOCKET_CONNECT_TIMEOUT = float(os.environ.get("REDIS_SOCKET_CONNECT_TIMEOUT", "2.0"))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.environ.get("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+# Async views share one pool per event loop; a connection is only held while a
+# command is in flight, so far fewer connections than in-flight requests are needed
+REDIS_ASYNC_MAX_CONNECTIONS = int(os.environ.get("REDIS_ASYNC_MAX_CONNECTIONS", "100"))
+
+# Phone number -> user cache: entries per process, in-process TTL (it can't be
+# invalidated from other processes) and the Redis TTL (seconds)
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", "10000"))
+USER_CACHE_LOCAL_TTL = float(os.environ.get("USER_CACHE_LOCAL_TTL", "30"))
+USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", "3600"))
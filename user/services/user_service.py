@@ -1,13 +1,136 @@
-from typing import Optional
+from collections import OrderedDict
+import threading
+import time
+from typing import NamedTuple, Optional
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.http import Http404
 from django.db import transaction
 from django.contrib.auth import get_user_model
+from infrastructure.database.redis.redis import get_async_redis_client, redis_client
 from user.enums import UserTypeEnums
 from rest_framework.generics import get_object_or_404
 
 User = get_user_model()
 
 
+class CachedUser(NamedTuple):
+    id: int
+    phone_number: str
+    user_type: int
+    is_active: bool
+
+    def as_user(self) -> User:
+        """A ``User`` with only these fields loaded; anything else is fetched on first access."""
+        # from_db expects the values in model field order
+        loaded = self._asdict()
+        names = [field.attname for field in User._meta.concrete_fields if field.attname in loaded]
+        return User.from_db("default", names, [loaded[name] for name in names])
+
+
+class PhoneUserCache:
+    """Phone number -> ``CachedUser`` lookups kept in a per-process LRU in front of Redis.
+
+    Redis (``user:phone:{phone}``) is shared by every worker and is cleared on
+    invalidation. The in-process entries can't be cleared from other
+    processes, so they only live for ``local_ttl`` seconds.
+    """
+
+    def __init__(self, max_size: int = 10000, local_ttl: float = 30, redis_ttl: int = 3600):
+        self.redis_client = redis_client
+        self.max_size = max_size
+        self.local_ttl = local_ttl
+        self.redis_ttl = redis_ttl
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(phone_number: str) -> str:
+        return f"user:phone:{phone_number}"
+
+    def get(self, phone_number: str) -> Optional[CachedUser]:
+        cached = self._get_local(phone_number)
+        if cached is None:
+            cached = self._decode(phone_number, self.redis_client.hgetall(self.key(phone_number)))
+            if cached is not None:
+                self._set_local(cached)
+        return cached
+
+    async def aget(self, phone_number: str) -> Optional[CachedUser]:
+        cached = self._get_local(phone_number)
+        if cached is None:
+            cached = self._decode(phone_number, await get_async_redis_client().hgetall(self.key(phone_number)))
+            if cached is not None:
+                self._set_local(cached)
+        return cached
+
+    def set_many(self, users: list[CachedUser]) -> None:
+        with self.redis_client.pipeline(transaction=False) as pipe:
+            for cached in users:
+                self._set_local(cached)
+                pipe.hset(self.key(cached.phone_number), mapping=self._encode(cached))
+                pipe.expire(self.key(cached.phone_number), self.redis_ttl)
+            pipe.execute()
+
+    async def aset(self, cached: CachedUser) -> None:
+        self._set_local(cached)
+        async with get_async_redis_client().pipeline(transaction=False) as pipe:
+            pipe.hset(self.key(cached.phone_number), mapping=self._encode(cached))
+            pipe.expire(self.key(cached.phone_number), self.redis_ttl)
+            await pipe.execute()
+
+    def invalidate(self, *phone_numbers: str) -> None:
+        with self._lock:
+            for phone_number in phone_numbers:
+                self._local.pop(phone_number, None)
+        self.redis_client.delete(*[self.key(phone_number) for phone_number in phone_numbers])
+
+    def clear_local(self) -> None:
+        with self._lock:
+            self._local.clear()
+
+    def _get_local(self, phone_number: str) -> Optional[CachedUser]:
+        with self._lock:
+            entry = self._local.get(phone_number)
+            if entry is None:
+                return None
+            cached, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._local[phone_number]
+                return None
+            self._local.move_to_end(phone_number)
+            return cached
+
+    def _set_local(self, cached: CachedUser) -> None:
+        with self._lock:
+            self._local[cached.phone_number] = (cached, time.monotonic() + self.local_ttl)
+            self._local.move_to_end(cached.phone_number)
+            while len(self._local) > self.max_size:
+                self._local.popitem(last=False)
+
+    @staticmethod
+    def _encode(cached: CachedUser) -> dict:
+        return {"id": cached.id, "user_type": cached.user_type, "is_active": int(cached.is_active)}
+
+    @staticmethod
+    def _decode(phone_number: str, fields: dict) -> Optional[CachedUser]:
+        if not fields:
+            return None
+        return CachedUser(int(fields["id"]), phone_number, int(fields["user_type"]), fields["is_active"] == "1")
+
+
+user_cache = PhoneUserCache(
+    max_size=settings.USER_CACHE_SIZE,
+    local_ttl=settings.USER_CACHE_LOCAL_TTL,
+    redis_ttl=settings.USER_CACHE_TTL,
+)
+
+
+def _cached_user(user: User) -> CachedUser:
+    return CachedUser(user.id, user.phone_number, user.user_type, user.is_active)
+
+
 class UserService:
     """Service class for handling user-related operations"""
 
@@ -28,11 +151,74 @@ class UserService:
 
     @staticmethod
     def get_user_by_phone(phone_number: str) -> Optional[User]:
-        return get_object_or_404(User, phone_number=phone_number)
+        cached = user_cache.get(phone_number)
+        if cached is None:
+            user = get_object_or_404(User, phone_number=phone_number)
+            cached = _cached_user(user)
+            user_cache.set_many([cached])
+        return cached.as_user()
+
+    @staticmethod
+    async def aget_user_by_phone(phone_number: str) -> User:
+        cached = await user_cache.aget(phone_number)
+        if cached is None:
+            try:
+                user = await User.objects.aget(phone_number=phone_number)
+            except User.DoesNotExist:
+                raise Http404("No User matches the given query.")
+            cached = _cached_user(user)
+            await user_cache.aset(cached)
+        return cached.as_user()
+
+    @staticmethod
+    def get_or_create_receiver(phone_number: str) -> User:
+        return UserService.get_or_create_receivers([phone_number])[phone_number]
+
+    @staticmethod
+    def get_or_create_receivers(phone_numbers: list[str]) -> dict:
+        """Resolve receivers by phone number, keyed by it, provisioning missing ones as plain users.
+
+        Cache misses cost one ``INSERT ... ON CONFLICT DO NOTHING`` and one
+        ``SELECT`` of the same phone numbers, however many there are.
+        """
+        receivers = {}
+        missing = []
+        for phone_number in dict.fromkeys(phone_numbers):
+            cached = user_cache.get(phone_number)
+            if cached is None:
+                missing.append(phone_number)
+            else:
+                receivers[phone_number] = cached
+        if missing:
+            resolved = UserService._insert_receivers(missing)
+            user_cache.set_many(resolved)
+            receivers.update({cached.phone_number: cached for cached in resolved})
+        return {phone_number: cached.as_user() for phone_number, cached in receivers.items()}
+
+    @staticmethod
+    def _insert_receivers(phone_numbers: list[str]) -> list[CachedUser]:
+        # DO NOTHING leaves existing rows untouched (no row locks, no new tuple
+        # versions), so they are read back along with the new ones
+        User.objects.bulk_create(
+            [User(phone_number=phone_number, password="", user_type=UserTypeEnums.USER) for phone_number in phone_numbers],
+            ignore_conflicts=True,
+        )
+        return [
+            CachedUser(*row) for row in User.objects.filter(phone_number__in=phone_numbers)
+            .values_list("id", "phone_number", "user_type", "is_active")
+        ]
+
+    @staticmethod
+    async def aget_or_create_receiver(phone_number: str) -> User:
+        cached = await user_cache.aget(phone_number)
+        if cached is not None:
+            return cached.as_user()
+        return await sync_to_async(UserService.get_or_create_receiver)(phone_number)
 
     @staticmethod
     @transaction.atomic
     def update_user(user: User, **kwargs) -> User:
+        old_phone_number = user.phone_number
         for field, value in kwargs.items():
             if field == 'password':
                 user.set_password(value)
@@ -41,11 +227,14 @@ class UserService:
                 
         user.full_clean()
         user.save()
+        transaction.on_commit(lambda: user_cache.invalidate(old_phone_number, user.phone_number))
         return user
 
     @staticmethod
     def delete_user(user: User) -> None:
+        phone_number = user.phone_number
         user.delete()
+        transaction.on_commit(lambda: user_cache.invalidate(phone_number))
 
     @staticmethod
     def get_users_by_type(user_type: int) -> list[User]:
@@ -56,7 +245,8 @@ class UserService:
 
     @staticmethod
     def authenticate_user(phone_number: str, password: str) -> Optional[User]:
-        user = UserService.get_user_by_phone(phone_number)
+        # Needs the password hash, so always read the full row
+        user = get_object_or_404(User, phone_number=phone_number)
         if user and user.check_password(password):
             return user
         return None
\ No newline at end of file
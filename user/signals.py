@@ -0,0 +1,18 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from user.services.user_service import user_cache
+
+User = get_user_model()
+
+CACHED_FIELDS = {"phone_number", "user_type", "is_active"}
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, update_fields=None, **kwargs):
+    # Saves that only touch other fields (e.g. last_login) leave the cached record valid
+    if update_fields and not CACHED_FIELDS & set(update_fields):
+        return
+    phone_number = instance.phone_number
+    transaction.on_commit(lambda: user_cache.invalidate(phone_number))
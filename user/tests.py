@@ -1,3 +1,53 @@
 from django.test import TestCase
 
 # Create your tests here.
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.db import connection
+from infrastructure.database.redis.redis import redis_client
+from user.enums import UserTypeEnums
+from user.services.user_service import UserService, user_cache
+
+User = get_user_model()
+
+
+class PhoneUserCacheTest(TransactionTestCase):
+    def setUp(self):
+        redis_client.flushall()
+        user_cache.clear_local()
+        self.user = User.objects.create(phone_number="09120000001", password="132456789", user_type=UserTypeEnums.ADMIN)
+
+    def test_lookup_is_served_from_cache(self):
+        UserService.get_user_by_phone(self.user.phone_number)
+        with self.assertNumQueries(0):
+            user = UserService.get_user_by_phone(self.user.phone_number)
+        self.assertEqual(user.id, self.user.id)
+        self.assertEqual(user.user_type, UserTypeEnums.ADMIN)
+
+    def test_update_invalidates_cache(self):
+        UserService.get_user_by_phone(self.user.phone_number)
+        UserService.update_user(self.user, user_type=UserTypeEnums.USER)
+        self.assertEqual(redis_client.exists(user_cache.key(self.user.phone_number)), 0)
+        self.assertEqual(UserService.get_user_by_phone(self.user.phone_number).user_type, UserTypeEnums.USER)
+
+    def test_get_or_create_receivers_keeps_existing_users(self):
+        receivers = UserService.get_or_create_receivers([self.user.phone_number, "09120000002"])
+        self.assertEqual(receivers[self.user.phone_number].id, self.user.id)
+        self.assertEqual(receivers[self.user.phone_number].user_type, UserTypeEnums.ADMIN)
+        created = User.objects.get(phone_number="09120000002")
+        self.assertEqual(receivers["09120000002"].id, created.id)
+        self.assertEqual(created.user_type, UserTypeEnums.USER)
+
+    def test_get_or_create_receivers_leaves_existing_rows_alone(self):
+        updated_at = self.user.updated_at
+        with CaptureQueriesContext(connection) as queries:
+            UserService.get_or_create_receivers([self.user.phone_number, "09120000002", "09120000003"])
+        # bulk_create runs its INSERT in its own transaction
+        statements = [query["sql"] for query in queries.captured_queries if query["sql"] not in ("BEGIN", "COMMIT")]
+        self.assertEqual(len(statements), 2, statements)
+        self.assertIn("ON CONFLICT DO NOTHING", statements[0])
+        self.assertTrue(statements[1].startswith("SELECT"))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.updated_at, updated_at)
+        self.assertEqual(User.objects.filter(phone_number__in=["09120000002", "09120000003"]).count(), 2)
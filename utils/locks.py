@@ -0,0 +1,37 @@
+import threading
+import time
+from typing import Hashable, Iterable, Optional
+
+
+class StripedLock:
+    """Fixed-size table of locks that keys are hashed onto.
+
+    Memory stays constant no matter how many distinct keys are locked. Several
+    keys are always acquired in ascending stripe order, so two callers locking
+    overlapping key sets can't deadlock.
+    """
+
+    def __init__(self, stripes: int = 1024):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def stripes_for(self, keys: Iterable[Hashable]) -> list[int]:
+        return sorted({hash(key) % len(self._locks) for key in keys})
+
+    def acquire(self, keys: Iterable[Hashable], timeout: float = -1) -> Optional[list[int]]:
+        """Acquire the stripes covering ``keys``; returns them, or None if ``timeout`` ran out."""
+        deadline = None if timeout < 0 else time.monotonic() + timeout
+        acquired = []
+        for stripe in self.stripes_for(keys):
+            remaining = -1 if deadline is None else max(deadline - time.monotonic(), 0)
+            if not self._locks[stripe].acquire(timeout=remaining):
+                self.release(acquired)
+                return None
+            acquired.append(stripe)
+        return acquired
+
+    def release(self, stripes: list[int]) -> None:
+        for stripe in reversed(stripes):
+            self._locks[stripe].release()
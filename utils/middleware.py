@@ -0,0 +1,171 @@
+import hmac
+import json
+import logging
+import random
+import sys
+import time
+import uuid
+from typing import Optional
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from infrastructure.database.redis.redis import redis_client
+from utils.profiling import SamplingProfiler
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileStore:
+    """Request profiles kept in the cache Redis.
+
+    Each profile is a JSON blob expiring after ``ttl`` seconds. Per endpoint a
+    sorted set scored by duration indexes them, capped at the ``retention``
+    slowest, so storage stays bounded however many requests are sampled.
+    """
+
+    ENDPOINTS_KEY = "profiles:endpoints"
+
+    def __init__(self, retention: int = 50, ttl: int = 86400):
+        self.redis_client = redis_client
+        self.retention = retention
+        self.ttl = ttl
+
+    @staticmethod
+    def key(profile_id: str) -> str:
+        return f"profile:{profile_id}"
+
+    @staticmethod
+    def endpoint_key(endpoint: str) -> str:
+        return f"profiles:endpoint:{endpoint}"
+
+    def save(self, profile: dict) -> None:
+        endpoint_key = self.endpoint_key(profile["endpoint"])
+        with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.set(self.key(profile["id"]), json.dumps(profile), ex=self.ttl)
+            pipe.zadd(endpoint_key, {profile["id"]: profile["duration_ms"]})
+            # Keep the slowest: drop the fastest beyond the cap
+            pipe.zremrangebyrank(endpoint_key, 0, -self.retention - 1)
+            pipe.expire(endpoint_key, self.ttl)
+            pipe.sadd(self.ENDPOINTS_KEY, profile["endpoint"])
+            pipe.expire(self.ENDPOINTS_KEY, self.ttl)
+            pipe.execute()
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        raw = self.redis_client.get(self.key(profile_id))
+        return json.loads(raw) if raw else None
+
+    def slowest(self, endpoint: Optional[str] = None, limit: int = 10) -> dict:
+        """``{endpoint: [profile summary, ...]}``, slowest first; expired profiles are pruned."""
+        endpoints = [endpoint] if endpoint else sorted(self.redis_client.smembers(self.ENDPOINTS_KEY))
+        result = {}
+        for name in endpoints:
+            profile_ids = self.redis_client.zrevrange(self.endpoint_key(name), 0, limit - 1)
+            if not profile_ids:
+                continue
+            profiles = self.redis_client.mget([self.key(profile_id) for profile_id in profile_ids])
+            expired = [profile_id for profile_id, raw in zip(profile_ids, profiles) if raw is None]
+            if expired:
+                self.redis_client.zrem(self.endpoint_key(name), *expired)
+            result[name] = [
+                {key: profile[key] for key in ("id", "method", "path", "status", "duration_ms", "started_at", "reason")}
+                for profile in (json.loads(raw) for raw in profiles if raw)
+            ]
+        return result
+
+
+class RequestProfilerMiddleware:
+    """Profiles a sample of requests with ``SamplingProfiler``.
+
+    A request is profiled with probability ``PROFILER_SAMPLE_RATE``, or when
+    it carries ``X-Profile-Token`` equal to ``PROFILER_TOKEN``; such a
+    response gets an ``X-Profile-Id`` header naming its profile. Work the
+    request hands to ``WalletService.executor`` is followed onto the executor
+    thread. Profiles are listed by ``GET /api/wallet/admin/profiles``.
+
+    The middleware runs in whichever mode the chain below it does, so async
+    views stay on the event loop. There the loop thread is sampled only while
+    the profiled request's task runs, keeping other requests out of its stacks.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    HEADER = "HTTP_X_PROFILE_TOKEN"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILER_SAMPLE_RATE
+        self.token = settings.PROFILER_TOKEN
+        self.interval = settings.PROFILER_INTERVAL
+        self.store = ProfileStore(retention=settings.PROFILER_RETENTION, ttl=settings.PROFILER_TTL)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _reason(self, request) -> Optional[str]:
+        header = request.META.get(self.HEADER)
+        if header and self.token and hmac.compare_digest(header, self.token):
+            return "header"
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        reason = self._reason(request)
+        if reason is None:
+            return self.get_response(request)
+
+        profiler = SamplingProfiler(interval=self.interval)
+        started_at = time.time()
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+        return self._finish(request, response, profiler, reason, started_at, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        reason = self._reason(request)
+        if reason is None:
+            return await self.get_response(request)
+
+        profiler = SamplingProfiler(interval=self.interval)
+        started_at = time.time()
+        started = time.perf_counter()
+        # This coroutine's frame is on the loop thread's stack only while its task runs
+        profiler.start(root=sys._getframe())
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiler.stop()
+        duration = time.perf_counter() - started
+        return await sync_to_async(self._finish, thread_sensitive=False)(
+            request, response, profiler, reason, started_at, duration
+        )
+
+    def _finish(self, request, response, profiler: SamplingProfiler, reason: str, started_at: float, duration: float):
+        match = request.resolver_match
+        profile = {
+            "id": str(uuid.uuid4()),
+            "endpoint": match.url_name or match.route if match else request.path,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": round(duration * 1000, 3),
+            "started_at": started_at,
+            "reason": reason,
+            "interval_ms": self.interval * 1000,
+            "samples": profiler.samples,
+            "top": profiler.top_functions(),
+            "stacks": dict(profiler.stacks.most_common(500)),
+        }
+        try:
+            self.store.save(profile)
+        except Exception as e:
+            # Never fail the request over its profile
+            logger.warning(f"Could not store request profile: {str(e)}")
+            return response
+        if reason == "header":
+            response["X-Profile-Id"] = profile["id"]
+        return response
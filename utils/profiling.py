@@ -0,0 +1,113 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+import sys
+import threading
+from typing import Optional
+
+_active_profile: ContextVar[Optional["SamplingProfiler"]] = ContextVar("active_profile", default=None)
+
+
+class SamplingProfiler:
+    """Statistical profiler for one request.
+
+    A daemon thread snapshots the stacks of the followed threads every
+    ``interval`` seconds and counts them as collapsed stacks
+    (``outer;...;inner``, the flame graph input format). It starts with the
+    calling thread; work handed to other threads follows the profile through
+    ``follow_current_thread``. Overhead is one stack walk per followed thread
+    per interval, independent of how many calls the request makes.
+
+    On an event loop thread, which interleaves many requests, ``start`` takes
+    the coroutine frame the request runs under; that thread is then sampled
+    only while the frame is on its stack, i.e. while this request's task runs.
+    """
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 128):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self._threads = set()
+        self._roots = {}
+        self._threads_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+        self._token = None
+
+    def start(self, root=None) -> None:
+        self._threads.add(threading.get_ident())
+        if root is not None:
+            self._roots[threading.get_ident()] = root
+        self._token = _active_profile.set(self)
+        self._sampler = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._sampler.join()
+        _active_profile.reset(self._token)
+
+    def follow(self, thread_id: int) -> None:
+        with self._threads_lock:
+            self._threads.add(thread_id)
+
+    def unfollow(self, thread_id: int) -> None:
+        with self._threads_lock:
+            self._threads.discard(thread_id)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            with self._threads_lock:
+                threads = list(self._threads)
+            frames = sys._current_frames()
+            for thread_id in threads:
+                frame = frames.get(thread_id)
+                if frame is not None and self._runs(frame, self._roots.get(thread_id)):
+                    self.stacks[self._collapse(frame)] += 1
+            self.samples += 1
+
+    @staticmethod
+    def _runs(frame, root) -> bool:
+        """Whether ``root`` (if any) is on the stack ending at ``frame``."""
+        while root is not None and frame is not None:
+            if frame is root:
+                return True
+            frame = frame.f_back
+        return root is None
+
+    def _collapse(self, frame) -> str:
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            names.append(f"{frame.f_globals.get('__name__', frame.f_code.co_filename)}:{frame.f_code.co_name}")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def top_functions(self, limit: int = 20) -> list[dict]:
+        """Functions by samples spent anywhere below them (total) and in them (self)."""
+        total = Counter()
+        own = Counter()
+        for stack, count in self.stacks.items():
+            functions = stack.split(";")
+            own[functions[-1]] += count
+            for function in set(functions):
+                total[function] += count
+        return [
+            {"function": function, "total": count, "self": own[function]}
+            for function, count in total.most_common(limit)
+        ]
+
+
+@contextmanager
+def follow_current_thread():
+    """Include the current thread in the profile of the context it runs in, if any."""
+    profiler = _active_profile.get()
+    if profiler is None:
+        yield
+        return
+    thread_id = threading.get_ident()
+    profiler.follow(thread_id)
+    try:
+        yield
+    finally:
+        profiler.unfollow(thread_id)
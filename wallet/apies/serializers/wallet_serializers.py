@@ -1,5 +1,7 @@
+from datetime import timedelta
 from decimal import Decimal
 from rest_framework import serializers
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from wallet.enums import CreditRequestStatusEnums
 from wallet.models import CreditRequest
@@ -16,6 +18,22 @@ class CreateChargeSaleSerializer(serializers.Serializer):
     amount = serializers.DecimalField(min_value=Decimal("1000"), max_digits=15, decimal_places=2)
 
 
+class ChargeSaleItemSerializer(serializers.Serializer):
+    receiver_phone_number = serializers.CharField(max_length=11, min_length=11)
+    amount = serializers.DecimalField(min_value=Decimal("1000"), max_digits=15, decimal_places=2)
+
+
+class CreateChargeSaleBulkSerializer(serializers.Serializer):
+    seller_phone_number = serializers.CharField(max_length=11, min_length=11)
+    items = ChargeSaleItemSerializer(many=True, allow_empty=False, max_length=5000)
+
+
+class TransactionHistoryQuerySerializer(serializers.Serializer):
+    phone_number = serializers.CharField(max_length=11, min_length=11)
+    limit = serializers.IntegerField(min_value=1, max_value=500, default=50)
+    offset = serializers.IntegerField(min_value=0, max_value=10000, default=0)
+
+
 class ProcessCreditRequestSerializer(serializers.ModelSerializer):
     status = serializers.IntegerField(help_text="1=WAITING, 2=ACCEPTED, 3=REJECTED")
     credit_id = serializers.IntegerField(min_value=1)
@@ -28,3 +46,51 @@ class ProcessCreditRequestSerializer(serializers.ModelSerializer):
             "credit_id",
             "phone_number",
         )
+
+
+class ProcessCreditRequestBulkSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(
+        choices=[CreditRequestStatusEnums.ACCEPTED.value, CreditRequestStatusEnums.REJECTED.value],
+        help_text="1=ACCEPTED, 2=REJECTED",
+    )
+    credit_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=5000)
+    phone_number = serializers.CharField(max_length=11, min_length=11)
+
+
+class PendingCreditRequestQuerySerializer(serializers.Serializer):
+    phone_number = serializers.CharField(max_length=11, min_length=11)
+    user_phone_number = serializers.CharField(max_length=11, min_length=11, required=False)
+    min_amount = serializers.DecimalField(max_digits=15, decimal_places=2, required=False)
+    max_amount = serializers.DecimalField(max_digits=15, decimal_places=2, required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=500, default=50)
+    cursor = serializers.CharField(required=False, help_text="next_cursor of the previous page")
+
+
+
+class ProfileQuerySerializer(serializers.Serializer):
+    phone_number = serializers.CharField(max_length=11, min_length=11)
+    endpoint = serializers.CharField(required=False, help_text="URL name, e.g. 'charge sale'")
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
+
+class ProfileDetailQuerySerializer(serializers.Serializer):
+    phone_number = serializers.CharField(max_length=11, min_length=11)
+
+
+class SalesReportQuerySerializer(serializers.Serializer):
+    phone_number = serializers.CharField(max_length=11, min_length=11)
+    start = serializers.DateField(required=False, help_text="First day (UTC), default 29 days before end")
+    end = serializers.DateField(required=False, help_text="Last day (UTC), default today")
+
+    MAX_DAYS = 366
+
+    def validate(self, attrs):
+        end = attrs.get('end') or timezone.now().date()
+        start = attrs.get('start') or end - timedelta(days=29)
+        if start > end:
+            raise serializers.ValidationError(_("start must not be after end"))
+        if (end - start).days >= self.MAX_DAYS:
+            raise serializers.ValidationError(_("At most %(days)s days per report") % {"days": self.MAX_DAYS})
+        attrs['start'] = start
+        attrs['end'] = end
+        return attrs
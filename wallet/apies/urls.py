@@ -1,8 +1,22 @@
 from django.urls import path
-from wallet.apies.views.wallet_views import CreateChargeSale, CreateCreditRequest, ProccessCreditRequest
+from wallet.apies.views.async_wallet_views import AsyncCreateChargeSale, AsyncCreateCreditRequest, AsyncProccessCreditRequest
+from wallet.apies.views.profiling_views import RequestProfileDetail, RequestProfiles
+from wallet.apies.views.wallet_views import ChargeSaleStatus, CreateChargeSale, CreateChargeSaleBulk, CreateCreditRequest, PendingCreditRequests, ProccessCreditRequest, ProccessCreditRequestBulk, SalesReport, SellerSalesReport, TransactionHistory
 
 urlpatterns = [
     path("credit_request", CreateCreditRequest.as_view(), name="credit_request"),
     path("charge_sale", CreateChargeSale.as_view(), name="charge sale"),
-    path("admin/process_credit_request", ProccessCreditRequest.as_view(), name="process credit request")
+    path("charge_sale/bulk", CreateChargeSaleBulk.as_view(), name="charge sale bulk"),
+    path("charge_sale/<uuid:charge_sale_id>/status", ChargeSaleStatus.as_view(), name="charge sale status"),
+    path("transactions", TransactionHistory.as_view(), name="transaction history"),
+    path("reports/sales", SellerSalesReport.as_view(), name="seller sales report"),
+    path("admin/process_credit_request", ProccessCreditRequest.as_view(), name="process credit request"),
+    path("admin/credit_requests/pending", PendingCreditRequests.as_view(), name="pending credit requests"),
+    path("admin/process_credit_request/bulk", ProccessCreditRequestBulk.as_view(), name="process credit request bulk"),
+    path("admin/reports/sales", SalesReport.as_view(), name="sales report"),
+    path("admin/profiles", RequestProfiles.as_view(), name="request profiles"),
+    path("admin/profiles/<uuid:profile_id>", RequestProfileDetail.as_view(), name="request profile detail"),
+    path("async/credit_request", AsyncCreateCreditRequest.as_view(), name="async credit_request"),
+    path("async/charge_sale", AsyncCreateChargeSale.as_view(), name="async charge sale"),
+    path("async/admin/process_credit_request", AsyncProccessCreditRequest.as_view(), name="async process credit request"),
 ]
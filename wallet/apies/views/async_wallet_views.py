@@ -0,0 +1,85 @@
+import json
+from django.http import Http404, JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import APIException, ParseError, PermissionDenied
+from user.enums import UserTypeEnums
+from user.services.user_service import UserService
+from wallet.apies.serializers.wallet_serializers import CreateChargeSaleSerializer, CreateCreditRequestSerializer, ProcessCreditRequestSerializer
+from wallet.enums import CreditRequestStatusEnums
+from wallet.services.async_wallet_service import AsyncWalletService
+
+user_service = UserService()
+wallet_service = AsyncWalletService()
+
+
+class AsyncAPIView(View):
+    """Minimal async stand-in for ``APIView``: JSON in, JSON out, DRF-style errors.
+
+    DRF views are sync only, so these run as native Django async views and
+    keep the same serializers, payloads and error bodies as the sync API.
+    """
+
+    http_method_names = ["post"]
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as e:
+            return JsonResponse(e.detail, status=e.status_code, safe=False)
+        except Http404:
+            return JsonResponse({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    @staticmethod
+    def parse_body(request) -> dict:
+        try:
+            return json.loads(request.body or b"{}")
+        except ValueError as e:
+            raise ParseError(f"JSON parse error - {e}")
+
+
+class AsyncCreateCreditRequest(AsyncAPIView):
+    async def post(self, request, *args, **kwargs):
+        serializer = CreateCreditRequestSerializer(data=self.parse_body(request))
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        user = await user_service.aget_user_by_phone(data['seller_phone_number'])
+        credit_request = await wallet_service.create_credit_request(user, data['amount'])
+        return JsonResponse(status=status.HTTP_201_CREATED, data={"code": credit_request.id})
+
+
+class AsyncProccessCreditRequest(AsyncAPIView):
+    async def post(self, request, *args, **kwargs):
+        serializer = ProcessCreditRequestSerializer(data=self.parse_body(request))
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        admin_user = await user_service.aget_user_by_phone(data['phone_number'])
+        if admin_user.user_type != UserTypeEnums.ADMIN:
+            raise PermissionDenied()
+        response_data = {"msg": "done"}
+        if data.get("status") == CreditRequestStatusEnums.ACCEPTED.value:
+            await wallet_service.approve_credit_request_single(
+                credit_request_id=data['credit_id'],
+                admin_user=admin_user
+            )
+            return JsonResponse(status=status.HTTP_202_ACCEPTED, data=response_data)
+        await wallet_service.reject_credit_request(
+            credit_request_id=data['credit_id'],
+            admin_user=admin_user
+        )
+        return JsonResponse(status=status.HTTP_202_ACCEPTED, data=response_data)
+
+
+class AsyncCreateChargeSale(AsyncAPIView):
+    async def post(self, request, *args, **kwargs):
+        serializer = CreateChargeSaleSerializer(data=self.parse_body(request))
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        user = await user_service.aget_user_by_phone(data['seller_phone_number'])
+        charge_sale = await wallet_service.create_charge_sale(user, data['receiver_phone_number'], data['amount'])
+        return JsonResponse(status=status.HTTP_201_CREATED, data={"code": charge_sale.id})
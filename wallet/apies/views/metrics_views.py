@@ -0,0 +1,10 @@
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from wallet.services.metrics import render
+
+
+@require_GET
+def metrics(request):
+    """Prometheus scrape endpoint for the wallet engine metrics."""
+    body, content_type = render()
+    return HttpResponse(body, content_type=content_type)
@@ -0,0 +1,46 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.exceptions import NotFound, PermissionDenied
+from rest_framework import status
+from drf_spectacular.utils import extend_schema
+from user.enums import UserTypeEnums
+from user.services.user_service import UserService
+from utils.middleware import ProfileStore
+from wallet.apies.serializers.wallet_serializers import ProfileDetailQuerySerializer, ProfileQuerySerializer
+
+user_service = UserService()
+profile_store = ProfileStore()
+
+
+def _check_admin(phone_number: str) -> None:
+    if user_service.get_user_by_phone(phone_number).user_type != UserTypeEnums.ADMIN:
+        raise PermissionDenied()
+
+
+class RequestProfiles(APIView):
+    @extend_schema(
+        parameters=[ProfileQuerySerializer],
+        responses=None
+    )
+    def get(self, request, *args, **kwargs):
+        serializer = ProfileQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        _check_admin(data['phone_number'])
+        profiles = profile_store.slowest(endpoint=data.get('endpoint'), limit=data['limit'])
+        return Response(status=status.HTTP_200_OK, data=profiles)
+
+
+class RequestProfileDetail(APIView):
+    @extend_schema(
+        parameters=[ProfileDetailQuerySerializer],
+        responses=None
+    )
+    def get(self, request, profile_id, *args, **kwargs):
+        serializer = ProfileDetailQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        _check_admin(serializer.validated_data['phone_number'])
+        profile = profile_store.get(str(profile_id))
+        if profile is None:
+            raise NotFound("Profile not found or expired")
+        return Response(status=status.HTTP_200_OK, data=profile)
@@ -1,10 +1,12 @@
+from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.exceptions import NotFound
 from user.enums import UserTypeEnums
 from user.services.user_service import UserService
-from wallet.apies.serializers.wallet_serializers import CreateChargeSaleSerializer, CreateCreditRequestSerializer, ProcessCreditRequestSerializer
+from wallet.apies.serializers.wallet_serializers import CreateChargeSaleBulkSerializer, CreateChargeSaleSerializer, CreateCreditRequestSerializer, PendingCreditRequestQuerySerializer, ProcessCreditRequestBulkSerializer, ProcessCreditRequestSerializer, SalesReportQuerySerializer, TransactionHistoryQuerySerializer
 from wallet.enums import CreditRequestStatusEnums
+from wallet.services.sales_rollup_service import sales_rollup
 from wallet.services.wallet_service import WalletService
 from rest_framework import status
 from drf_spectacular.utils import extend_schema
@@ -51,6 +53,32 @@ class ProccessCreditRequest(APIView):
         )
         return Response(status=status.HTTP_202_ACCEPTED, data=response_data)
 
+class ProccessCreditRequestBulk(APIView):
+    @extend_schema(
+        request=ProcessCreditRequestBulkSerializer,
+        responses=None
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = ProcessCreditRequestBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        admin_user = user_service.get_user_by_phone(data['phone_number'])
+        if admin_user.user_type != UserTypeEnums.ADMIN:
+            raise PermissionDenied()
+        if data['status'] == CreditRequestStatusEnums.ACCEPTED.value:
+            results = wallet_service.approve_credit_requests_bulk(data['credit_ids'], admin_user)
+        else:
+            results = wallet_service.reject_credit_requests_bulk(data['credit_ids'], admin_user)
+        response_data = [
+            {
+                "credit_id": credit_id,
+                "success": result.error is None,
+                "error": str(result.error.detail[0]) if result.error else None,
+            }
+            for credit_id, result in zip(data['credit_ids'], results)
+        ]
+        return Response(status=status.HTTP_202_ACCEPTED, data={"results": response_data})
+
 class CreateChargeSale(APIView):
     @extend_schema(
         request=CreateChargeSaleSerializer,
@@ -61,5 +89,156 @@ class CreateChargeSale(APIView):
         serializer.is_valid(raise_exception=True)
         data = serializer.validated_data
         user = user_service.get_user_by_phone(data['seller_phone_number'])
+        if settings.WALLET_ASYNC_SUBMISSION:
+            charge_sale = wallet_service.submit_charge_sale(user, data['receiver_phone_number'], data['amount'])
+            return Response(status=status.HTTP_202_ACCEPTED, data={"code": charge_sale.id, "status": charge_sale.status})
         charge_sale = wallet_service.create_charge_sale(user, data['receiver_phone_number'], data['amount'])
         return Response(status=status.HTTP_201_CREATED, data={"code": charge_sale.id})
+
+class ChargeSaleStatus(APIView):
+    @extend_schema(responses=None)
+    def get(self, request, charge_sale_id, *args, **kwargs):
+        charge_sale_status = wallet_service.get_charge_sale_status(charge_sale_id)
+        if charge_sale_status is None:
+            raise NotFound()
+        return Response(status=status.HTTP_200_OK, data=charge_sale_status)
+
+class CreateChargeSaleBulk(APIView):
+    @extend_schema(
+        request=CreateChargeSaleBulkSerializer,
+        responses=None
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = CreateChargeSaleBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        user = user_service.get_user_by_phone(data['seller_phone_number'])
+        items = [(item['receiver_phone_number'], item['amount']) for item in data['items']]
+        results = wallet_service.create_charge_sales_bulk(user, items)
+        response_data = []
+        for (phone_number, amount), result in zip(items, results):
+            response_data.append({
+                "receiver_phone_number": phone_number,
+                "amount": str(amount),
+                "code": result.charge_sale.id if result.charge_sale else None,
+                "success": result.error is None,
+                "error": str(result.error.detail[0]) if result.error else None,
+            })
+        return Response(status=status.HTTP_201_CREATED, data={"results": response_data})
+
+class TransactionHistory(APIView):
+    @extend_schema(
+        parameters=[TransactionHistoryQuerySerializer],
+        responses=None
+    )
+    def get(self, request, *args, **kwargs):
+        serializer = TransactionHistoryQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        user = user_service.get_user_by_phone(data['phone_number'])
+        entries = wallet_service.get_transaction_history(user, limit=data['limit'], offset=data['offset'])
+        response_data = [
+            {
+                "id": entry.id,
+                "amount": str(entry.amount),
+                "balance_before": str(entry.balance_before),
+                "balance_after": str(entry.balance_after),
+                "reference_id": entry.reference_id,
+                "description": entry.description,
+                "created_at": entry.created_at,
+            }
+            for entry in entries
+        ]
+        return Response(status=status.HTTP_200_OK, data={"results": response_data})
+
+class PendingCreditRequests(APIView):
+    @extend_schema(
+        parameters=[PendingCreditRequestQuerySerializer],
+        responses=None
+    )
+    def get(self, request, *args, **kwargs):
+        serializer = PendingCreditRequestQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        admin_user = user_service.get_user_by_phone(data['phone_number'])
+        if admin_user.user_type != UserTypeEnums.ADMIN:
+            raise PermissionDenied()
+        user = user_service.get_user_by_phone(data['user_phone_number']) if data.get('user_phone_number') else None
+        credit_requests, next_cursor = wallet_service.get_pending_credit_requests(
+            after=data.get('cursor'),
+            limit=data['limit'],
+            user=user,
+            min_amount=data.get('min_amount'),
+            max_amount=data.get('max_amount'),
+        )
+        totals = wallet_service.get_pending_credit_request_totals()
+        response_data = [
+            {
+                "credit_id": credit_request.id,
+                "user_phone_number": credit_request.user.phone_number,
+                "amount": str(credit_request.amount),
+                "created_at": credit_request.created_at,
+            }
+            for credit_request in credit_requests
+        ]
+        return Response(status=status.HTTP_200_OK, data={
+            "results": response_data,
+            "next_cursor": next_cursor,
+            "pending_count": totals["count"],
+            "pending_amount": str(totals["amount"]),
+        })
+
+
+class SellerSalesReport(APIView):
+    @extend_schema(
+        parameters=[SalesReportQuerySerializer],
+        responses=None
+    )
+    def get(self, request, *args, **kwargs):
+        serializer = SalesReportQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        user = user_service.get_user_by_phone(data['phone_number'])
+        buckets = sales_rollup.seller_report(user.id, data['start'], data['end'])
+        return Response(status=status.HTTP_200_OK, data={
+            "results": [
+                {
+                    "day": bucket.day,
+                    "sales_count": bucket.sales_count,
+                    "gross_amount": str(bucket.gross_amount),
+                    "failed_count": bucket.failed_count,
+                    "credit_received": str(bucket.credit_received),
+                }
+                for bucket in buckets
+            ],
+            "as_of": sales_rollup.watermark(),
+        })
+
+
+class SalesReport(APIView):
+    @extend_schema(
+        parameters=[SalesReportQuerySerializer],
+        responses=None
+    )
+    def get(self, request, *args, **kwargs):
+        serializer = SalesReportQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        admin_user = user_service.get_user_by_phone(data['phone_number'])
+        if admin_user.user_type != UserTypeEnums.ADMIN:
+            raise PermissionDenied()
+        totals = sales_rollup.daily_totals(data['start'], data['end'])
+        return Response(status=status.HTTP_200_OK, data={
+            "results": [
+                {
+                    "day": day["day"],
+                    "active_sellers": day["active_sellers"],
+                    "sales_count": day["sales_count"],
+                    "gross_amount": str(day["gross_amount"]),
+                    "failed_count": day["failed_count"],
+                    "credit_received": str(day["credit_received"]),
+                }
+                for day in totals
+            ],
+            "as_of": sales_rollup.watermark(),
+        })
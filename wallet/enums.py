@@ -10,6 +10,7 @@ class CreditRequestStatusEnums(models.IntegerChoices):
     WAITING = 0, _("Waiting")
     ACCEPTED = 1, _("Accepted")
     REJECTED = 2, _("Rejeted")
+    FAILED = 3, _("Failed")
 
 class TransactionTypeEnums(models.IntegerChoices): 
     CREDIT_INCREASE = 0, _("CreditIncrease")
@@ -22,3 +23,7 @@ class ChargeSaleTypeEnums(models.IntegerChoices):
     COMPLETED = 1, _("Completed")
     FAILED = 2, _("Failed")
     REFUNDED = 3, _("Refunded")
+
+
+class WalletEventTypes(models.TextChoices):
+    CHARGE_SALE = "charge_sale", _("ChargeSale")
@@ -0,0 +1,52 @@
+import json
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from wallet.services.benchmark_service import SCENARIOS, WalletBenchmark
+
+
+class Command(BaseCommand):
+    help = "Load-test the charge sale hot path and print throughput, latency percentiles and contention as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scenario", choices=SCENARIOS, action="append",
+                            help="Scenario to run; repeat for several (default: all)")
+        parser.add_argument("--operations", type=int, default=1000)
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--sellers", type=int, default=100)
+        parser.add_argument("--receivers", type=int, default=1000)
+        parser.add_argument("--skew", type=float, default=1.2,
+                            help="Pareto shape for skewed_receivers; lower is more skewed")
+        parser.add_argument("--approval-ratio", type=float, default=0.1,
+                            help="Share of credit approvals in mixed_approvals")
+        parser.add_argument("--base-url", help="Drive a running server over HTTP instead of calling WalletService")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Also write the JSON report to this file")
+        parser.add_argument("--force", action="store_true", help="Run even with DEBUG off")
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options["force"]:
+            raise CommandError("The benchmark creates and funds users; pass --force to run it with DEBUG off")
+        reports = []
+        for scenario in options["scenario"] or SCENARIOS:
+            benchmark = WalletBenchmark(
+                scenario,
+                operations=options["operations"],
+                concurrency=options["concurrency"],
+                sellers=options["sellers"],
+                receivers=options["receivers"],
+                skew=options["skew"],
+                approval_ratio=options["approval_ratio"],
+                base_url=options["base_url"],
+                seed=options["seed"],
+            )
+            report = benchmark.run()
+            reports.append(report)
+            self.stderr.write(
+                f"{scenario}: {report['throughput_ops']} ops/s, p99 {report['latency'].get('p99_ms')} ms, "
+                f"{sum(report['errors'].values())} errors"
+            )
+        output = json.dumps({"results": reports}, indent=2)
+        self.stdout.write(output)
+        if options["output"]:
+            with open(options["output"], "w") as report_file:
+                report_file.write(output + "\n")
@@ -0,0 +1,54 @@
+from collections import defaultdict
+import resource
+import threading
+from django.core.management.base import BaseCommand
+from utils.locks import StripedLock
+
+
+def current_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Peak RSS in KiB on Linux; the best we can do without /proc
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = "Measure RSS of the application lock table while locking many distinct seller/receiver pairs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pairs", type=int, default=1_000_000)
+        parser.add_argument("--stripes", type=int, default=1024)
+        parser.add_argument("--report-every", type=int, default=100_000)
+        parser.add_argument("--compare", action="store_true",
+                            help="Also run the old defaultdict(threading.Lock) keyed by pair")
+
+    def handle(self, *args, **options):
+        pairs = options["pairs"]
+        report_every = options["report_every"]
+        seller_id = 1
+
+        table = StripedLock(options["stripes"])
+        baseline = current_rss_mb()
+        self.stdout.write(f"striped table ({len(table)} stripes), baseline RSS {baseline:.1f} MB")
+        for receiver_id in range(2, pairs + 2):
+            stripes = table.acquire((seller_id, receiver_id))
+            table.release(stripes)
+            if (receiver_id - 1) % report_every == 0:
+                self.stdout.write(f"  {receiver_id - 1:>10} pairs  RSS {current_rss_mb():.1f} MB")
+
+        if not options["compare"]:
+            return
+        local_locks = defaultdict(threading.Lock)
+        baseline = current_rss_mb()
+        self.stdout.write(f"defaultdict table, baseline RSS {baseline:.1f} MB")
+        for receiver_id in range(2, pairs + 2):
+            lock = local_locks[f"app_lock_{seller_id}_{receiver_id}"]
+            lock.acquire()
+            lock.release()
+            if (receiver_id - 1) % report_every == 0:
+                self.stdout.write(f"  {receiver_id - 1:>10} pairs  RSS {current_rss_mb():.1f} MB")
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from wallet.services.ledger_service import LedgerService
+
+
+class Command(BaseCommand):
+    help = "Trim transactions:user:* lists in Redis to their recent window once entries are durable in Postgres"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-entries", type=int, default=settings.WALLET_LEDGER_MAX_ENTRIES,
+                            help="Entries kept per user")
+        parser.add_argument("--max-age", type=int, default=settings.WALLET_LEDGER_MAX_AGE,
+                            help="Seconds an entry is kept, even below --max-entries")
+        parser.add_argument("--scan-count", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        ledger = LedgerService(max_entries=options["max_entries"], max_age=options["max_age"])
+        scanned, dropped = ledger.compact_all(scan_count=options["scan_count"])
+        self.stdout.write(f"Ledgers: scanned {scanned}, dropped {dropped} entries")
@@ -0,0 +1,27 @@
+import os
+import socket
+from django.core.management.base import BaseCommand
+from wallet.services.wallet_event_service import WalletEventConsumer
+
+
+class Command(BaseCommand):
+    help = "Persist write-behind wallet events from the Redis stream into Postgres"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--consumer", default=f"{socket.gethostname()}-{os.getpid()}",
+                            help="Consumer name inside the Redis consumer group")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--block-ms", type=int, default=1000)
+        parser.add_argument("--claim-idle-ms", type=int, default=60000,
+                            help="Reclaim events another consumer left pending for this long")
+        parser.add_argument("--once", action="store_true", help="Exit once the stream is drained")
+
+    def handle(self, *args, **options):
+        consumer = WalletEventConsumer(
+            consumer_name=options["consumer"],
+            batch_size=options["batch_size"],
+            block_ms=options["block_ms"],
+            claim_idle_ms=options["claim_idle_ms"],
+        )
+        self.stdout.write(f"Consuming {consumer.stream} as {consumer.consumer_name}")
+        consumer.run(once=options["once"])
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from wallet.services.partition_service import TransactionPartitionManager
+
+
+class Command(BaseCommand):
+    help = "Create the upcoming monthly wallet_transaction partitions and optionally detach old ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ahead", type=int, default=3,
+                            help="Months after the current one to create partitions for")
+        parser.add_argument("--retain-months", type=int,
+                            help="Detach partitions that ended more than this many months ago")
+
+    def handle(self, *args, **options):
+        manager = TransactionPartitionManager()
+        created = manager.create_ahead(options["ahead"])
+        self.stdout.write(f"Created {len(created)} partitions{': ' + ', '.join(created) if created else ''}")
+        if options["retain_months"] is not None:
+            detached = manager.detach_older_than(options["retain_months"])
+            self.stdout.write(f"Detached {len(detached)} partitions{': ' + ', '.join(detached) if detached else ''}")
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from infrastructure.database.redis.redis import wallet_redis_client
+from wallet.services.redis_scripts import UPGRADE_BALANCE_SCRIPT, UPGRADE_LEDGER_SCRIPT
+
+
+class Command(BaseCommand):
+    help = "Convert Redis wallet balances (and optionally ledgers) from decimal strings to integer minor units"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scan-count", type=int, default=1000,
+                            help="SCAN page size; each page is converted in one pipeline")
+        parser.add_argument("--ledgers", action="store_true",
+                            help="Also rewrite legacy entries in transactions:user:* lists")
+
+    def handle(self, *args, **options):
+        upgrade_balance = wallet_redis_client.register_script(UPGRADE_BALANCE_SCRIPT)
+        scanned, converted = self._convert("wallet:user:*", upgrade_balance, options["scan_count"])
+        self.stdout.write(f"Wallets: scanned {scanned}, converted {converted}")
+
+        if options["ledgers"]:
+            upgrade_ledger = wallet_redis_client.register_script(UPGRADE_LEDGER_SCRIPT)
+            scanned, converted = self._convert("transactions:user:*", upgrade_ledger, options["scan_count"])
+            self.stdout.write(f"Ledgers: scanned {scanned}, converted {converted} entries")
+
+    def _convert(self, pattern: str, script, scan_count: int) -> tuple[int, int]:
+        # Each key is converted by its own script call, so the conversion is safe
+        # to run while the application keeps writing.
+        scanned = converted = 0
+        cursor = 0
+        while True:
+            cursor, keys = wallet_redis_client.scan(cursor=cursor, match=pattern, count=scan_count)
+            if keys:
+                with wallet_redis_client.pipeline(transaction=False) as pipe:
+                    for key in keys:
+                        script(keys=[key], client=pipe)
+                    converted += sum(int(result) for result in pipe.execute())
+                scanned += len(keys)
+            if cursor == 0:
+                return scanned, converted
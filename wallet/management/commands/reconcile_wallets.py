@@ -0,0 +1,55 @@
+import json
+import time
+from django.core.management.base import BaseCommand
+from wallet.services.reconciliation_service import WalletReconciler
+
+
+class Command(BaseCommand):
+    help = "Compare Redis balances, Wallet.balance and the Transaction ledger and report (or repair) drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true",
+                            help="Examine every wallet instead of those touched since the last run")
+        parser.add_argument("--check-ledger", action="store_true",
+                            help="Also compare Wallet.balance with the sum of the user's Transaction amounts")
+        parser.add_argument("--repair", action="store_true",
+                            help="Reset drifted Redis balances to Wallet.balance plus unflushed sales")
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument("--recheck-delay", type=float, default=1.0,
+                            help="Seconds to wait before confirming a suspected drift")
+        parser.add_argument("--report", help="Write one JSON line per drifted wallet to this file")
+
+    def handle(self, *args, **options):
+        reconciler = WalletReconciler(
+            batch_size=options["batch_size"],
+            check_ledger=options["check_ledger"],
+            repair=options["repair"],
+            recheck_delay=options["recheck_delay"],
+        )
+        started = time.monotonic()
+
+        def report_progress(examined: int, drifted: int) -> None:
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"{examined} wallets, {drifted} drifted, {examined / elapsed if elapsed else examined:.0f} wallets/s")
+
+        result = reconciler.run(full=options["full"], on_batch=report_progress)
+        if options["report"]:
+            with open(options["report"], "w") as report:
+                for drift in result.drifts:
+                    report.write(json.dumps({
+                        "user_id": drift.user_id,
+                        "kind": drift.kind,
+                        "expected": str(drift.expected),
+                        "actual": str(drift.actual),
+                        "repaired": drift.repaired,
+                    }) + "\n")
+        else:
+            for drift in result.drifts:
+                self.stdout.write(
+                    f"user {drift.user_id}: {drift.kind} drift, expected {drift.expected}, actual {drift.actual}"
+                    f"{' (repaired)' if drift.repaired else ''}"
+                )
+        self.stdout.write(
+            f"Examined {result.examined} wallets in {time.monotonic() - started:.1f}s: "
+            f"{len(result.drifts)} drifted, {result.not_loaded} not loaded in Redis"
+        )
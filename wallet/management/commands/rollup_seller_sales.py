@@ -0,0 +1,30 @@
+import time
+from django.core.management.base import BaseCommand
+from wallet.services.sales_rollup_service import SellerSalesRollup
+
+
+class Command(BaseCommand):
+    help = "Refresh the per-seller daily sales rollup from charge sales and credit requests changed since the last run"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true",
+                            help="Rebuild every bucket instead of those changed since the last run")
+        parser.add_argument("--interval", type=float,
+                            help="Keep running, refreshing every this many seconds")
+        parser.add_argument("--overlap", type=int, default=300,
+                            help="Seconds before the watermark to re-examine, for rows committed late")
+
+    def handle(self, *args, **options):
+        rollup = SellerSalesRollup(overlap=options["overlap"])
+        full = options["full"]
+        while True:
+            started = time.monotonic()
+            result = rollup.run(full=full)
+            self.stdout.write(
+                f"{'Rebuilt' if result.full else 'Refreshed'} {result.buckets} seller-day buckets "
+                f"in {time.monotonic() - started:.1f}s, current up to {result.watermark.isoformat()}"
+            )
+            if options["interval"] is None:
+                return
+            full = False
+            time.sleep(max(options["interval"] - (time.monotonic() - started), 0))
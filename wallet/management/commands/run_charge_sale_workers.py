@@ -0,0 +1,37 @@
+import socket
+from django.core.management.base import BaseCommand
+from wallet.services.charge_sale_queue import ChargeSaleWorker
+from wallet.services.wallet_service import WalletService
+
+
+class Command(BaseCommand):
+    help = "Execute charge sales queued by the async submission endpoint"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--name", default=socket.gethostname(),
+                            help="Stable worker name; jobs left in its processing lists are requeued on start")
+        parser.add_argument("--threads", type=int, default=WalletService.MAX_THREADS,
+                            help="Worker threads; keep REDIS_MAX_CONNECTIONS above this")
+        parser.add_argument("--block-timeout", type=float, default=1.0)
+        parser.add_argument("--claim-timeout", type=float, default=600,
+                            help="Seconds after which a PENDING sale's claim counts as left by a dead worker")
+        parser.add_argument("--reap-interval", type=float, default=60,
+                            help="Seconds between scans for such sales")
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is drained")
+
+    def handle(self, *args, **options):
+        wallet_service = WalletService()
+        worker = ChargeSaleWorker(
+            wallet_service.atomic_service,
+            wallet_service.charge_sale_queue,
+            name=options["name"],
+            threads=options["threads"],
+            block_timeout=options["block_timeout"],
+            claim_timeout=options["claim_timeout"],
+            reap_interval=options["reap_interval"],
+        )
+        self.stdout.write(f"Draining {worker.queue.queue_key} with {worker.threads} threads as {worker.name}")
+        try:
+            worker.run(once=options["once"])
+        except KeyboardInterrupt:
+            worker.stop()
@@ -0,0 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Max, Min
+from wallet.models import Wallet
+from wallet.services.wallet_service import AtomicWalletService
+
+
+class Command(BaseCommand):
+    help = "Load every wallet balance and status from Postgres into Redis, e.g. after a Redis restart"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from-user-id", type=int, help="First user id to load (inclusive)")
+        parser.add_argument("--to-user-id", type=int, help="Last user id to load (inclusive)")
+        parser.add_argument("--workers", type=int, default=1,
+                            help="Split the user id range across this many threads, one DB cursor each")
+        parser.add_argument("--batch-size", type=int, default=5000,
+                            help="Rows fetched from the cursor and seeded per Redis pipeline")
+
+    def handle(self, *args, **options):
+        self.atomic_service = AtomicWalletService()
+        self._output_lock = threading.Lock()
+        bounds = Wallet.objects.aggregate(low=Min("user_id"), high=Max("user_id"))
+        low = options["from_user_id"] if options["from_user_id"] is not None else bounds["low"]
+        high = options["to_user_id"] if options["to_user_id"] is not None else bounds["high"]
+        if low is None or high is None or low > high:
+            self.stdout.write("No wallets to load")
+            return
+
+        started = time.monotonic()
+        # Wallets with sales still in the event stream are loaded afterwards
+        # under row locks so none of those sales is lost or counted twice
+        pending = self.atomic_service.pending_event_deltas()
+        pending = {user_id: deltas for user_id, deltas in pending.items() if low <= user_id <= high}
+
+        workers = max(1, min(options["workers"], high - low + 1))
+        step = (high - low + 1 + workers - 1) // workers
+        ranges = [(start, min(start + step - 1, high)) for start in range(low, high + 1, step)]
+        with ThreadPoolExecutor(len(ranges), "warm_wallet_cache") as executor:
+            results = list(executor.map(
+                lambda bounds: self._warm_range(*bounds, pending.keys(), options["batch_size"]), ranges
+            ))
+        if pending:
+            self.atomic_service.load_wallets(list(pending))
+
+        rows = sum(read for read, _ in results) + len(pending)
+        seeded = sum(written for _, written in results)
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f"Loaded {rows} wallets ({seeded} balances written, {len(pending)} with pending events) "
+            f"in {elapsed:.1f}s, {rows / elapsed if elapsed else rows:.0f} rows/s"
+        )
+
+    def _warm_range(self, low: int, high: int, skip, batch_size: int) -> tuple[int, int]:
+        """Seed wallets of users ``low``..``high``. Returns (rows read, balances written)."""
+        started = time.monotonic()
+        rows = (
+            Wallet.objects.filter(user_id__gte=low, user_id__lte=high)
+            .exclude(user_id__in=[user_id for user_id in skip if low <= user_id <= high])
+            .order_by("user_id")
+            .values_list("user_id", "balance", "status")
+        )
+        read = written = 0
+        batch = []
+        try:
+            # Streams through a server-side cursor instead of loading the range
+            for row in rows.iterator(chunk_size=batch_size):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    written += self.atomic_service.seed_wallets(batch)
+                    read += len(batch)
+                    batch = []
+                    self._report(low, high, read, started)
+            if batch:
+                written += self.atomic_service.seed_wallets(batch)
+                read += len(batch)
+        finally:
+            connection.close()
+        self._report(low, high, read, started)
+        return read, written
+
+    def _report(self, low: int, high: int, read: int, started: float) -> None:
+        elapsed = time.monotonic() - started
+        with self._output_lock:
+            self.stdout.write(f"users {low}-{high}: {read} rows, {read / elapsed if elapsed else read:.0f} rows/s")
@@ -0,0 +1,37 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import models, transaction
+from django.db.models import Case, DecimalField, F, Value, When
+from django.db.models.functions import Now
+
+
+class WalletQuerySet(models.QuerySet):
+
+    def apply_balance_deltas(self, deltas) -> int:
+        """Add ``(user_id, delta)`` pairs to wallet balances with one relative UPDATE.
+
+        Relative updates commute, so concurrent writers never overwrite each
+        other's balance the way ``save(update_fields=['balance'])`` would. The
+        rows are locked in ``user_id`` order first: an UPDATE takes them in
+        whatever order it scans them, so two writers sharing wallets could
+        otherwise deadlock.
+        """
+        totals = defaultdict(Decimal)
+        for user_id, delta in deltas:
+            totals[user_id] += Decimal(delta)
+        totals = {user_id: delta for user_id, delta in totals.items() if delta}
+        if not totals:
+            return 0
+        delta_expression = Case(
+            *[When(user_id=user_id, then=Value(delta)) for user_id, delta in totals.items()],
+            output_field=DecimalField(max_digits=15, decimal_places=2),
+        )
+        with transaction.atomic(using=self.db):
+            list(self.select_for_update().filter(user_id__in=totals.keys()).order_by('user_id').values_list('id'))
+            return self.filter(user_id__in=totals.keys()).update(
+                balance=F('balance') + delta_expression,
+                updated_at=Now(),
+            )
+
+
+WalletManager = models.Manager.from_queryset(WalletQuerySet)
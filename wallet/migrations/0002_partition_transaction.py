@@ -0,0 +1,84 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Postgres can only enforce a primary key or a referenced unique key on a
+# partitioned table if it includes the partition key, so the table's primary
+# key becomes (id, created_at) and ChargeSale.transaction stops being a
+# database-level foreign key. Django still treats ``id`` as the primary key.
+PARTITION_TRANSACTIONS = """
+ALTER TABLE wallet_transaction RENAME TO wallet_transaction_unpartitioned;
+
+CREATE TABLE wallet_transaction (
+    LIKE wallet_transaction_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS
+) PARTITION BY RANGE (created_at);
+ALTER TABLE wallet_transaction ADD CONSTRAINT wallet_transaction_pkey_partitioned PRIMARY KEY (id, created_at);
+ALTER TABLE wallet_transaction ADD CONSTRAINT wallet_transaction_seller_id_fk_user_user_id
+    FOREIGN KEY (seller_id) REFERENCES user_user (id) DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE wallet_transaction ADD CONSTRAINT wallet_transaction_admin_user_id_fk_user_user_id
+    FOREIGN KEY (admin_user_id) REFERENCES user_user (id) DEFERRABLE INITIALLY DEFERRED;
+
+-- Created on the parent, so every partition gets its own copy
+CREATE INDEX wallet_transaction_created_at_brin ON wallet_transaction USING brin (created_at);
+CREATE INDEX wallet_transaction_seller_created ON wallet_transaction (seller_id, created_at);
+CREATE INDEX wallet_transaction_admin_user_id ON wallet_transaction (admin_user_id);
+
+-- Catches rows outside every monthly partition; manage_transaction_partitions
+-- keeps partitions created ahead so it stays empty
+CREATE TABLE wallet_transaction_default PARTITION OF wallet_transaction DEFAULT;
+
+DO $$
+DECLARE
+    partition_month date := date_trunc('month', coalesce(
+        (SELECT min(created_at) FROM wallet_transaction_unpartitioned), now()
+    ) AT TIME ZONE 'UTC')::date;
+    last_month date := (date_trunc('month', now() AT TIME ZONE 'UTC') + interval '3 months')::date;
+BEGIN
+    WHILE partition_month <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF wallet_transaction FOR VALUES FROM (%L) TO (%L)',
+            'wallet_transaction_p' || to_char(partition_month, 'YYYY_MM'),
+            partition_month::timestamp AT TIME ZONE 'UTC',
+            (partition_month + interval '1 month')::timestamp AT TIME ZONE 'UTC'
+        );
+        partition_month := (partition_month + interval '1 month')::date;
+    END LOOP;
+END $$;
+
+INSERT INTO wallet_transaction SELECT * FROM wallet_transaction_unpartitioned;
+DROP TABLE wallet_transaction_unpartitioned;
+"""
+
+UNPARTITION_TRANSACTIONS = """
+ALTER TABLE wallet_transaction RENAME TO wallet_transaction_partitioned;
+
+CREATE TABLE wallet_transaction (
+    LIKE wallet_transaction_partitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS
+);
+ALTER TABLE wallet_transaction ADD PRIMARY KEY (id);
+ALTER TABLE wallet_transaction ADD CONSTRAINT wallet_transaction_seller_id_fk_user_user_id
+    FOREIGN KEY (seller_id) REFERENCES user_user (id) DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE wallet_transaction ADD CONSTRAINT wallet_transaction_admin_user_id_fk_user_user_id
+    FOREIGN KEY (admin_user_id) REFERENCES user_user (id) DEFERRABLE INITIALLY DEFERRED;
+CREATE INDEX wallet_transaction_seller_id ON wallet_transaction (seller_id);
+CREATE INDEX wallet_transaction_admin_user_id_unpartitioned ON wallet_transaction (admin_user_id);
+
+INSERT INTO wallet_transaction SELECT * FROM wallet_transaction_partitioned;
+DROP TABLE wallet_transaction_partitioned CASCADE;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0001_initial'),
+        ('user', '0002_alter_user_user_type'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chargesale',
+            name='transaction',
+            field=models.OneToOneField(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='charge_sale', to='wallet.transaction'),
+        ),
+        migrations.RunSQL(PARTITION_TRANSACTIONS, UNPARTITION_TRANSACTIONS),
+    ]
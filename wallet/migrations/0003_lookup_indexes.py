@@ -0,0 +1,40 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('wallet', '0002_partition_transaction'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='wallet',
+            index=models.Index(fields=['updated_at'], name='wallet_updated_at'),
+        ),
+        AddIndexConcurrently(
+            model_name='creditrequest',
+            index=models.Index(condition=models.Q(('status', 0)), fields=['created_at', 'id'], name='credit_request_waiting'),
+        ),
+        AddIndexConcurrently(
+            model_name='creditrequest',
+            index=models.Index(fields=['user', 'status'], name='credit_request_user_status'),
+        ),
+        AddIndexConcurrently(
+            model_name='chargesale',
+            index=models.Index(fields=['user', 'status'], name='charge_sale_user_status'),
+        ),
+        AddIndexConcurrently(
+            model_name='chargesale',
+            index=models.Index(fields=['updated_at'], name='charge_sale_updated_at'),
+        ),
+        # Partitioned tables don't support CONCURRENTLY; the index cascades to every partition
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['reference_id', 'seller'], name='transaction_reference_seller'),
+        ),
+    ]
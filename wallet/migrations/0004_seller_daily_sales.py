@@ -0,0 +1,43 @@
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('wallet', '0003_lookup_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created_at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='')),
+                ('day', models.DateField()),
+                ('sales_count', models.PositiveIntegerField(default=0)),
+                ('gross_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=18)),
+                ('failed_count', models.PositiveIntegerField(default=0)),
+                ('credit_received', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=18)),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'seller_daily_sales',
+                'verbose_name_plural': 'seller_daily_sales',
+                'indexes': [models.Index(fields=['day'], name='seller_daily_sales_day')],
+                'constraints': [models.UniqueConstraint(fields=('seller', 'day'), name='seller_daily_sales_seller_day')],
+            },
+        ),
+        AddIndexConcurrently(
+            model_name='chargesale',
+            index=models.Index(fields=['user', 'created_at'], name='charge_sale_user_created'),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0004_seller_daily_sales'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='creditrequest',
+            name='status',
+            field=models.IntegerField(choices=[(0, 'Waiting'), (1, 'Accepted'), (2, 'Rejeted'), (3, 'Failed')], default=0, verbose_name='status'),
+        ),
+    ]
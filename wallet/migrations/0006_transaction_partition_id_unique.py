@@ -0,0 +1,51 @@
+from django.db import migrations
+
+# The primary key of the partitioned wallet_transaction is (id, created_at),
+# so on its own it would accept the same id twice in one month with
+# different timestamps. Postgres can't put a unique index on id alone on the
+# parent, but it can on each partition: with these, an id is unique within
+# its month. Across months only the id generation (uuid4, in the wallet
+# service) keeps it unique. TransactionPartitionManager.create_ahead adds the
+# same index to every partition it creates.
+ADD_PARTITION_ID_INDEXES = """
+DO $$
+DECLARE
+    partition_name text;
+BEGIN
+    FOR partition_name IN
+        SELECT child.relname FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = 'wallet_transaction'
+    LOOP
+        EXECUTE format('CREATE UNIQUE INDEX %I ON %I (id)', partition_name || '_id_uniq', partition_name);
+    END LOOP;
+END $$;
+"""
+
+DROP_PARTITION_ID_INDEXES = """
+DO $$
+DECLARE
+    partition_name text;
+BEGIN
+    FOR partition_name IN
+        SELECT child.relname FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = 'wallet_transaction'
+    LOOP
+        EXECUTE format('DROP INDEX IF EXISTS %I', partition_name || '_id_uniq');
+    END LOOP;
+END $$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0005_credit_request_failed_status'),
+    ]
+
+    operations = [
+        migrations.RunSQL(ADD_PARTITION_ID_INDEXES, DROP_PARTITION_ID_INDEXES),
+    ]
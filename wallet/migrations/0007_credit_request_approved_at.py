@@ -0,0 +1,32 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_approved_at(apps, schema_editor):
+    # Before this field the approval time was only kept in updated_at
+    CreditRequest = apps.get_model('wallet', 'CreditRequest')
+    CreditRequest.objects.filter(status=1, approved_at__isnull=True).update(approved_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('wallet', '0006_transaction_partition_id_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='creditrequest',
+            name='approved_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='approved_at'),
+        ),
+        migrations.RunPython(backfill_approved_at, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='creditrequest',
+            index=models.Index(condition=models.Q(('approved_at__isnull', False)), fields=['approved_at'], name='credit_request_approved_at'),
+        ),
+    ]
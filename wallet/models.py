@@ -6,6 +6,7 @@ from django.utils.translation import gettext_lazy as _
 from wallet.enums import ChargeSaleTypeEnums, CreditRequestStatusEnums, TransactionTypeEnums, WalletStatusEnums
 from decimal import Decimal
 from django.core.validators import MinValueValidator
+from wallet.managers import WalletManager
 
 User = get_user_model()
 
@@ -18,6 +19,8 @@ class Wallet(BaseTimeModel):
         validators=[MinValueValidator(Decimal('0.00'))],
     )
     status = models.IntegerField(verbose_name=_("status"), choices=WalletStatusEnums.choices, default=WalletStatusEnums.ACTIVE)
+
+    objects = WalletManager()
     
     def __str__(self):
         return f"{self.user.phone_number} - Balance: {self.balance}"
@@ -25,6 +28,9 @@ class Wallet(BaseTimeModel):
     class Meta:
         verbose_name = "wallet"
         verbose_name_plural = "wallets"
+        indexes = [
+            models.Index(fields=['updated_at'], name='wallet_updated_at'),
+        ]
 
 
 class CreditRequest(BaseTimeModel):
@@ -42,10 +48,26 @@ class CreditRequest(BaseTimeModel):
         blank=True,
         related_name='processed_credit_requests'
     )
+    approved_at = models.DateTimeField(verbose_name=_("approved_at"), null=True, blank=True)
     
     class Meta:
         verbose_name = "credit_request"
         verbose_name_plural = "created_requests"
+        indexes = [
+            # Only waiting requests are looked up by admins, and they are a small slice of the table
+            models.Index(
+                fields=['created_at', 'id'],
+                name='credit_request_waiting',
+                condition=models.Q(status=CreditRequestStatusEnums.WAITING),
+            ),
+            models.Index(fields=['user', 'status'], name='credit_request_user_status'),
+            # The sales rollup finds credits approved since its watermark
+            models.Index(
+                fields=['approved_at'],
+                name='credit_request_approved_at',
+                condition=models.Q(approved_at__isnull=False),
+            ),
+        ]
     
     def __str__(self):
         return f"Credit Request - {self.user.phone_number}: {self.amount} ({self.status})"
@@ -69,9 +91,14 @@ class Transaction(BaseTimeModel):
         related_name='supervised_transactions'
     )
     
+    # Range-partitioned by month on created_at (migration 0002); keep the
+    # partitions ahead with `python manage.py manage_transaction_partitions`
     class Meta:
         verbose_name = "transaction"
         verbose_name_plural = "transactions"
+        indexes = [
+            models.Index(fields=['reference_id', 'seller'], name='transaction_reference_seller'),
+        ]
     
     def __str__(self):
         return f"{self.get_transaction_type_display()} - {self.seller.phone_number}: {self.amount}"
@@ -87,14 +114,50 @@ class ChargeSale(BaseTimeModel):
         validators=[MinValueValidator(Decimal('1000.00'))]
     )
     status = models.IntegerField(verbose_name=_("status"), choices=ChargeSaleTypeEnums.choices, default=ChargeSaleTypeEnums.PENDING)
+    # No database constraint: the partitioned transaction table's key is (id, created_at)
     transaction = models.OneToOneField(
         Transaction, 
         on_delete=models.SET_NULL, 
         null=True, 
         blank=True,
-        related_name='charge_sale'
+        related_name='charge_sale',
+        db_constraint=False,
     )
 
     class Meta:
         verbose_name = "charge_sale"
         verbose_name_plural = "charge_sales"
+        indexes = [
+            models.Index(fields=['user', 'status'], name='charge_sale_user_status'),
+            models.Index(fields=['updated_at'], name='charge_sale_updated_at'),
+            # The sales rollup recomputes a batch of sellers' sales of one day
+            models.Index(fields=['user', 'created_at'], name='charge_sale_user_created'),
+        ]
+
+
+class SellerDailySales(BaseTimeModel):
+    """Per seller and UTC day: completed and failed charge sales and approved credit.
+
+    Sales count on the day they were created, credit on the day it was
+    approved. Maintained by ``python manage.py rollup_seller_sales``; see
+    ``wallet.services.sales_rollup_service``.
+    """
+    seller = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_sales')
+    day = models.DateField()
+    sales_count = models.PositiveIntegerField(default=0)
+    gross_amount = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal('0.00'))
+    failed_count = models.PositiveIntegerField(default=0)
+    credit_received = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        verbose_name = "seller_daily_sales"
+        verbose_name_plural = "seller_daily_sales"
+        constraints = [
+            models.UniqueConstraint(fields=['seller', 'day'], name='seller_daily_sales_seller_day'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='seller_daily_sales_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.seller.phone_number} {self.day}: {self.sales_count} sales, {self.gross_amount}"
@@ -0,0 +1,352 @@
+from decimal import Decimal
+import json
+import logging
+import time
+import uuid
+import weakref
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from infrastructure.database.redis.redis import get_async_wallet_redis_client
+from user.services.user_service import UserService
+from wallet.core.exceptions.wallet_exceptions import *
+from django.contrib.auth import get_user_model
+
+from wallet.enums import ChargeSaleTypeEnums, CreditRequestStatusEnums, TransactionTypeEnums, WalletEventTypes, WalletStatusEnums
+from wallet.models import ChargeSale, CreditRequest, Transaction, Wallet
+from wallet.services.balance_cache import balance_cache_stats
+from wallet.services.balance_codec import BALANCE_FIELD, LEGACY_BALANCE_FIELD, decode_balance, from_minor, to_minor
+from wallet.services.credit_request_queue import pending_credit_requests
+from wallet.services.metrics import REDIS_SECONDS, ROLLBACKS, observe
+from wallet.services.redis_scripts import REVERSE_TRANSFER_SCRIPT, TRANSFER_SCRIPT, WALLET_MISSING
+from wallet.services.wallet_service import AtomicWalletService
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+
+class AsyncAtomicWalletService:
+    """Async counterpart of ``AtomicWalletService`` for the ASGI views.
+
+    Redis is reached through ``redis.asyncio`` with the same Lua scripts, so a
+    sale or approval checks and moves funds in one round trip and never parks
+    on a lock. Single-row DB work uses the async ORM; multi-statement writes
+    reuse the sync service inside ``sync_to_async`` because Django transactions
+    are synchronous.
+    """
+
+    SCRIPTS = {
+        "transfer": TRANSFER_SCRIPT,
+        "reverse_transfer": REVERSE_TRANSFER_SCRIPT,
+    }
+
+    def __init__(self):
+        self.atomic_service = AtomicWalletService()
+        self.write_behind = settings.WALLET_WRITE_BEHIND
+        self.event_stream = settings.WALLET_EVENT_STREAM
+        self._scripts = weakref.WeakKeyDictionary()
+
+    def _script(self, name: str):
+        client = get_async_wallet_redis_client()
+        scripts = self._scripts.get(client)
+        if scripts is None:
+            scripts = self._scripts[client] = {
+                script_name: client.register_script(source) for script_name, source in self.SCRIPTS.items()
+            }
+        return scripts[name]
+
+    async def aget_or_create_wallet(self, user: User) -> Wallet:
+        return await self.aload_wallet(user.id)
+
+    async def aload_wallet(self, user_id: int) -> Wallet:
+        # Reloading reads the event stream and locks wallet rows, so it stays sync
+        return await sync_to_async(self.atomic_service.load_wallet)(user_id)
+
+    async def aget_wallet_balance(self, user_id: int) -> Decimal:
+        client = get_async_wallet_redis_client()
+        key = f"wallet:user:{user_id}"
+        minor, legacy = await client.hmget(key, BALANCE_FIELD, LEGACY_BALANCE_FIELD)
+        if minor is None and legacy is None:
+            balance_cache_stats.record(misses=1)
+            await self.aload_wallet(user_id)
+            minor, legacy = await client.hmget(key, BALANCE_FIELD, LEGACY_BALANCE_FIELD)
+        else:
+            balance_cache_stats.record(hits=1)
+        return decode_balance(minor, legacy)
+
+    async def atransfer(self, seller_id: int, target_id: int, amount: Decimal, reference_id: str,
+                        seller_description: str, target_description: str,
+                        event_type: str = None, event_meta: dict = None) -> tuple[str, str]:
+        keys = [
+            f"wallet:user:{seller_id}",
+            f"wallet:user:{target_id}",
+            f"transactions:user:{seller_id}",
+            f"transactions:user:{target_id}",
+        ]
+        args = [
+            to_minor(amount),
+            reference_id,
+            str(uuid.uuid4()),
+            str(uuid.uuid4()),
+            seller_description,
+            target_description,
+            int(time.time()),
+        ]
+        if event_type:
+            keys.append(self.event_stream)
+            args.extend([event_type, seller_id, target_id, json.dumps(event_meta or {})])
+        reloads = 0
+        for _ in range(3):
+            with observe(REDIS_SECONDS, operation="transfer"):
+                result = await self._script("transfer")(keys=keys, args=args)
+            if int(result[0]) != WALLET_MISSING:
+                break
+            reloads += 1
+            await self.aload_wallet(seller_id if int(result[1]) == 1 else target_id)
+        balance_cache_stats.record(hits=max(2 - reloads, 0), misses=reloads)
+        return AtomicWalletService._transfer_result(result)
+
+    async def areverse_transfer(self, seller_id: int, target_id: int, amount: Decimal,
+                                seller_entry: str, target_entry: str) -> None:
+        await self._script("reverse_transfer")(
+            keys=[
+                f"wallet:user:{seller_id}",
+                f"wallet:user:{target_id}",
+                f"transactions:user:{seller_id}",
+                f"transactions:user:{target_id}",
+            ],
+            args=[to_minor(amount), seller_entry, target_entry],
+        )
+
+    async def acreate_charge_sale(self, user: User, phone_number: str, amount: Decimal) -> ChargeSale:
+        if amount <= 0:
+            raise ValidationError("Amount must be positive")
+        if amount < Decimal('1000.00'):
+            raise ValidationError("Minimum charge amount is 1000")
+
+        # Wallet existence and status are checked by the transfer script
+        target_user = await UserService.aget_or_create_receiver(phone_number)
+
+        charge_sale = ChargeSale(
+            id=uuid.uuid4(),
+            user=user,
+            phone_number=phone_number,
+            amount=amount,
+            status=ChargeSaleTypeEnums.PENDING
+        )
+        if not self.write_behind:
+            await charge_sale.asave(force_insert=True)
+
+        try:
+            seller_entry, target_entry = await self.atransfer(
+                user.id,
+                target_user.id,
+                amount,
+                reference_id=str(charge_sale.id),
+                seller_description=f"Charge sale deduction to {phone_number}",
+                target_description=f"Charge sale credit from {user.phone_number}",
+                event_type=WalletEventTypes.CHARGE_SALE if self.write_behind else None,
+                event_meta={"phone_number": phone_number},
+            )
+        except Exception as e:
+            charge_sale.status = ChargeSaleTypeEnums.FAILED
+            if self.write_behind:
+                await charge_sale.asave(force_insert=True)
+            else:
+                await charge_sale.asave(update_fields=['status', 'updated_at'])
+            logger.error(f"Charge sale failed: {charge_sale.id} - {str(e)}")
+            raise WalletServiceException(f"Charge sale failed: {str(e)}")
+
+        if self.write_behind:
+            charge_sale.status = ChargeSaleTypeEnums.COMPLETED
+            logger.info(f"Charge sale committed to Redis, DB write deferred: {charge_sale.id}")
+            return charge_sale
+
+        try:
+            await sync_to_async(self.atomic_service._record_charge_sale)(
+                charge_sale, user, target_user, seller_entry, target_entry
+            )
+        except Exception as e:
+            # Rollback Redis
+            await self.areverse_transfer(user.id, target_user.id, amount, seller_entry, target_entry)
+            ROLLBACKS.labels("charge_sale").inc()
+            charge_sale.status = ChargeSaleTypeEnums.FAILED
+            await charge_sale.asave(update_fields=['status', 'updated_at'])
+            logger.error(f"Charge sale failed with rollback: {charge_sale.id} - {str(e)}")
+            raise WalletServiceException(f"Charge sale failed: {str(e)}")
+
+        logger.info(f"Charge sale completed: {charge_sale.id}")
+        return charge_sale
+
+    async def acreate_credit_request(self, user: User, amount: Decimal) -> CreditRequest:
+        if Decimal(amount) < Decimal('1000.00'):
+            raise ValidationError("Minimum credit request amount is 1000")
+        credit_request = await CreditRequest.objects.acreate(
+            user=user,
+            amount=amount,
+            status=CreditRequestStatusEnums.WAITING
+        )
+        await pending_credit_requests.aadded(credit_request)
+        logger.info(f"Credit request created: {credit_request.id} for user {user.id}")
+        return credit_request
+
+    async def areject_credit_request(self, credit_request_id: int, admin_user: User) -> None:
+        rejected = await CreditRequest.objects.filter(
+            id=credit_request_id,
+            status=CreditRequestStatusEnums.WAITING
+        ).aupdate(status=CreditRequestStatusEnums.REJECTED, admin=admin_user, updated_at=timezone.now())
+        if not rejected:
+            raise ValidationError("Credit request not found or already processed")
+        await pending_credit_requests.aremoved([await CreditRequest.objects.only("amount").aget(id=credit_request_id)])
+        logger.info(f"Credit request rejected: {credit_request_id} by admin {admin_user.id}")
+
+    async def aapprove_credit_request(self, credit_request_id: int, admin_user: User) -> CreditRequest:
+        """Approve a credit request without wallet locks.
+
+        The transfer script checks and moves the admin's funds atomically, and the
+        request is claimed (WAITING -> ACCEPTED) in the same DB transaction that
+        records it, so a concurrent second approval fails there and is reversed.
+        """
+        try:
+            credit_request = await CreditRequest.objects.select_related('user').aget(
+                id=credit_request_id,
+                status=CreditRequestStatusEnums.WAITING
+            )
+        except CreditRequest.DoesNotExist:
+            raise ValidationError("Credit request not found or already processed")
+
+        user = credit_request.user
+        admin_wallet = await self.aget_or_create_wallet(admin_user)
+        user_wallet = await self.aget_or_create_wallet(user)
+
+        if admin_wallet.status != WalletStatusEnums.ACTIVE:
+            raise WalletInactiveException("Admin wallet is not active")
+        if user_wallet.status != WalletStatusEnums.ACTIVE:
+            raise WalletInactiveException("User wallet is not active")
+
+        try:
+            if admin_user.id == user.id:
+                return await self._aapprove_self_credit_request(credit_request, admin_user)
+            return await self._aapprove_credit_transfer(credit_request, admin_user)
+        except Exception:
+            # Same end state as the sync service: a request whose approval failed is FAILED
+            await sync_to_async(AtomicWalletService._mark_credit_request_failed)(credit_request)
+            raise
+
+    async def _aapprove_credit_transfer(self, credit_request: CreditRequest, admin_user: User) -> CreditRequest:
+        user = credit_request.user
+        amount = credit_request.amount
+        admin_entry, user_entry = await self.atransfer(
+            admin_user.id,
+            user.id,
+            amount,
+            reference_id=str(credit_request.id),
+            seller_description=f"Transfer to user {user.id} for credit request",
+            target_description=f"Credit increase from admin {admin_user.id}",
+        )
+        try:
+            await sync_to_async(self._record_credit_approval)(credit_request, admin_user, [
+                (admin_user, TransactionTypeEnums.CHARGE_SALE, admin_entry),
+                (user, TransactionTypeEnums.CREDIT_INCREASE, user_entry),
+            ])
+        except Exception as e:
+            await self.areverse_transfer(admin_user.id, user.id, amount, admin_entry, user_entry)
+            ROLLBACKS.labels("credit_approval").inc()
+            logger.error(f"Credit approval failed with rollback: {credit_request.id} - {str(e)}")
+            raise WalletServiceException(f"Credit approval failed: {str(e)}")
+
+        logger.info(f"Credit approval completed: {credit_request.id}")
+        return credit_request
+
+    async def _aapprove_self_credit_request(self, credit_request: CreditRequest, admin_user: User) -> CreditRequest:
+        # No balance change for self-transfer, only the ledger entry
+        user = credit_request.user
+        balance = await self.aget_wallet_balance(user.id)
+        if balance < credit_request.amount:
+            raise InsufficientBalanceException("Insufficient balance for self-transfer")
+
+        user_trans_key = f"transactions:user:{user.id}"
+        user_trans_json = json.dumps(AtomicWalletService._ledger_entry(
+            Decimal('0.00'), balance, balance,
+            str(credit_request.id), f"Self-transfer for credit request {credit_request.id}",
+        ))
+        client = get_async_wallet_redis_client()
+        await client.rpush(user_trans_key, user_trans_json)
+        try:
+            await sync_to_async(self._record_credit_approval)(credit_request, admin_user, [
+                (user, TransactionTypeEnums.CREDIT_INCREASE, user_trans_json),
+            ])
+        except Exception as e:
+            await client.lrem(user_trans_key, 1, user_trans_json)
+            logger.error(f"Credit approval (self-transfer) failed with rollback: {credit_request.id} - {str(e)}")
+            raise WalletServiceException(f"Credit approval failed: {str(e)}")
+
+        logger.info(f"Credit approval (self-transfer) completed: {credit_request.id}")
+        return credit_request
+
+    @staticmethod
+    def _record_credit_approval(credit_request: CreditRequest, admin_user: User, entries: list) -> None:
+        """Claim the request and write its ``(user, transaction_type, ledger_entry)`` rows in one transaction."""
+        transactions = []
+        deltas = []
+        for owner, transaction_type, entry in entries:
+            trans = json.loads(entry)
+            amount = from_minor(trans['amount_minor'])
+            transactions.append(Transaction(
+                id=uuid.UUID(trans['id']),
+                seller=owner,
+                transaction_type=transaction_type,
+                amount=amount,
+                balance_before=from_minor(trans['balance_before_minor']),
+                balance_after=from_minor(trans['balance_after_minor']),
+                reference_id=str(credit_request.id),
+                description=trans['description'],
+                admin_user=admin_user
+            ))
+            if amount:
+                deltas.append((owner.id, amount))
+
+        approved_at = timezone.now()
+        with transaction.atomic():
+            claimed = CreditRequest.objects.filter(
+                id=credit_request.id,
+                status=CreditRequestStatusEnums.WAITING
+            ).update(status=CreditRequestStatusEnums.ACCEPTED, admin=admin_user, approved_at=approved_at,
+                     updated_at=approved_at)
+            if not claimed:
+                raise ValidationError("Credit request not found or already processed")
+            Transaction.objects.bulk_create(transactions)
+            if deltas:
+                Wallet.objects.apply_balance_deltas(deltas)
+            pending_credit_requests.removed([credit_request])
+        credit_request.status = CreditRequestStatusEnums.ACCEPTED
+        credit_request.admin = admin_user
+        credit_request.approved_at = approved_at
+
+
+class AsyncWalletService:
+    """Async entry points used by the ASGI views, mirroring ``WalletService``."""
+
+    def __init__(self):
+        self.atomic_service = AsyncAtomicWalletService()
+
+    async def create_charge_sale(self, user: User, phone_number: str, amount: Decimal) -> ChargeSale:
+        try:
+            return await self.atomic_service.acreate_charge_sale(user, phone_number, amount)
+        except Exception as e:
+            logger.error(f"Charge sale failed for user {user.id}: {str(e)}")
+            raise WalletServiceException(f"Charge sale failed: {str(e)}")
+
+    async def create_credit_request(self, user: User, amount: Decimal) -> CreditRequest:
+        return await self.atomic_service.acreate_credit_request(user, amount)
+
+    async def approve_credit_request_single(self, credit_request_id: int, admin_user: User) -> CreditRequest:
+        try:
+            return await self.atomic_service.aapprove_credit_request(credit_request_id, admin_user)
+        except Exception as e:
+            logger.error(f"Credit approval failed for request {credit_request_id}: {str(e)}")
+            raise WalletServiceException(f"Credit approval failed: {str(e)}")
+
+    async def reject_credit_request(self, credit_request_id: int, admin_user: User) -> None:
+        await self.atomic_service.areject_credit_request(credit_request_id, admin_user)
@@ -0,0 +1,42 @@
+import threading
+from wallet.services.metrics import BALANCE_CACHE_LOOKUPS
+
+
+class BalanceCacheStats:
+    """Hit and miss counts for the ``wallet:user:{id}`` hashes in this process.
+
+    A hit is a wallet lookup that found its hash loaded, a miss one that found
+    it missing and had to reload it from Postgres. Misses should only follow a
+    Redis restart or flush; a steady miss rate means wallet state is being lost.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hits: int = 0, misses: int = 0) -> None:
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+        if hits:
+            BALANCE_CACHE_LOOKUPS.labels("hit").inc(hits)
+        if misses:
+            BALANCE_CACHE_LOOKUPS.labels("miss").inc(misses)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 6) if lookups else None,
+            }
+
+
+balance_cache_stats = BalanceCacheStats()
@@ -0,0 +1,26 @@
+from decimal import Decimal
+from typing import Optional
+
+# Balances live in ``wallet:user:{id}`` as integers of minor units (rials x 100)
+# so Redis can update them with HINCRBY. Wallets written before the switch
+# still carry a decimal string in ``balance`` until they are upgraded.
+BALANCE_FIELD = "balance_minor"
+LEGACY_BALANCE_FIELD = "balance"
+MINOR_UNITS = 100
+# Mirror of ``Wallet.status``, written through on save
+STATUS_FIELD = "status"
+
+
+def to_minor(amount: Decimal) -> int:
+    return int((Decimal(amount) * MINOR_UNITS).to_integral_value())
+
+
+def from_minor(value) -> Decimal:
+    return (Decimal(int(value)) / MINOR_UNITS).quantize(Decimal("0.01"))
+
+
+def decode_balance(minor: Optional[str], legacy: Optional[str]) -> Decimal:
+    """Decode a wallet hash read as ``HMGET key balance_minor balance``."""
+    if minor is not None:
+        return from_minor(minor)
+    return Decimal(legacy).quantize(Decimal("0.01")) if legacy else Decimal("0.00")
@@ -0,0 +1,231 @@
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+import json
+import logging
+import math
+import random
+import threading
+import time
+from typing import NamedTuple, Optional
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from infrastructure.database.redis.redis import wallet_redis_client
+from user.enums import UserTypeEnums
+from wallet.enums import CreditRequestStatusEnums
+from wallet.models import CreditRequest, Wallet
+from wallet.services.balance_cache import balance_cache_stats
+from wallet.services.balance_codec import BALANCE_FIELD, to_minor
+from wallet.services.contention_stats import contention_stats
+from wallet.services.wallet_service import WalletService
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+HOT_SELLER = "hot_seller"
+MANY_SELLERS = "many_sellers"
+SKEWED_RECEIVERS = "skewed_receivers"
+MIXED_APPROVALS = "mixed_approvals"
+SCENARIOS = (HOT_SELLER, MANY_SELLERS, SKEWED_RECEIVERS, MIXED_APPROVALS)
+
+CHARGE_SALE = "charge_sale"
+APPROVAL = "approval"
+
+# Benchmark users live in their own phone number ranges so reruns reuse them
+SELLER_PREFIX = "0891"
+RECEIVER_PREFIX = "0892"
+ADMIN_PHONE_NUMBER = "08930000000"
+
+
+class Operation(NamedTuple):
+    kind: str
+    seller: Optional[User] = None
+    phone_number: Optional[str] = None
+    amount: Optional[Decimal] = None
+    credit_request_id: Optional[int] = None
+
+
+def percentile(sorted_values: list[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def latency_summary(seconds: list[float]) -> dict:
+    values = sorted(seconds)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3),
+    }
+
+
+class WalletBenchmark:
+    """Drives charge sales (and credit approvals) at the wallet engine and measures them.
+
+    Operations are generated up front from ``seed`` so two runs of the same
+    scenario issue the same workload, then executed by ``concurrency``
+    threads, either in-process through ``WalletService`` or over HTTP against
+    ``base_url``. Scenarios:
+
+    - ``hot_seller``: every sale comes from one seller
+    - ``many_sellers``: sellers and receivers picked uniformly
+    - ``skewed_receivers``: receivers picked from a Pareto distribution (``skew``)
+    - ``mixed_approvals``: ``many_sellers`` with ``approval_ratio`` of the
+      operations being admin credit approvals
+
+    Setup creates the benchmark users and gives them large balances directly
+    in the DB and Redis, so only run it against a local stack.
+    """
+
+    def __init__(self, scenario: str, operations: int = 1000, concurrency: int = 16, sellers: int = 100,
+                 receivers: int = 1000, skew: float = 1.2, approval_ratio: float = 0.1,
+                 base_url: Optional[str] = None, seed: int = 0):
+        if scenario not in SCENARIOS:
+            raise ValueError(f"Unknown scenario {scenario!r}, expected one of {', '.join(SCENARIOS)}")
+        self.scenario = scenario
+        self.operations = operations
+        self.concurrency = concurrency
+        self.sellers = 1 if scenario == HOT_SELLER else sellers
+        self.receivers = receivers
+        self.skew = skew
+        self.approval_ratio = approval_ratio if scenario == MIXED_APPROVALS else 0
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self.random = random.Random(seed)
+        self.seed = seed
+        self.wallet_service = WalletService()
+
+    def setup(self) -> list[Operation]:
+        approvals = sum(1 for _ in range(self.operations) if self.random.random() < self.approval_ratio)
+        sellers = self._users([f"{SELLER_PREFIX}{index:07d}" for index in range(self.sellers)], UserTypeEnums.SELLER)
+        admin = self._users([ADMIN_PHONE_NUMBER], UserTypeEnums.ADMIN)[0]
+        self._fund(sellers + [admin])
+        self.admin = admin
+        credit_requests = CreditRequest.objects.bulk_create([
+            CreditRequest(user=self.random.choice(sellers), amount=Decimal("1000"), status=CreditRequestStatusEnums.WAITING)
+            for _ in range(approvals)
+        ])
+
+        operations = [Operation(APPROVAL, credit_request_id=credit_request.id) for credit_request in credit_requests]
+        for _ in range(self.operations - approvals):
+            operations.append(Operation(
+                CHARGE_SALE,
+                seller=self.random.choice(sellers),
+                phone_number=self._receiver_phone_number(),
+                amount=Decimal(self.random.choice((1000, 2000, 5000, 10000))),
+            ))
+        self.random.shuffle(operations)
+        return operations
+
+    @staticmethod
+    def _users(phone_numbers: list[str], user_type: int) -> list[User]:
+        existing = {user.phone_number: user for user in User.objects.filter(phone_number__in=phone_numbers)}
+        User.objects.bulk_create([
+            User(phone_number=phone_number, password="benchmark", user_type=user_type)
+            for phone_number in phone_numbers if phone_number not in existing
+        ])
+        users = {user.phone_number: user for user in User.objects.filter(phone_number__in=phone_numbers)}
+        return [users[phone_number] for phone_number in phone_numbers]
+
+    def _fund(self, users: list[User], balance: Decimal = Decimal("1000000000")) -> None:
+        for user in users:
+            self.wallet_service.get_or_create_wallet(user)
+        Wallet.objects.filter(user__in=users).update(balance=balance)
+        with wallet_redis_client.pipeline(transaction=False) as pipe:
+            for user in users:
+                pipe.hset(f"wallet:user:{user.id}", BALANCE_FIELD, to_minor(balance))
+            pipe.execute()
+
+    def _receiver_phone_number(self) -> str:
+        if self.scenario == SKEWED_RECEIVERS:
+            index = min(int(self.random.paretovariate(self.skew)) - 1, self.receivers - 1)
+        else:
+            index = self.random.randrange(self.receivers)
+        return f"{RECEIVER_PREFIX}{index:07d}"
+
+    def run(self) -> dict:
+        operations = self.setup()
+        latencies = defaultdict(list)
+        errors = Counter()
+        results_lock = threading.Lock()
+        balance_cache_stats.reset()
+        contention_stats.reset()
+
+        def execute(operation: Operation) -> None:
+            started = time.perf_counter()
+            error = None
+            try:
+                if self.base_url:
+                    self._execute_http(operation)
+                else:
+                    self._execute(operation)
+            except Exception as e:
+                error = f"{operation.kind}:{e if self.base_url else type(e).__name__}"
+            elapsed = time.perf_counter() - started
+            with results_lock:
+                latencies[operation.kind].append(elapsed)
+                if error:
+                    errors[error] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.concurrency, "wallet_benchmark") as executor:
+            list(executor.map(execute, operations))
+        duration = time.perf_counter() - started
+
+        report = {
+            "scenario": self.scenario,
+            "mode": "http" if self.base_url else "in_process",
+            "parameters": {
+                "operations": self.operations,
+                "concurrency": self.concurrency,
+                "sellers": self.sellers,
+                "receivers": self.receivers,
+                "skew": self.skew if self.scenario == SKEWED_RECEIVERS else None,
+                "approval_ratio": self.approval_ratio,
+                "seed": self.seed,
+            },
+            "duration_seconds": round(duration, 6),
+            "throughput_ops": round(len(operations) / duration, 3) if duration else None,
+            "errors": dict(errors),
+            "latency": latency_summary([value for values in latencies.values() for value in values]),
+            "latency_by_operation": {kind: latency_summary(values) for kind, values in latencies.items()},
+        }
+        if not self.base_url:
+            # Only meaningful when the engine runs in this process
+            report["contention"] = contention_stats.stats()
+            report["balance_cache"] = balance_cache_stats.stats()
+        return report
+
+    def _execute(self, operation: Operation) -> None:
+        if operation.kind == APPROVAL:
+            self.wallet_service.approve_credit_request_single(operation.credit_request_id, self.admin)
+        else:
+            self.wallet_service.create_charge_sale(operation.seller, operation.phone_number, operation.amount)
+
+    def _execute_http(self, operation: Operation) -> None:
+        if operation.kind == APPROVAL:
+            path = reverse("process credit request")
+            payload = {"phone_number": self.admin.phone_number, "credit_id": operation.credit_request_id,
+                       "status": CreditRequestStatusEnums.ACCEPTED.value}
+        else:
+            path = reverse("charge sale")
+            payload = {"seller_phone_number": operation.seller.phone_number,
+                       "receiver_phone_number": operation.phone_number, "amount": str(operation.amount)}
+        request = Request(self.base_url + path, data=json.dumps(payload).encode(),
+                          headers={"Content-Type": "application/json"}, method="POST")
+        try:
+            with urlopen(request, timeout=30) as response:
+                response.read()
+        except HTTPError as e:
+            raise RuntimeError(f"HTTP {e.code}") from e
+        except URLError as e:
+            raise ConnectionError(str(e.reason)) from e
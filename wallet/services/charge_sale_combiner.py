@@ -0,0 +1,70 @@
+from concurrent.futures import Future
+from decimal import Decimal
+import logging
+import threading
+from django.contrib.auth import get_user_model
+from wallet.models import ChargeSale
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+
+class _PendingBatch:
+    def __init__(self):
+        self.items = []
+        self.full = threading.Event()
+
+
+class ChargeSaleCombiner:
+    """Group-commits concurrent charge sales from the same seller.
+
+    The first caller for a seller becomes the batch leader: it waits up to
+    ``window`` seconds (or until ``max_batch`` sales are queued), then applies
+    the whole batch through ``create_charge_sales_batch_atomic``. That is one
+    Redis script running the sales in arrival order, so insufficient balance
+    hits the latest sales first, and one DB transaction, or none with
+    write-behind. Every caller gets back its own ``ChargeSale`` or error.
+    """
+
+    def __init__(self, atomic_service, window: float = 0.002, max_batch: int = 100):
+        self.atomic_service = atomic_service
+        self.window = window
+        self.max_batch = max_batch
+        self._mutex = threading.Lock()
+        self._pending = {}
+
+    def submit(self, user: User, phone_number: str, amount: Decimal) -> ChargeSale:
+        future = Future()
+        with self._mutex:
+            batch = self._pending.get(user.id)
+            is_leader = batch is None
+            if is_leader:
+                batch = self._pending[user.id] = _PendingBatch()
+            batch.items.append((phone_number, amount, future))
+            if len(batch.items) >= self.max_batch:
+                batch.full.set()
+
+        if is_leader:
+            batch.full.wait(self.window)
+            with self._mutex:
+                # later arrivals start the next batch
+                del self._pending[user.id]
+            self._apply(user, batch.items)
+        return future.result()
+
+    def _apply(self, user: User, items: list) -> None:
+        try:
+            results = self.atomic_service.create_charge_sales_batch_atomic(
+                user, [(phone_number, amount) for phone_number, amount, _ in items]
+            )
+        except Exception as e:
+            for _, _, future in items:
+                future.set_exception(e)
+            return
+
+        for (_, _, future), result in zip(items, results):
+            if result.error is not None:
+                future.set_exception(result.error)
+            else:
+                future.set_result(result.charge_sale)
+        logger.info(f"Group-committed {len(items)} charge sales for seller {user.id}")
@@ -0,0 +1,201 @@
+from datetime import timedelta
+from decimal import Decimal
+import logging
+import threading
+import time
+from typing import Optional
+import uuid
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+from infrastructure.database.redis.redis import wallet_redis_client
+from wallet.core.exceptions.wallet_exceptions import ValidationError, WalletServiceException
+from wallet.enums import ChargeSaleTypeEnums
+from wallet.models import ChargeSale
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+
+class ChargeSaleQueue:
+    """Redis work queue for charge sales accepted ahead of execution.
+
+    ``enqueue`` saves the sale as PENDING and returns at once; workers take
+    jobs with ``BLMOVE`` into a per-worker processing list, so a job is never
+    lost between being taken and being finished. Each sale's status is also
+    kept in ``charge_sale:status:{id}`` for ``status_ttl`` seconds, which lets
+    status polls skip Postgres.
+    """
+
+    def __init__(self, status_ttl: int = 300):
+        self.redis_client = wallet_redis_client
+        self.queue_key = settings.WALLET_CHARGE_SALE_QUEUE
+        self.status_ttl = status_ttl
+
+    def processing_key(self, worker_name: str) -> str:
+        return f"{self.queue_key}:processing:{worker_name}"
+
+    def enqueue(self, user: User, phone_number: str, amount: Decimal) -> ChargeSale:
+        if amount <= 0:
+            raise ValidationError("Amount must be positive")
+        if amount < Decimal('1000.00'):
+            raise ValidationError("Minimum charge amount is 1000")
+        charge_sale = ChargeSale.objects.create(
+            id=uuid.uuid4(),
+            user=user,
+            phone_number=phone_number,
+            amount=amount,
+            status=ChargeSaleTypeEnums.PENDING
+        )
+        try:
+            with self.redis_client.pipeline(transaction=False) as pipe:
+                self._set_status(pipe, charge_sale.id, ChargeSaleTypeEnums.PENDING)
+                pipe.lpush(self.queue_key, str(charge_sale.id))
+                pipe.execute()
+        except Exception as e:
+            charge_sale.status = ChargeSaleTypeEnums.FAILED
+            charge_sale.save(update_fields=['status', 'updated_at'])
+            logger.error(f"Charge sale could not be queued: {charge_sale.id} - {str(e)}")
+            raise WalletServiceException(f"Charge sale failed: {str(e)}")
+        logger.info(f"Charge sale queued: {charge_sale.id}")
+        return charge_sale
+
+    def get_status(self, charge_sale_id: uuid.UUID) -> Optional[dict]:
+        """Status of a sale from Redis, falling back to the DB once the cached entry expired."""
+        cached = self.redis_client.hgetall(f"charge_sale:status:{charge_sale_id}")
+        if cached:
+            return {"code": charge_sale_id, "status": int(cached["status"]), "error": cached.get("error") or None}
+        status = ChargeSale.objects.filter(id=charge_sale_id).values_list("status", flat=True).first()
+        if status is None:
+            return None
+        return {"code": charge_sale_id, "status": status, "error": None}
+
+    def set_status(self, charge_sale_id: uuid.UUID, status: int, error: str = "") -> None:
+        with self.redis_client.pipeline(transaction=False) as pipe:
+            self._set_status(pipe, charge_sale_id, status, error)
+            pipe.execute()
+
+    def _set_status(self, pipe, charge_sale_id: uuid.UUID, status: int, error: str = "") -> None:
+        key = f"charge_sale:status:{charge_sale_id}"
+        pipe.hset(key, mapping={"status": int(status), "error": error})
+        pipe.expire(key, self.status_ttl)
+
+
+class ChargeSaleWorker:
+    """Pool of threads that drain ``ChargeSaleQueue`` through ``process_queued_charge_sale``.
+
+    A worker that dies between claiming a sale and recording it leaves the
+    sale PENDING with a claim that blocks every redelivery. Every
+    ``reap_interval`` seconds (and once at start) claims older than
+    ``claim_timeout`` seconds on PENDING sales are released: the sale is
+    requeued if no money moved, otherwise its transfer is reversed and it
+    is marked FAILED. ``claim_timeout`` must stay well above the time one
+    sale takes.
+    """
+
+    def __init__(self, atomic_service, queue: ChargeSaleQueue, name: str, threads: int = 10,
+                 block_timeout: float = 1.0, claim_timeout: float = 600, reap_interval: float = 60):
+        self.atomic_service = atomic_service
+        self.queue = queue
+        self.name = name
+        self.threads = threads
+        self.block_timeout = block_timeout
+        self.claim_timeout = claim_timeout
+        self.reap_interval = reap_interval
+        self._stopping = threading.Event()
+
+    def run(self, once: bool = False) -> None:
+        self._reap()
+        workers = [
+            threading.Thread(target=self._work, args=(f"{self.name}-{index}", once), name=f"charge_sale_worker_{index}")
+            for index in range(self.threads)
+        ]
+        if not once:
+            workers.append(threading.Thread(target=self._reap_periodically, name="charge_sale_reaper"))
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def _work(self, worker_name: str, once: bool) -> None:
+        client = self.queue.redis_client
+        processing_key = self.queue.processing_key(worker_name)
+        # Requeue jobs this worker slot took before it last stopped
+        while client.lmove(processing_key, self.queue.queue_key, "RIGHT", "RIGHT"):
+            pass
+        while not self._stopping.is_set():
+            charge_sale_id = client.blmove(self.queue.queue_key, processing_key, self.block_timeout, "RIGHT", "LEFT")
+            if charge_sale_id is None:
+                if once:
+                    return
+                continue
+            try:
+                self.process(uuid.UUID(charge_sale_id))
+            finally:
+                client.lrem(processing_key, 1, charge_sale_id)
+                close_old_connections()
+
+    def _reap_periodically(self) -> None:
+        while not self._stopping.wait(self.reap_interval):
+            self._reap()
+            close_old_connections()
+
+    def _reap(self) -> None:
+        try:
+            requeued, failed = self.reap()
+        except Exception:
+            logger.exception("Reaping abandoned charge sales failed")
+            return
+        if requeued or failed:
+            logger.info(f"Reaped abandoned charge sales: {requeued} requeued, {failed} failed")
+
+    def reap(self, limit: int = 500) -> tuple[int, int]:
+        """Release claims older than ``claim_timeout`` on PENDING sales. Returns (requeued, failed)."""
+        # A sale is claimed after it was queued, so only sales queued before the cutoff can hold a stale claim
+        sales = list(ChargeSale.objects.filter(
+            status=ChargeSaleTypeEnums.PENDING,
+            updated_at__lt=timezone.now() - timedelta(seconds=self.claim_timeout),
+        ).order_by("updated_at")[:limit])
+        if not sales:
+            return 0, 0
+        claimed_at = self.queue.redis_client.mget([self.atomic_service.charge_sale_claim_key(sale.id) for sale in sales])
+        cutoff = time.time() - self.claim_timeout
+        requeued = failed = 0
+        for sale, claimed in zip(sales, claimed_at):
+            if claimed is None or float(claimed) >= cutoff:
+                continue
+            outcome = self.atomic_service.release_stale_claim(sale)
+            if outcome == ChargeSaleTypeEnums.PENDING:
+                self.queue.redis_client.lpush(self.queue.queue_key, str(sale.id))
+                requeued += 1
+            elif outcome == ChargeSaleTypeEnums.FAILED:
+                self.queue.set_status(sale.id, ChargeSaleTypeEnums.FAILED, "Worker stopped before the sale completed")
+                failed += 1
+        return requeued, failed
+
+    def process(self, charge_sale_id: uuid.UUID) -> None:
+        try:
+            charge_sale = self.atomic_service.process_queued_charge_sale(charge_sale_id)
+        except ChargeSale.DoesNotExist:
+            logger.warning(f"Queued charge sale {charge_sale_id} does not exist")
+        except APIException as e:
+            self.queue.set_status(charge_sale_id, ChargeSaleTypeEnums.FAILED, self._error_message(e))
+        except Exception:
+            # Outcome unknown (e.g. the DB went away); the sale stays PENDING for reconciliation
+            logger.exception(f"Queued charge sale {charge_sale_id} failed")
+        else:
+            if charge_sale is not None:
+                self.queue.set_status(charge_sale_id, charge_sale.status)
+
+    @staticmethod
+    def _error_message(error: APIException) -> str:
+        # The service wraps the original error ("Charge sale failed: ..."); report the original
+        while isinstance(error.__context__, APIException):
+            error = error.__context__
+        detail = error.detail
+        return str(detail[0] if isinstance(detail, list) else detail)
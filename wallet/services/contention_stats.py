@@ -0,0 +1,54 @@
+import threading
+from wallet.services.metrics import LOCK_HOLD_SECONDS, LOCK_WAIT_SECONDS, WATCH_CONFLICTS
+
+
+class ContentionStats:
+    """Lock waits and optimistic-concurrency retries in this process.
+
+    A lock wait is the time ``dual_wallet_lock`` spent acquiring the
+    application and Redis locks, whether or not it got them; a timeout is a
+    wait that gave up. A retry is a transfer re-run after a WATCH conflict.
+    Everything is also exported to Prometheus, see ``wallet.services.metrics``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.lock_acquisitions = 0
+        self.lock_timeouts = 0
+        self.lock_wait_seconds = 0.0
+        self.watch_retries = 0
+
+    def record_lock_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.lock_acquisitions += 1
+            self.lock_wait_seconds += seconds
+            if timed_out:
+                self.lock_timeouts += 1
+        LOCK_WAIT_SECONDS.labels("timeout" if timed_out else "acquired").observe(seconds)
+
+    def record_lock_hold(self, seconds: float) -> None:
+        LOCK_HOLD_SECONDS.observe(seconds)
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self.watch_retries += 1
+        WATCH_CONFLICTS.inc()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.lock_acquisitions = 0
+            self.lock_timeouts = 0
+            self.lock_wait_seconds = 0.0
+            self.watch_retries = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "lock_acquisitions": self.lock_acquisitions,
+                "lock_timeouts": self.lock_timeouts,
+                "lock_wait_seconds": round(self.lock_wait_seconds, 6),
+                "watch_retries": self.watch_retries,
+            }
+
+
+contention_stats = ContentionStats()
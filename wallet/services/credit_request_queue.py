@@ -0,0 +1,120 @@
+import base64
+from datetime import datetime
+from decimal import Decimal
+import logging
+from typing import Optional
+from django.db import transaction
+from django.db.models import Count, Sum
+from infrastructure.database.redis.redis import get_async_redis_client, redis_client
+from wallet.core.exceptions.wallet_exceptions import ValidationError
+from wallet.enums import CreditRequestStatusEnums
+from wallet.models import CreditRequest
+from wallet.services.balance_codec import from_minor, to_minor
+from wallet.services.redis_scripts import ADJUST_PENDING_SCRIPT, SEED_PENDING_SCRIPT
+
+logger = logging.getLogger(__name__)
+
+
+class PendingCreditRequests:
+    """The queue of WAITING credit requests shown to admins.
+
+    Pages are read by keyset on ``(created_at, id)`` through the partial
+    ``credit_request_waiting`` index, so a deep page costs the same as the
+    first. The count and sum of waiting requests live in a Redis hash that is
+    adjusted after each create, approval or rejection commits; the dashboard
+    never aggregates the table. While the hash is missing adjustments are
+    skipped and the next read rebuilds it from the waiting rows. It expires
+    after ``ttl`` seconds, which bounds the drift of a change that committed
+    during a rebuild.
+    """
+
+    KEY = "credit_request:pending"
+
+    def __init__(self, ttl: int = 3600):
+        self.redis_client = redis_client
+        self.ttl = ttl
+        self.adjust_script = self.redis_client.register_script(ADJUST_PENDING_SCRIPT)
+        self.seed_script = self.redis_client.register_script(SEED_PENDING_SCRIPT)
+
+    def added(self, credit_request: CreditRequest) -> None:
+        self._adjust(1, credit_request.amount)
+
+    def removed(self, credit_requests: list[CreditRequest]) -> None:
+        if credit_requests:
+            self._adjust(-len(credit_requests), -sum(credit_request.amount for credit_request in credit_requests))
+
+    def _adjust(self, count: int, amount: Decimal) -> None:
+        # Applied once the surrounding transaction commits, immediately outside one
+        transaction.on_commit(
+            lambda: self.adjust_script(keys=[self.KEY], args=[count, to_minor(amount)])
+        )
+
+    async def aadded(self, credit_request: CreditRequest) -> None:
+        await self._aadjust(1, credit_request.amount)
+
+    async def aremoved(self, credit_requests: list[CreditRequest]) -> None:
+        if credit_requests:
+            await self._aadjust(-len(credit_requests), -sum(credit_request.amount for credit_request in credit_requests))
+
+    async def _aadjust(self, count: int, amount: Decimal) -> None:
+        # The async ORM autocommits, so the change is already committed
+        script = get_async_redis_client().register_script(ADJUST_PENDING_SCRIPT)
+        await script(keys=[self.KEY], args=[count, to_minor(amount)])
+
+    def totals(self) -> dict:
+        """``{"count", "amount"}`` of the waiting requests, rebuilt from the DB if Redis lost them."""
+        cached = self.redis_client.hmget(self.KEY, "count", "amount_minor")
+        if cached[0] is None:
+            self.rebuild()
+            cached = self.redis_client.hmget(self.KEY, "count", "amount_minor")
+        return {"count": int(cached[0]), "amount": from_minor(cached[1])}
+
+    def rebuild(self) -> None:
+        aggregate = CreditRequest.objects.filter(status=CreditRequestStatusEnums.WAITING).aggregate(
+            count=Count("id"), amount=Sum("amount")
+        )
+        self.seed_script(
+            keys=[self.KEY],
+            args=[aggregate["count"], to_minor(aggregate["amount"] or Decimal("0.00")), self.ttl],
+        )
+        logger.info(f"Pending credit request totals rebuilt: {aggregate['count']} requests")
+
+    def page(self, after: Optional[str] = None, limit: int = 50, user_id: Optional[int] = None,
+             min_amount: Optional[Decimal] = None,
+             max_amount: Optional[Decimal] = None) -> tuple[list[CreditRequest], Optional[str]]:
+        """Waiting requests, oldest first, after the ``after`` cursor. Returns the page and the next cursor."""
+        queryset = CreditRequest.objects.filter(status=CreditRequestStatusEnums.WAITING)
+        if user_id is not None:
+            queryset = queryset.filter(user_id=user_id)
+        if min_amount is not None:
+            queryset = queryset.filter(amount__gte=min_amount)
+        if max_amount is not None:
+            queryset = queryset.filter(amount__lte=max_amount)
+        if after:
+            created_at, credit_request_id = self.decode_cursor(after)
+            # (created_at, id) > cursor, phrased so the index range scan starts at the cursor
+            queryset = queryset.filter(created_at__gte=created_at).exclude(
+                created_at=created_at, id__lte=credit_request_id
+            )
+        credit_requests = list(queryset.select_related("user").order_by("created_at", "id")[:limit + 1])
+        next_cursor = None
+        if len(credit_requests) > limit:
+            credit_requests = credit_requests[:limit]
+            next_cursor = self.encode_cursor(credit_requests[-1])
+        return credit_requests, next_cursor
+
+    @staticmethod
+    def encode_cursor(credit_request: CreditRequest) -> str:
+        raw = f"{credit_request.created_at.isoformat()}|{credit_request.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> tuple[datetime, int]:
+        try:
+            created_at, credit_request_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+            return datetime.fromisoformat(created_at), int(credit_request_id)
+        except ValueError:
+            raise ValidationError("Invalid cursor")
+
+
+pending_credit_requests = PendingCreditRequests()
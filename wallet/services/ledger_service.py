@@ -0,0 +1,128 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+import json
+import logging
+import time
+from typing import NamedTuple
+import uuid
+from infrastructure.database.redis.redis import wallet_redis_client
+from wallet.models import Transaction
+from wallet.services.balance_codec import from_minor
+from wallet.services.redis_scripts import TRIM_LEDGER_SCRIPT
+
+logger = logging.getLogger(__name__)
+
+
+class LedgerEntry(NamedTuple):
+    id: uuid.UUID
+    amount: Decimal
+    balance_before: Decimal
+    balance_after: Decimal
+    reference_id: str
+    description: str
+    created_at: datetime
+
+
+def _entry_amount(entry: dict, field: str) -> Decimal:
+    minor = entry.get(f"{field}_minor")
+    if minor is not None:
+        return from_minor(minor)
+    # Legacy entries not yet rewritten by migrate_wallet_balances --ledgers
+    return Decimal(str(entry[field])).quantize(Decimal("0.01"))
+
+
+class LedgerService:
+    """A user's ledger, split between Redis and the ``Transaction`` table.
+
+    ``transactions:user:{id}`` only keeps a recent window: ``compact`` drops
+    entries beyond ``max_entries`` or older than ``max_age`` seconds from the
+    head of the list, and only those whose ``Transaction`` row already exists,
+    so nothing is dropped before it is durable. ``history`` reads both tiers.
+    """
+
+    def __init__(self, max_entries: int = 1000, max_age: int = 7 * 24 * 3600, batch_size: int = 1000):
+        self.redis_client = wallet_redis_client
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self.trim_script = self.redis_client.register_script(TRIM_LEDGER_SCRIPT)
+
+    @staticmethod
+    def key(user_id: int) -> str:
+        return f"transactions:user:{user_id}"
+
+    def history(self, user_id: int, limit: int = 50, offset: int = 0) -> list[LedgerEntry]:
+        """Ledger entries of ``user_id``, newest first.
+
+        Redis holds the newest entries in order; everything older than its
+        window has been compacted away and is read from ``Transaction``.
+        """
+        window = offset + limit
+        entries = [self._decode(raw) for raw in reversed(self.redis_client.lrange(self.key(user_id), -window, -1))]
+        if len(entries) < window:
+            older = (
+                Transaction.objects.filter(seller_id=user_id)
+                .exclude(id__in=[entry.id for entry in entries])
+                .order_by("-created_at", "-id")
+                .values_list("id", "amount", "balance_before", "balance_after", "reference_id", "description", "created_at")
+                [:window - len(entries)]
+            )
+            entries.extend(LedgerEntry(*row) for row in older)
+        return entries[offset:window]
+
+    def compact(self, user_id: int) -> int:
+        """Trim one ledger down to its window. Returns the number of entries dropped."""
+        key = self.key(user_id)
+        dropped = 0
+        while True:
+            length = self.redis_client.llen(key)
+            excess = length - self.max_entries
+            cutoff = time.time() - self.max_age
+            head = self.redis_client.lrange(key, 0, self.batch_size - 1)
+            candidates = []
+            for position, raw in enumerate(head):
+                entry = json.loads(raw)
+                if position >= excess and entry["timestamp"] >= cutoff:
+                    break
+                candidates.append((uuid.UUID(entry["id"]), raw))
+            if not candidates:
+                return dropped
+
+            durable = set(Transaction.objects.filter(id__in=[entry_id for entry_id, _ in candidates])
+                          .values_list("id", flat=True))
+            count = 0
+            for entry_id, _ in candidates:
+                if entry_id not in durable:
+                    break
+                count += 1
+            if count == 0:
+                return dropped
+            trimmed = int(self.trim_script(keys=[key], args=[count, candidates[count - 1][1]]))
+            dropped += trimmed
+            # Stop at a row not yet in Postgres, or when the ledger changed under us
+            if trimmed == 0 or count < len(candidates):
+                return dropped
+
+    def compact_all(self, scan_count: int = 1000) -> tuple[int, int]:
+        """Compact every ledger in Redis. Returns (ledgers scanned, entries dropped)."""
+        scanned = dropped = 0
+        for key in self.redis_client.scan_iter(match=self.key("*"), count=scan_count):
+            scanned += 1
+            try:
+                dropped += self.compact(int(key.rsplit(":", 1)[1]))
+            except Exception:
+                logger.exception(f"Failed to compact ledger {key}")
+        return scanned, dropped
+
+    @staticmethod
+    def _decode(raw: str) -> LedgerEntry:
+        entry = json.loads(raw)
+        return LedgerEntry(
+            id=uuid.UUID(entry["id"]),
+            amount=_entry_amount(entry, "amount"),
+            balance_before=_entry_amount(entry, "balance_before"),
+            balance_after=_entry_amount(entry, "balance_after"),
+            reference_id=entry["reference_id"],
+            description=entry["description"],
+            created_at=datetime.fromtimestamp(entry["timestamp"], tz=timezone.utc),
+        )
@@ -0,0 +1,64 @@
+from contextlib import contextmanager
+import os
+import time
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+# Prometheus metrics of the wallet engine.
+#
+# With PROMETHEUS_MULTIPROC_DIR set (see gunicorn.conf.py) every worker
+# process writes its samples to memory-mapped files in that directory and
+# /metrics sums them across workers, so any worker can answer a scrape.
+
+# Sub-millisecond Redis calls up to multi-second lock waits
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LOCK_WAIT_SECONDS = Histogram(
+    "wallet_lock_wait_seconds", "Time dual_wallet_lock spent acquiring the application and Redis locks",
+    ["result"], buckets=LATENCY_BUCKETS,
+)
+LOCK_HOLD_SECONDS = Histogram(
+    "wallet_lock_hold_seconds", "Time the wallet locks were held", buckets=LATENCY_BUCKETS,
+)
+WATCH_CONFLICTS = Counter(
+    "wallet_watch_conflicts_total", "Transfers re-run after a Redis WATCH conflict",
+)
+ROLLBACKS = Counter(
+    "wallet_rollbacks_total", "Transfers undone in Redis after a later step failed", ["operation"],
+)
+EXECUTOR_QUEUE_DEPTH = Gauge(
+    "wallet_executor_queue_depth", "Tasks submitted to WalletService.executor and not started yet",
+    multiprocess_mode="livesum",
+)
+REDIS_SECONDS = Histogram(
+    "wallet_redis_seconds", "Round trip of the wallet engine's Redis scripts and pipelines",
+    ["operation"], buckets=LATENCY_BUCKETS,
+)
+DB_COMMIT_SECONDS = Histogram(
+    "wallet_db_commit_seconds", "Time in the DB transaction recording a transfer, commit included",
+    ["operation"], buckets=LATENCY_BUCKETS,
+)
+BALANCE_CACHE_LOOKUPS = Counter(
+    "wallet_balance_cache_lookups_total", "Wallet lookups that found the Redis hash (hit) or reloaded it (miss)",
+    ["result"],
+)
+
+
+@contextmanager
+def observe(histogram: Histogram, **labels):
+    """Observe the duration of the block, also when it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        (histogram.labels(**labels) if labels else histogram).observe(time.perf_counter() - started)
+
+
+def render() -> tuple[bytes, str]:
+    """The exposition of every metric, summed across worker processes in multiprocess mode."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,104 @@
+from datetime import date, datetime, timezone
+import logging
+import re
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+class TransactionPartitionManager:
+    """Creates and detaches the monthly partitions of ``wallet_transaction``.
+
+    Partitions are named ``wallet_transaction_pYYYY_MM`` and cover one UTC
+    calendar month of ``created_at``. Rows outside every partition land in
+    ``wallet_transaction_default``, which should stay empty: creating a
+    partition has to scan it for rows in the new range.
+
+    The table's primary key is ``(id, created_at)``; every partition also
+    gets a unique index on ``id`` alone, so an id can't repeat within a month.
+    """
+
+    TABLE = "wallet_transaction"
+    PARTITION_NAME = re.compile(r"^wallet_transaction_p(\d{4})_(\d{2})$")
+
+    def partition_name(self, month: date) -> str:
+        return f"{self.TABLE}_p{month:%Y_%m}"
+
+    @staticmethod
+    def id_index_name(partition: str) -> str:
+        return f"{partition}_id_uniq"
+
+    def partitions(self) -> dict:
+        """Attached monthly partitions, ``{first day of month: table name}``."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE parent.relname = %s",
+                [self.TABLE],
+            )
+            names = [row[0] for row in cursor.fetchall()]
+        partitions = {}
+        for name in names:
+            match = self.PARTITION_NAME.match(name)
+            if match:
+                partitions[date(int(match[1]), int(match[2]), 1)] = name
+        return dict(sorted(partitions.items()))
+
+    def create_ahead(self, months_ahead: int = 3, today: date = None) -> list[str]:
+        """Make sure the current month and the next ``months_ahead`` have partitions. Returns those created.
+
+        Fails if a detached partition of the same name still exists.
+        """
+        today = today or datetime.now(timezone.utc).date()
+        current = today.replace(day=1)
+        existing = self.partitions()
+        created = []
+        for offset in range(months_ahead + 1):
+            month = _add_months(current, offset)
+            if month in existing:
+                continue
+            name = self.partition_name(month)
+            next_month = _add_months(month, 1)
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE TABLE {connection.ops.quote_name(name)} "
+                    f"PARTITION OF {connection.ops.quote_name(self.TABLE)} FOR VALUES FROM (%s) TO (%s)",
+                    [
+                        datetime(month.year, month.month, 1, tzinfo=timezone.utc),
+                        datetime(next_month.year, next_month.month, 1, tzinfo=timezone.utc),
+                    ],
+                )
+                cursor.execute(
+                    f"CREATE UNIQUE INDEX {connection.ops.quote_name(self.id_index_name(name))} "
+                    f"ON {connection.ops.quote_name(name)} (id)"
+                )
+            logger.info(f"Created partition {name}")
+            created.append(name)
+        return created
+
+    def detach_older_than(self, retain_months: int, today: date = None) -> list[str]:
+        """Detach partitions entirely before the last ``retain_months`` months. Returns those detached.
+
+        Detached partitions stay as standalone tables, to be archived and dropped.
+        """
+        today = today or datetime.now(timezone.utc).date()
+        cutoff = _add_months(today.replace(day=1), -retain_months)
+        detached = []
+        for month, name in self.partitions().items():
+            if _add_months(month, 1) > cutoff:
+                break
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f"ALTER TABLE {connection.ops.quote_name(self.TABLE)} "
+                    f"DETACH PARTITION {connection.ops.quote_name(name)}"
+                )
+            logger.info(f"Detached partition {name}")
+            detached.append(name)
+        return detached
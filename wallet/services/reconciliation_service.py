@@ -0,0 +1,263 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+import json
+import logging
+import time
+from typing import Callable, NamedTuple, Optional
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Sum
+from infrastructure.database.redis.redis import wallet_redis_client
+from wallet.models import ChargeSale, Transaction, Wallet
+from wallet.services.balance_codec import BALANCE_FIELD, LEGACY_BALANCE_FIELD, from_minor, to_minor
+from wallet.services.redis_scripts import REPAIR_BALANCE_SCRIPT
+from wallet.services.wallet_service import AtomicWalletService
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+# Redis balance differs from Wallet.balance plus the wallet's unflushed write-behind sales
+REDIS_DRIFT = "redis"
+# Wallet.balance differs from the sum of the user's Transaction amounts
+LEDGER_DRIFT = "ledger"
+
+
+class WalletDrift(NamedTuple):
+    user_id: int
+    kind: str
+    expected: Decimal
+    actual: Decimal
+    repaired: bool = False
+
+
+class ReconciliationResult(NamedTuple):
+    examined: int
+    not_loaded: int
+    drifts: list[WalletDrift]
+
+
+class WalletReconciler:
+    """Finds wallets whose Redis balance, ``Wallet.balance`` and ledger disagree.
+
+    Wallets are compared in batches ordered by user id, each costing one
+    indexed DB read (plus a grouped ``SUM`` with ``check_ledger``) in a single
+    snapshot and one pipelined ``HMGET``. Write-behind sales still in the
+    event stream are expected differences. A wallet that looks drifted in
+    Redis is read again after ``recheck_delay`` seconds with its row locked.
+    Redis commits a sale or approval before its DB transaction starts, so a
+    wallet whose recent Redis ledger (the last ``in_flight_window`` seconds)
+    holds an entry with neither a ``Transaction`` row nor a pending event is
+    still being written: it is skipped, never reported or repaired, and
+    checked again by the next run.
+
+    Progress is checkpointed in Redis after every batch: an interrupted run
+    resumes where it stopped, and an incremental run only examines wallets
+    touched since the last completed run started (less ``overlap`` seconds).
+    """
+
+    CHECKPOINT_KEY = "wallet:reconcile:checkpoint"
+
+    def __init__(self, batch_size: int = 10000, check_ledger: bool = False, repair: bool = False,
+                 recheck_delay: float = 1.0, overlap: int = 300, in_flight_window: int = 300,
+                 in_flight_entries: int = 100):
+        self.redis_client = wallet_redis_client
+        self.atomic_service = AtomicWalletService()
+        self.repair_script = self.redis_client.register_script(REPAIR_BALANCE_SCRIPT)
+        self.batch_size = batch_size
+        self.check_ledger = check_ledger
+        self.repair = repair
+        self.recheck_delay = recheck_delay
+        self.overlap = overlap
+        self.in_flight_window = in_flight_window
+        self.in_flight_entries = in_flight_entries
+
+    def run(self, full: bool = False,
+            on_batch: Optional[Callable[[int, int], None]] = None) -> ReconciliationResult:
+        """Reconcile every wallet (``full``, or the first run) or those touched since the last run.
+
+        ``on_batch(examined, drifted)`` is called after each batch. A run
+        resumed from a checkpoint keeps the mode it was started with.
+        """
+        checkpoint = self.redis_client.hgetall(self.CHECKPOINT_KEY)
+        if "cursor" in checkpoint:
+            started = float(checkpoint["run_started"])
+            full = checkpoint["mode"] == "full"
+            cursor = int(checkpoint["cursor"])
+            logger.info(f"Resuming {checkpoint['mode']} reconciliation after user {cursor}")
+        else:
+            started = time.time()
+            full = full or "since" not in checkpoint
+            cursor = 0
+            self.redis_client.hset(self.CHECKPOINT_KEY, mapping={
+                "run_started": started, "mode": "full" if full else "incremental", "cursor": cursor,
+            })
+
+        # Read before any wallet row, see AtomicWalletService.pending_event_deltas
+        pending = self.atomic_service.pending_event_deltas()
+        if full:
+            batches = self._all_batches(cursor)
+        else:
+            since = float(checkpoint["since"]) - self.overlap
+            batches = self._touched_batches(self._touched_user_ids(since, pending), cursor)
+
+        examined = not_loaded = 0
+        drifts = []
+        for user_ids in batches:
+            batch_drifts, batch_not_loaded = self._reconcile_batch(user_ids, pending)
+            examined += len(user_ids)
+            not_loaded += batch_not_loaded
+            drifts.extend(batch_drifts)
+            self.redis_client.hset(self.CHECKPOINT_KEY, "cursor", user_ids[-1])
+            if on_batch:
+                on_batch(examined, len(drifts))
+
+        with self.redis_client.pipeline() as pipe:
+            pipe.hdel(self.CHECKPOINT_KEY, "cursor", "run_started", "mode")
+            pipe.hset(self.CHECKPOINT_KEY, "since", started)
+            pipe.execute()
+        return ReconciliationResult(examined, not_loaded, drifts)
+
+    def _all_batches(self, cursor: int):
+        while True:
+            user_ids = list(
+                Wallet.objects.filter(user_id__gt=cursor).order_by("user_id")
+                .values_list("user_id", flat=True)[:self.batch_size]
+            )
+            if not user_ids:
+                return
+            yield user_ids
+            cursor = user_ids[-1]
+
+    def _touched_batches(self, user_ids: list[int], cursor: int):
+        user_ids = [user_id for user_id in user_ids if user_id > cursor]
+        for start in range(0, len(user_ids), self.batch_size):
+            yield user_ids[start:start + self.batch_size]
+
+    @staticmethod
+    def _touched_user_ids(since: float, pending: dict) -> list[int]:
+        """Users whose wallet, ledger or charge sales (either side) changed since ``since``."""
+        since = datetime.fromtimestamp(since, tz=timezone.utc)
+        touched = set(pending)
+        touched.update(Wallet.objects.filter(updated_at__gte=since).values_list("user_id", flat=True))
+        touched.update(Transaction.objects.filter(created_at__gte=since).values_list("seller_id", flat=True).distinct())
+        sales = ChargeSale.objects.filter(updated_at__gte=since)
+        touched.update(sales.values_list("user_id", flat=True).distinct())
+        # A failed sale whose rollback failed too leaves drift on the receiver, known only by phone number
+        touched.update(User.objects.filter(phone_number__in=sales.values("phone_number")).values_list("id", flat=True))
+        return sorted(touched)
+
+    def _reconcile_batch(self, user_ids: list[int], pending: dict) -> tuple[list[WalletDrift], int]:
+        with transaction.atomic():
+            # One snapshot for the balances, the settled sales and the ledger sums
+            with connection.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+            balances = dict(Wallet.objects.filter(user_id__in=user_ids).values_list("user_id", "balance"))
+            deltas = self.atomic_service.unsettled_deltas(
+                {user_id: pending[user_id] for user_id in balances if user_id in pending}
+            )
+            ledger_totals = {}
+            if self.check_ledger:
+                ledger_totals = dict(
+                    Transaction.objects.filter(seller_id__in=balances).values("seller_id")
+                    .annotate(total=Sum("amount")).values_list("seller_id", "total")
+                )
+
+        drifts = []
+        if self.check_ledger:
+            for user_id, balance in balances.items():
+                total = ledger_totals.get(user_id) or Decimal("0.00")
+                if total != balance:
+                    drifts.append(WalletDrift(user_id, LEDGER_DRIFT, balance, total))
+
+        expected = {user_id: to_minor(balance) + deltas.get(user_id, 0) for user_id, balance in balances.items()}
+        actual = self._redis_balances(list(expected))
+        not_loaded = sum(1 for user_id in expected if actual[user_id] is None)
+        suspects = [
+            user_id for user_id in expected
+            if actual[user_id] is not None and actual[user_id] != expected[user_id]
+        ]
+        if suspects:
+            drifts.extend(self._recheck(suspects))
+        return drifts, not_loaded
+
+    def _recheck(self, user_ids: list[int]) -> list[WalletDrift]:
+        """Compare the suspects again, locked against ledger flushes, and repair what still differs."""
+        time.sleep(self.recheck_delay)
+        pending = self.atomic_service.pending_event_deltas(user_ids)
+        with transaction.atomic():
+            balances = dict(
+                Wallet.objects.select_for_update().filter(user_id__in=user_ids).order_by("user_id")
+                .values_list("user_id", "balance")
+            )
+            deltas = self.atomic_service.unsettled_deltas(pending)
+            expected = {user_id: to_minor(balance) + deltas.get(user_id, 0) for user_id, balance in balances.items()}
+            actual = self._redis_balances(list(expected))
+            # After the balances: a transfer is in the ledger as soon as it is in the balance
+            in_flight = self._in_flight([
+                user_id for user_id, expected_minor in expected.items()
+                if actual[user_id] is not None and actual[user_id] != expected_minor
+            ], pending)
+
+        drifts = []
+        for user_id, expected_minor in expected.items():
+            actual_minor = actual[user_id]
+            if actual_minor is None or actual_minor == expected_minor:
+                continue
+            if user_id in in_flight:
+                logger.info(f"Wallet {user_id} has a transfer not yet written to the DB, skipping")
+                continue
+            repaired = False
+            if self.repair:
+                repaired = bool(self.repair_script(
+                    keys=[f"wallet:user:{user_id}"], args=[actual_minor, expected_minor]
+                ))
+            drifts.append(WalletDrift(user_id, REDIS_DRIFT, from_minor(expected_minor), from_minor(actual_minor), repaired))
+            logger.warning(
+                f"Wallet {user_id} drifted: Redis {from_minor(actual_minor)}, expected {from_minor(expected_minor)}"
+                f"{' (repaired)' if repaired else ''}"
+            )
+        return drifts
+
+    def _in_flight(self, user_ids: list[int], pending: dict) -> set[int]:
+        """Users with a recent Redis ledger entry whose DB write hasn't committed.
+
+        An entry counts when it is younger than ``in_flight_window``, has no
+        ``Transaction`` row visible yet and isn't a write-behind sale still in
+        the event stream. Older ones are left for drift to report.
+        """
+        if not user_ids:
+            return set()
+        horizon = time.time() - self.in_flight_window
+        with self.redis_client.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.lrange(f"transactions:user:{user_id}", -self.in_flight_entries, -1)
+            ledgers = pipe.execute()
+
+        recent = {}
+        for user_id, entries in zip(user_ids, ledgers):
+            queued = {str(sale_id) for sale_id, _ in pending.get(user_id, [])}
+            for raw in entries:
+                entry = json.loads(raw)
+                if float(entry.get("timestamp") or 0) >= horizon and entry.get("reference_id") not in queued:
+                    recent[entry["id"]] = user_id
+        if not recent:
+            return set()
+        recorded = {str(transaction_id) for transaction_id in
+                    Transaction.objects.filter(id__in=list(recent)).values_list("id", flat=True)}
+        return {user_id for transaction_id, user_id in recent.items() if transaction_id not in recorded}
+
+    def _redis_balances(self, user_ids: list[int]) -> dict:
+        """Redis balance in minor units per user id, None for wallets Redis doesn't hold."""
+        with self.redis_client.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.hmget(f"wallet:user:{user_id}", BALANCE_FIELD, LEGACY_BALANCE_FIELD)
+            fields = pipe.execute()
+        balances = {}
+        for user_id, (minor, legacy) in zip(user_ids, fields):
+            if minor is not None:
+                balances[user_id] = int(minor)
+            elif legacy is not None:
+                balances[user_id] = to_minor(Decimal(legacy))
+            else:
+                balances[user_id] = None
+        return balances
@@ -0,0 +1,364 @@
+"""Server-side Lua scripts used by the wallet engine.
+
+Balances are kept in ``wallet:user:{id}`` as integer minor units (rials x 100)
+in the ``balance_minor`` field and are updated with HINCRBY. Amounts are passed
+in and written out as integer strings: Lua numbers only print 14 significant
+digits, so they never go to Redis or cjson as raw numbers. Wallets still
+holding a legacy decimal ``balance`` field are upgraded the first time a
+script touches them.
+
+The hash also mirrors the wallet ``status`` from Postgres, so the transfer
+script can refuse inactive wallets itself and the hot path never has to
+read the ``Wallet`` row. A hash with no status or no balance has not been
+loaded yet and is reported as missing.
+"""
+
+# First element of a TRANSFER_SCRIPT result
+INSUFFICIENT_BALANCE = 0
+TRANSFERRED = 1
+WALLET_MISSING = 2
+WALLET_INACTIVE = 3
+
+_BALANCE_HELPERS = """
+local function int_str(n)
+    return string.format('%d', n)
+end
+
+local function decimal_to_minor(value)
+    local sign = 1
+    if string.sub(value, 1, 1) == '-' then
+        sign = -1
+        value = string.sub(value, 2)
+    end
+    local whole, frac = string.match(value, '^(%d*)%.?(%d*)$')
+    if whole == '' then
+        whole = '0'
+    end
+    frac = string.sub(frac .. '00', 1, 2)
+    return sign * (tonumber(whole) * 100 + tonumber(frac))
+end
+
+local function read_balance(key)
+    local minor = redis.call('HGET', key, 'balance_minor')
+    if minor then
+        return tonumber(minor)
+    end
+    local legacy = redis.call('HGET', key, 'balance')
+    if not legacy then
+        return 0
+    end
+    local value = decimal_to_minor(legacy)
+    redis.call('HSET', key, 'balance_minor', int_str(value))
+    redis.call('HDEL', key, 'balance')
+    return value
+end
+
+-- Returns nil when every wallet is loaded and active, otherwise
+-- {WALLET_MISSING or WALLET_INACTIVE, position of the first offending key}.
+local function check_wallets(...)
+    for i, key in ipairs({...}) do
+        local fields = redis.call('HMGET', key, 'status', 'balance_minor', 'balance')
+        if not fields[1] or (not fields[2] and not fields[3]) then
+            return {2, i}
+        end
+        -- WalletStatusEnums.ACTIVE
+        if fields[1] ~= '0' then
+            return {3, i}
+        end
+    end
+    return nil
+end
+
+local function ledger_entry(id, amount, before, after, reference_id, description, timestamp)
+    return cjson.encode({
+        id = id,
+        amount_minor = int_str(amount),
+        balance_before_minor = int_str(before),
+        balance_after_minor = int_str(after),
+        reference_id = reference_id,
+        description = description,
+        timestamp = timestamp,
+    })
+end
+"""
+
+# KEYS: seller wallet, target wallet, seller ledger, target ledger[, event stream]
+# ARGV: amount, reference_id, seller transaction id, target transaction id,
+#       seller description, target description, timestamp
+#       [, event type, seller id, target id, event meta]
+# When the event stream key is given the committed transfer is also published
+# to it, in the same atomic step, for the write-behind ledger writer.
+# Returns {WALLET_MISSING or WALLET_INACTIVE, 1 for the seller or 2 for the
+# target} when a wallet isn't loaded or isn't active, {0, seller_balance} when
+# the seller can't cover the amount, otherwise
+# {1, seller_ledger_entry, target_ledger_entry}.
+TRANSFER_SCRIPT = _BALANCE_HELPERS + """
+local failed = check_wallets(KEYS[1], KEYS[2])
+if failed then
+    return failed
+end
+local amount = tonumber(ARGV[1])
+local seller_before = read_balance(KEYS[1])
+if seller_before < amount then
+    return {0, int_str(seller_before)}
+end
+local seller_after = redis.call('HINCRBY', KEYS[1], 'balance_minor', int_str(-amount))
+read_balance(KEYS[2])
+local target_after = redis.call('HINCRBY', KEYS[2], 'balance_minor', ARGV[1])
+
+local timestamp = tonumber(ARGV[7])
+local seller_entry = ledger_entry(ARGV[3], -amount, seller_before, seller_after, ARGV[2], ARGV[5], timestamp)
+local target_entry = ledger_entry(ARGV[4], amount, target_after - amount, target_after, ARGV[2], ARGV[6], timestamp)
+redis.call('RPUSH', KEYS[3], seller_entry)
+redis.call('RPUSH', KEYS[4], target_entry)
+if KEYS[5] then
+    redis.call('XADD', KEYS[5], '*',
+        'type', ARGV[8],
+        'seller_id', ARGV[9],
+        'target_id', ARGV[10],
+        'amount_minor', ARGV[1],
+        'reference_id', ARGV[2],
+        'seller_entry', seller_entry,
+        'target_entry', target_entry,
+        'meta', ARGV[11])
+end
+return {1, seller_entry, target_entry}
+"""
+
+# Runs a batch of one seller's sales as consecutive TRANSFER_SCRIPT calls,
+# atomically as a whole: each item moves its amount to its target while the
+# seller's balance covers it. With ARGV[2] == '1' every committed item is also
+# published to the event stream, as TRANSFER_SCRIPT does.
+# KEYS: seller wallet, seller ledger, event stream, then (target wallet,
+#       target ledger) per item
+# ARGV: timestamp, publish flag, seller id, event type, then (amount,
+#       reference_id, seller transaction id, target transaction id, seller
+#       description, target description, target id, event meta) per item
+# Returns {WALLET_MISSING, position} when a wallet isn't loaded (1 for the
+# seller, 1 + n for the n-th item's target), {WALLET_INACTIVE, 1} when the
+# seller isn't active, otherwise {TRANSFERRED} followed by two elements per
+# item: its seller and target ledger entries, or INSUFFICIENT_BALANCE /
+# WALLET_INACTIVE (target) and ''.
+TRANSFER_BATCH_SCRIPT = _BALANCE_HELPERS + """
+local wallets = {KEYS[1]}
+for i = 4, #KEYS, 2 do
+    table.insert(wallets, KEYS[i])
+end
+for i, key in ipairs(wallets) do
+    local fields = redis.call('HMGET', key, 'status', 'balance_minor', 'balance')
+    if not fields[1] or (not fields[2] and not fields[3]) then
+        return {2, i}
+    end
+end
+if redis.call('HGET', KEYS[1], 'status') ~= '0' then
+    return {3, 1}
+end
+
+local timestamp = tonumber(ARGV[1])
+local results = {1}
+for item = 0, (#KEYS - 3) / 2 - 1 do
+    local target_wallet = KEYS[4 + item * 2]
+    local target_ledger = KEYS[5 + item * 2]
+    local a = 5 + item * 8
+    local amount = tonumber(ARGV[a])
+    -- Read per item: the seller may also be a target in the batch
+    local seller_before = read_balance(KEYS[1])
+    if redis.call('HGET', target_wallet, 'status') ~= '0' then
+        table.insert(results, '3')
+        table.insert(results, '')
+    elseif seller_before < amount then
+        table.insert(results, '0')
+        table.insert(results, '')
+    else
+        local seller_after = redis.call('HINCRBY', KEYS[1], 'balance_minor', int_str(-amount))
+        read_balance(target_wallet)
+        local target_after = redis.call('HINCRBY', target_wallet, 'balance_minor', ARGV[a])
+        local seller_entry = ledger_entry(ARGV[a + 2], -amount, seller_before, seller_after, ARGV[a + 1], ARGV[a + 4], timestamp)
+        local target_entry = ledger_entry(ARGV[a + 3], amount, target_after - amount, target_after, ARGV[a + 1], ARGV[a + 5], timestamp)
+        redis.call('RPUSH', KEYS[2], seller_entry)
+        redis.call('RPUSH', target_ledger, target_entry)
+        if ARGV[2] == '1' then
+            redis.call('XADD', KEYS[3], '*',
+                'type', ARGV[4],
+                'seller_id', ARGV[3],
+                'target_id', ARGV[a + 6],
+                'amount_minor', ARGV[a],
+                'reference_id', ARGV[a + 1],
+                'seller_entry', seller_entry,
+                'target_entry', target_entry,
+                'meta', ARGV[a + 7])
+        end
+        table.insert(results, seller_entry)
+        table.insert(results, target_entry)
+    end
+end
+return results
+"""
+
+# Undoes a committed TRANSFER_SCRIPT call. Relative, so it stays correct even
+# if other transfers touched the same wallets in between.
+# KEYS: seller wallet, target wallet, seller ledger, target ledger
+# ARGV: amount, seller ledger entry, target ledger entry
+REVERSE_TRANSFER_SCRIPT = _BALANCE_HELPERS + """
+read_balance(KEYS[1])
+read_balance(KEYS[2])
+redis.call('HINCRBY', KEYS[1], 'balance_minor', ARGV[1])
+redis.call('HINCRBY', KEYS[2], 'balance_minor', int_str(-tonumber(ARGV[1])))
+redis.call('LREM', KEYS[3], 1, ARGV[2])
+redis.call('LREM', KEYS[4], 1, ARGV[3])
+return 1
+"""
+
+# Debits the seller once for a whole batch of sales, in order, accepting each
+# item while the balance covers it.
+# KEYS: seller wallet, seller ledger
+# ARGV: timestamp, then (amount, reference_id, transaction id, description) per item
+# Returns one element per item: the ledger entry when reserved, '' when the
+# balance ran out.
+RESERVE_BATCH_SCRIPT = _BALANCE_HELPERS + """
+local balance = read_balance(KEYS[1])
+local reserved = 0
+local timestamp = tonumber(ARGV[1])
+local results = {}
+local entries = {}
+for i = 2, #ARGV, 4 do
+    local amount = tonumber(ARGV[i])
+    if balance >= amount then
+        local entry = ledger_entry(ARGV[i + 2], -amount, balance, balance - amount, ARGV[i + 1], ARGV[i + 3], timestamp)
+        balance = balance - amount
+        reserved = reserved + amount
+        table.insert(entries, entry)
+        table.insert(results, entry)
+    else
+        table.insert(results, '')
+    end
+end
+if #entries > 0 then
+    redis.call('HINCRBY', KEYS[1], 'balance_minor', int_str(-reserved))
+    for i = 1, #entries, 1000 do
+        redis.call('RPUSH', KEYS[2], unpack(entries, i, math.min(i + 999, #entries)))
+    end
+end
+return results
+"""
+
+# Credits one wallet and appends its ledger entry.
+# KEYS: target wallet, target ledger
+# ARGV: amount, reference_id, transaction id, description, timestamp
+# Returns the ledger entry.
+CREDIT_SCRIPT = _BALANCE_HELPERS + """
+local amount = tonumber(ARGV[1])
+read_balance(KEYS[1])
+local balance_after = redis.call('HINCRBY', KEYS[1], 'balance_minor', ARGV[1])
+local entry = ledger_entry(ARGV[3], amount, balance_after - amount, balance_after, ARGV[2], ARGV[4], tonumber(ARGV[5]))
+redis.call('RPUSH', KEYS[2], entry)
+return entry
+"""
+
+# Undoes one ledger entry written by RESERVE_BATCH_SCRIPT or CREDIT_SCRIPT.
+# KEYS: wallet, ledger
+# ARGV: balance delta to apply, ledger entry
+UNDO_ENTRY_SCRIPT = _BALANCE_HELPERS + """
+read_balance(KEYS[1])
+redis.call('HINCRBY', KEYS[1], 'balance_minor', ARGV[1])
+redis.call('LREM', KEYS[2], 1, ARGV[2])
+return 1
+"""
+
+# Seeds a wallet from the database: the balance unless Redis already holds
+# one, in either encoding, and the status unless it was already written
+# through by a newer save.
+# KEYS: wallet   ARGV: balance, status
+# Returns 1 if the balance was seeded.
+SEED_BALANCE_SCRIPT = """
+if ARGV[2] then
+    redis.call('HSETNX', KEYS[1], 'status', ARGV[2])
+end
+if redis.call('HEXISTS', KEYS[1], 'balance_minor') == 1 or redis.call('HEXISTS', KEYS[1], 'balance') == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'balance_minor', ARGV[1])
+return 1
+"""
+
+# Converts a legacy decimal balance to minor units. Returns 1 if it did.
+# KEYS: wallet
+UPGRADE_BALANCE_SCRIPT = _BALANCE_HELPERS + """
+local legacy = redis.call('HEXISTS', KEYS[1], 'balance')
+read_balance(KEYS[1])
+return legacy
+"""
+
+# Rewrites legacy ledger entries (decimal strings in amount/balance_before/
+# balance_after) in place. Returns the number of entries converted.
+# KEYS: ledger
+UPGRADE_LEDGER_SCRIPT = _BALANCE_HELPERS + """
+local entries = redis.call('LRANGE', KEYS[1], 0, -1)
+local converted = 0
+for i, raw in ipairs(entries) do
+    local entry = cjson.decode(raw)
+    if entry.amount_minor == nil and entry.amount ~= nil then
+        local upgraded = ledger_entry(entry.id, decimal_to_minor(entry.amount),
+            decimal_to_minor(entry.balance_before), decimal_to_minor(entry.balance_after),
+            entry.reference_id, entry.description, entry.timestamp)
+        redis.call('LSET', KEYS[1], i - 1, upgraded)
+        converted = converted + 1
+    end
+end
+return converted
+"""
+
+# Drops the oldest entries of a ledger once the compaction job has confirmed
+# them durable in Postgres. Entries are only ever appended or removed, so if
+# the last entry to drop is still at its position none before it has moved.
+# KEYS: ledger   ARGV: number of entries to drop, the last of them
+# Returns the number of entries dropped, 0 if the ledger changed meanwhile.
+TRIM_LEDGER_SCRIPT = """
+local count = tonumber(ARGV[1])
+if redis.call('LINDEX', KEYS[1], count - 1) ~= ARGV[2] then
+    return 0
+end
+redis.call('LTRIM', KEYS[1], count, -1)
+return count
+"""
+
+# Compare-and-set used by the reconciliation engine to repair a drifted
+# balance: it only writes if Redis still holds the balance the engine read,
+# so a transfer that ran in between is never overwritten.
+# KEYS: wallet   ARGV: balance read, repaired balance (minor units)
+# Returns 1 if the balance was repaired, 0 if it moved or the wallet is gone.
+REPAIR_BALANCE_SCRIPT = _BALANCE_HELPERS + """
+if redis.call('HEXISTS', KEYS[1], 'balance_minor') == 0 and redis.call('HEXISTS', KEYS[1], 'balance') == 0 then
+    return 0
+end
+if int_str(read_balance(KEYS[1])) ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'balance_minor', ARGV[2])
+return 1
+"""
+
+# Adjusts the pending credit request totals, but only while the hash exists:
+# a missing hash is rebuilt from the database on the next read, which
+# already includes this change.
+# KEYS: totals   ARGV: count delta, amount delta (minor units)
+ADJUST_PENDING_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HINCRBY', KEYS[1], 'count', ARGV[1])
+redis.call('HINCRBY', KEYS[1], 'amount_minor', ARGV[2])
+return 1
+"""
+
+# Seeds the pending credit request totals unless another reader already has.
+# KEYS: totals   ARGV: count, amount (minor units), ttl in seconds
+# Returns 1 if the totals were seeded.
+SEED_PENDING_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'count', ARGV[1], 'amount_minor', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
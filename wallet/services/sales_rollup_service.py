@@ -0,0 +1,169 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+import logging
+import time
+from typing import NamedTuple, Optional
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from infrastructure.database.redis.redis import wallet_redis_client
+from wallet.enums import ChargeSaleTypeEnums, CreditRequestStatusEnums
+from wallet.models import ChargeSale, CreditRequest, SellerDailySales
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_FIELDS = ("sales_count", "gross_amount", "failed_count", "credit_received")
+
+
+class RollupResult(NamedTuple):
+    full: bool
+    buckets: int
+    watermark: datetime
+
+
+class SellerSalesRollup:
+    """Maintains ``SellerDailySales`` from charge sales and credit requests.
+
+    A run recomputes every (seller, day) bucket with a charge sale updated or
+    a credit request approved since the previous run started, less
+    ``overlap`` seconds for rows committed after they were stamped.
+    Recomputing a bucket reads only that seller's rows of that day, so a run
+    costs O(changed rows), and running it twice over the same rows is
+    harmless. The watermark is kept in the wallet Redis; without one (first
+    run, or ``full``) every bucket is rebuilt.
+
+    Sales count on the day they were created, credits on the day they were
+    approved, so saving a row again later never moves it to another bucket.
+    Reports read the rollup only, so they cost O(days) per seller.
+    """
+
+    WATERMARK_KEY = "wallet:sales_rollup:watermark"
+
+    def __init__(self, overlap: int = 300, batch_size: int = 1000):
+        self.redis_client = wallet_redis_client
+        self.overlap = overlap
+        self.batch_size = batch_size
+
+    def watermark(self) -> Optional[datetime]:
+        """Start of the last completed run; buckets are current up to it."""
+        watermark = self.redis_client.get(self.WATERMARK_KEY)
+        return datetime.fromtimestamp(float(watermark), tz=timezone.utc) if watermark else None
+
+    def run(self, full: bool = False) -> RollupResult:
+        started = time.time()
+        watermark = None if full else self.watermark()
+        if watermark is None:
+            buckets = self._rebuild(datetime.fromtimestamp(started, tz=timezone.utc))
+        else:
+            buckets = self._refresh(self._touched_buckets(watermark - timedelta(seconds=self.overlap)))
+        self.redis_client.set(self.WATERMARK_KEY, started)
+        logger.info(f"Sales rollup {'rebuilt' if watermark is None else 'refreshed'} {buckets} buckets")
+        return RollupResult(watermark is None, buckets, datetime.fromtimestamp(started, tz=timezone.utc))
+
+    @staticmethod
+    def _touched_buckets(since: datetime) -> dict:
+        """``{day: {seller id, ...}}`` for buckets with sales updated or credits approved since ``since``."""
+        touched = defaultdict(set)
+        sales = (
+            ChargeSale.objects.filter(updated_at__gte=since)
+            .annotate(day=TruncDate("created_at", tzinfo=timezone.utc))
+            .values_list("user_id", "day").distinct()
+        )
+        credits = (
+            CreditRequest.objects.filter(approved_at__gte=since, status=CreditRequestStatusEnums.ACCEPTED)
+            .annotate(day=TruncDate("approved_at", tzinfo=timezone.utc))
+            .values_list("user_id", "day").distinct()
+        )
+        for user_id, day in (*sales, *credits):
+            touched[day].add(user_id)
+        return touched
+
+    def _refresh(self, touched: dict) -> int:
+        buckets = 0
+        for day, user_ids in sorted(touched.items()):
+            user_ids = sorted(user_ids)
+            start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+            for index in range(0, len(user_ids), self.batch_size):
+                batch = user_ids[index:index + self.batch_size]
+                totals = self._aggregate(start, start + timedelta(days=1), batch)
+                # A seller whose rows no longer count (say, a sale still pending) gets a zero bucket
+                for user_id in batch:
+                    totals.setdefault((user_id, day), self._empty())
+                buckets += self._upsert(totals)
+        return buckets
+
+    def _rebuild(self, started: datetime) -> int:
+        totals = self._aggregate()
+        with transaction.atomic():
+            buckets = self._upsert(totals)
+            # Buckets every row of which is gone
+            SellerDailySales.objects.filter(updated_at__lt=started).delete()
+        return buckets
+
+    @staticmethod
+    def _empty() -> dict:
+        return {"sales_count": 0, "gross_amount": Decimal("0.00"), "failed_count": 0, "credit_received": Decimal("0.00")}
+
+    def _aggregate(self, start: datetime = None, end: datetime = None, user_ids: list[int] = None) -> dict:
+        """``{(seller id, day): totals}``, restricted to ``[start, end)`` and ``user_ids`` when given."""
+        sales = ChargeSale.objects.filter(status__in=[ChargeSaleTypeEnums.COMPLETED, ChargeSaleTypeEnums.FAILED])
+        credits = CreditRequest.objects.filter(status=CreditRequestStatusEnums.ACCEPTED)
+        if start is not None:
+            sales = sales.filter(created_at__gte=start, created_at__lt=end)
+            credits = credits.filter(approved_at__gte=start, approved_at__lt=end)
+        if user_ids is not None:
+            sales = sales.filter(user_id__in=user_ids)
+            credits = credits.filter(user_id__in=user_ids)
+
+        totals = defaultdict(self._empty)
+        sales = (
+            sales.annotate(day=TruncDate("created_at", tzinfo=timezone.utc)).values("user_id", "day")
+            .annotate(
+                completed=Count("id", filter=Q(status=ChargeSaleTypeEnums.COMPLETED)),
+                gross=Sum("amount", filter=Q(status=ChargeSaleTypeEnums.COMPLETED)),
+                failed=Count("id", filter=Q(status=ChargeSaleTypeEnums.FAILED)),
+            ).order_by()
+        )
+        for row in sales.iterator():
+            bucket = totals[(row["user_id"], row["day"])]
+            bucket["sales_count"] = row["completed"]
+            bucket["gross_amount"] = row["gross"] or Decimal("0.00")
+            bucket["failed_count"] = row["failed"]
+        credits = (
+            credits.annotate(day=TruncDate("approved_at", tzinfo=timezone.utc)).values("user_id", "day")
+            .annotate(credit=Sum("amount")).order_by()
+        )
+        for row in credits.iterator():
+            totals[(row["user_id"], row["day"])]["credit_received"] = row["credit"]
+        return dict(totals)
+
+    def _upsert(self, totals: dict) -> int:
+        SellerDailySales.objects.bulk_create(
+            [SellerDailySales(seller_id=user_id, day=day, **bucket) for (user_id, day), bucket in totals.items()],
+            batch_size=self.batch_size,
+            update_conflicts=True,
+            unique_fields=["seller", "day"],
+            update_fields=[*ROLLUP_FIELDS, "updated_at"],
+        )
+        return len(totals)
+
+    @staticmethod
+    def seller_report(seller_id: int, start: date, end: date) -> list[SellerDailySales]:
+        """The seller's buckets for ``start`` to ``end`` inclusive, oldest first; days without activity are absent."""
+        return list(SellerDailySales.objects.filter(seller_id=seller_id, day__gte=start, day__lte=end).order_by("day"))
+
+    @staticmethod
+    def daily_totals(start: date, end: date) -> list[dict]:
+        """Totals over all sellers per day for ``start`` to ``end`` inclusive, oldest first."""
+        return list(
+            SellerDailySales.objects.filter(day__gte=start, day__lte=end).values("day")
+            .annotate(
+                active_sellers=Count("seller_id", filter=Q(sales_count__gt=0) | Q(failed_count__gt=0)
+                                     | Q(credit_received__gt=0)),
+                **{field: Sum(field) for field in ROLLUP_FIELDS},
+            ).order_by("day")
+        )
+
+
+sales_rollup = SellerSalesRollup()
@@ -0,0 +1,250 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from typing import Optional
+from urllib.request import Request, urlopen
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Phase-level traces of the wallet engine, exported as OTLP/JSON.
+#
+# A trace starts at a WalletService entry point and follows the work onto the
+# executor thread: WalletService._submit runs the task in a copy of the
+# caller's context, which carries the current span. Finished traces are
+# handed to a background thread, so exporting never adds to request latency.
+
+SPAN_KIND_INTERNAL = 1
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+# Current "span" below a root that wasn't sampled, so its children aren't either
+_UNSAMPLED = object()
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attributes", "events", "start_ns", "end_ns", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: dict):
+        self.trace = trace
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.events = []
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def event(self, name: str, **attributes) -> None:
+        self.events.append((time.time_ns(), name, attributes))
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "events": [
+                {"timeUnixNano": str(at), "name": name, "attributes": _otlp_attributes(attributes)}
+                for at, name, attributes in self.events
+            ],
+            "status": {"code": STATUS_ERROR, "message": self.error} if self.error else {"code": STATUS_OK},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class Trace:
+    """Spans of one trace; they may finish on different threads."""
+
+    def __init__(self):
+        self.trace_id = f"{random.getrandbits(128):032x}"
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def finished(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> list[dict]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+class FileSpanExporter:
+    """Appends each trace as one OTLP/JSON ``ExportTraceServiceRequest`` line."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, payload: dict) -> None:
+        with open(self.path, "a") as file:
+            file.write(json.dumps(payload, separators=(",", ":")) + "\n")
+
+
+class OtlpHttpSpanExporter:
+    """POSTs each trace to an OTLP/HTTP collector's ``/v1/traces``, JSON encoded."""
+
+    def __init__(self, endpoint: str, timeout: float = 2.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.timeout = timeout
+
+    def export(self, payload: dict) -> None:
+        request = Request(self.url, data=json.dumps(payload).encode(),
+                          headers={"Content-Type": "application/json"}, method="POST")
+        with urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class Tracer:
+    """Records spans of sampled traces and exports the ones worth keeping.
+
+    A root span decides whether its trace is recorded (``sample_rate``); spans
+    without a recorded parent cost one context variable lookup. A finished
+    trace is exported when its root took at least ``slow_ms`` or any span
+    failed, so the export holds the tail rather than every fast request.
+    Exports run on one background thread through a bounded queue; traces are
+    dropped, not waited for, when it is full.
+    """
+
+    def __init__(self, enabled: bool = False, sample_rate: float = 1.0, slow_ms: float = 0,
+                 exporter=None, service_name: str = "wallet", max_queue: int = 1000):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.exporter = exporter
+        self.service_name = service_name
+        self.dropped = 0
+        self._queue = queue.Queue(max_queue)
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Record the block as a child of the current span, or as a new root if sampled.
+
+        Yields the span, or None when the trace isn't recorded. An exception
+        leaving the block marks the span failed and propagates.
+        """
+        parent = _current_span.get()
+        if parent is _UNSAMPLED or (parent is None and not self.enabled):
+            yield None
+            return
+        if parent is None and random.random() >= self.sample_rate:
+            token = _current_span.set(_UNSAMPLED)
+            try:
+                yield None
+            finally:
+                _current_span.reset(token)
+            return
+        trace = parent.trace if parent is not None else Trace()
+        span = Span(trace, name, parent.span_id if parent is not None else None, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current_span.reset(token)
+            trace.finished(span)
+            if parent is None:
+                self._finish(trace, span)
+
+    @staticmethod
+    def current_span() -> Optional[Span]:
+        span = _current_span.get()
+        return None if span is _UNSAMPLED else span
+
+    def event(self, name: str, **attributes) -> None:
+        """Add an event to the current span, if recorded."""
+        span = self.current_span()
+        if span is not None:
+            span.event(name, **attributes)
+
+    def _finish(self, trace: Trace, root: Span) -> None:
+        if root.duration_ms < self.slow_ms and not any(span.error for span in trace.spans):
+            return
+        self._start_worker()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def to_otlp(self, trace: Trace) -> dict:
+        return {"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": self.service_name, "process.pid": os.getpid()})},
+            "scopeSpans": [{
+                "scope": {"name": "wallet.services.tracing"},
+                "spans": [span.to_otlp() for span in sorted(trace.spans, key=lambda span: span.start_ns)],
+            }],
+        }]}
+
+    def _start_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._export_loop, name="trace-exporter", daemon=True)
+                self._worker.start()
+
+    def _export_loop(self) -> None:
+        while True:
+            trace = self._queue.get()
+            try:
+                if self.exporter is not None:
+                    self.exporter.export(self.to_otlp(trace))
+            except Exception as e:
+                logger.warning(f"Could not export trace {trace.trace_id}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """Wait until every queued trace is exported."""
+        self._queue.join()
+
+
+def _exporter():
+    if settings.WALLET_TRACE_OTLP_ENDPOINT:
+        return OtlpHttpSpanExporter(settings.WALLET_TRACE_OTLP_ENDPOINT)
+    if settings.WALLET_TRACE_FILE:
+        return FileSpanExporter(settings.WALLET_TRACE_FILE)
+    return None
+
+
+tracer = Tracer(
+    enabled=settings.WALLET_TRACING,
+    sample_rate=settings.WALLET_TRACE_SAMPLE_RATE,
+    slow_ms=settings.WALLET_TRACE_SLOW_MS,
+    exporter=_exporter(),
+)
@@ -0,0 +1,181 @@
+from datetime import datetime, timezone
+import json
+import logging
+import time
+import uuid
+from django.conf import settings
+from django.db import transaction
+import redis
+from infrastructure.database.redis.redis import wallet_redis_client
+from wallet.enums import ChargeSaleTypeEnums, TransactionTypeEnums, WalletEventTypes
+from wallet.models import ChargeSale, Transaction, Wallet
+from wallet.services.balance_codec import from_minor
+
+logger = logging.getLogger(__name__)
+
+
+class WalletEventConsumer:
+    """Drains the wallet event stream into Postgres in batches.
+
+    Runs as a member of a Redis consumer group, so several workers can share
+    the stream. Each batch is written in one DB transaction and acknowledged
+    only after it commits. Redelivered events are skipped because a sale is
+    only written, with its ledger rows and balance deltas, when no sale with
+    its id exists yet, which gives exactly-once effects on the ledger and
+    wallet balances.
+    """
+
+    def __init__(self, consumer_name: str, batch_size: int = 500, block_ms: int = 1000,
+                 claim_idle_ms: int = 60000):
+        self.redis_client = wallet_redis_client
+        self.stream = settings.WALLET_EVENT_STREAM
+        self.group = settings.WALLET_EVENT_GROUP
+        self.consumer_name = consumer_name
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+
+    def ensure_group(self) -> None:
+        try:
+            self.redis_client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def read_batch(self) -> list:
+        # Take over events left pending by crashed workers before reading new ones
+        _, messages, _ = self.redis_client.xautoclaim(
+            self.stream, self.group, self.consumer_name,
+            min_idle_time=self.claim_idle_ms, start_id="0-0", count=self.batch_size,
+        )
+        if messages:
+            return messages
+        response = self.redis_client.xreadgroup(
+            self.group, self.consumer_name, {self.stream: ">"},
+            count=self.batch_size, block=self.block_ms,
+        )
+        return response[0][1] if response else []
+
+    def flush(self, messages: list) -> int:
+        """Persist a batch of stream messages and acknowledge them. Returns the number of new sales."""
+        if not messages:
+            return 0
+        events = []
+        for message_id, fields in messages:
+            if not fields:
+                continue
+            if fields.get("type") != WalletEventTypes.CHARGE_SALE:
+                logger.warning(f"Skipping unknown wallet event {message_id}: {fields.get('type')}")
+                continue
+            events.append(fields)
+
+        inserted = 0
+        if events:
+            with transaction.atomic():
+                inserted = self._persist_charge_sales(events)
+
+        message_ids = [message_id for message_id, _ in messages]
+        with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.xack(self.stream, self.group, *message_ids)
+            pipe.xdel(self.stream, *message_ids)
+            pipe.execute()
+        return inserted
+
+    def run(self, once: bool = False) -> None:
+        self.ensure_group()
+        while True:
+            messages = self.read_batch()
+            try:
+                inserted = self.flush(messages)
+                if messages:
+                    logger.info(f"Flushed {len(messages)} wallet events ({inserted} new sales)")
+            except Exception:
+                # Events stay pending and are retried on the next claim
+                logger.exception(f"Failed to flush {len(messages)} wallet events")
+                time.sleep(1)
+            if once and not messages:
+                return
+
+    def _persist_charge_sales(self, events: list) -> int:
+        sales = {}
+        for event in events:
+            seller_trans = json.loads(event["seller_entry"])
+            target_trans = json.loads(event["target_entry"])
+            sales[uuid.UUID(event["reference_id"])] = {
+                "id": uuid.UUID(event["reference_id"]),
+                "seller_id": int(event["seller_id"]),
+                "target_id": int(event["target_id"]),
+                "amount": from_minor(event["amount_minor"]),
+                "phone_number": json.loads(event["meta"]).get("phone_number", ""),
+                "seller_trans": seller_trans,
+                "target_trans": target_trans,
+            }
+
+        new_ids = self._insert_charge_sales(list(sales.values()))
+        new_sales = [sale for sale_id, sale in sales.items() if sale_id in new_ids]
+        if not new_sales:
+            return 0
+
+        transactions = []
+        deltas = []
+        for sale in new_sales:
+            seller_trans = sale["seller_trans"]
+            target_trans = sale["target_trans"]
+            transactions.append(Transaction(
+                id=uuid.UUID(seller_trans["id"]),
+                seller_id=sale["seller_id"],
+                transaction_type=TransactionTypeEnums.CHARGE_SALE,
+                amount=-sale["amount"],
+                balance_before=from_minor(seller_trans["balance_before_minor"]),
+                balance_after=from_minor(seller_trans["balance_after_minor"]),
+                reference_id=str(sale["id"]),
+                description=seller_trans["description"],
+            ))
+            transactions.append(Transaction(
+                id=uuid.UUID(target_trans["id"]),
+                seller_id=sale["target_id"],
+                transaction_type=TransactionTypeEnums.CREDIT_INCREASE,
+                amount=sale["amount"],
+                balance_before=from_minor(target_trans["balance_before_minor"]),
+                balance_after=from_minor(target_trans["balance_after_minor"]),
+                reference_id=str(sale["id"]),
+                description=target_trans["description"],
+            ))
+            deltas.append((sale["seller_id"], -sale["amount"]))
+            deltas.append((sale["target_id"], sale["amount"]))
+
+        Transaction.objects.bulk_create(transactions)
+        Wallet.objects.apply_balance_deltas(deltas)
+        return len(new_sales)
+
+    def _insert_charge_sales(self, sales: list) -> set:
+        """Insert COMPLETED sales, skipping ones already written. Returns the ids actually inserted.
+
+        A redelivered event can be held by two workers at once (one claimed it
+        from the other after ``claim_idle_ms``). Both lock the wallets they
+        are about to update first, in id order, so the second waits for the
+        first to commit and then finds the sale by its primary key.
+        """
+        user_ids = sorted({sale["seller_id"] for sale in sales} | {sale["target_id"] for sale in sales})
+        list(Wallet.objects.select_for_update().filter(user_id__in=user_ids).order_by("user_id").values_list("id", flat=True))
+        existing = set(ChargeSale.objects.filter(id__in=[sale["id"] for sale in sales]).values_list("id", flat=True))
+        new_sales = [sale for sale in sales if sale["id"] not in existing]
+        if not new_sales:
+            return set()
+
+        charge_sales = ChargeSale.objects.bulk_create([
+            ChargeSale(
+                id=sale["id"],
+                user_id=sale["seller_id"],
+                phone_number=sale["phone_number"],
+                amount=sale["amount"],
+                status=ChargeSaleTypeEnums.COMPLETED,
+                transaction_id=uuid.UUID(sale["seller_trans"]["id"]),
+            )
+            for sale in new_sales
+        ], ignore_conflicts=True)
+        # The insert stamps both timestamps with the flush time; created_at is when the sale happened in Redis
+        for charge_sale, sale in zip(charge_sales, new_sales):
+            charge_sale.created_at = datetime.fromtimestamp(sale["seller_trans"]["timestamp"], tz=timezone.utc)
+        ChargeSale.objects.bulk_update(charge_sales, ["created_at"])
+        return {sale["id"] for sale in new_sales}
@@ -1,78 +1,236 @@
 from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
+import contextvars
 from decimal import Decimal
 import json
 import logging
-import threading
 import time
+from typing import NamedTuple, Optional
 import uuid
+from django.conf import settings
 from django.db import transaction
+from django.utils import timezone
 import redis
-from infrastructure.database.redis.redis import redis_client
-from user.enums import UserTypeEnums
+from infrastructure.database.redis.locks import FairRedisLock
+from infrastructure.database.redis.redis import wallet_redis_client
+from user.services.user_service import UserService
+from utils.locks import StripedLock
+from utils.profiling import follow_current_thread
 from wallet.core.exceptions.wallet_exceptions import *
-from redis_lock import RedisLock
 from django.contrib.auth import get_user_model
 
-from wallet.enums import ChargeSaleTypeEnums, CreditRequestStatusEnums, TransactionTypeEnums, WalletStatusEnums
+from wallet.enums import ChargeSaleTypeEnums, CreditRequestStatusEnums, TransactionTypeEnums, WalletEventTypes, WalletStatusEnums
 from wallet.models import ChargeSale, CreditRequest, Transaction, Wallet
+from wallet.services.balance_cache import balance_cache_stats
+from wallet.services.balance_codec import BALANCE_FIELD, LEGACY_BALANCE_FIELD, STATUS_FIELD, decode_balance, from_minor, to_minor
+from wallet.services.charge_sale_combiner import ChargeSaleCombiner
+from wallet.services.charge_sale_queue import ChargeSaleQueue
+from wallet.services.contention_stats import contention_stats
+from wallet.services.credit_request_queue import pending_credit_requests
+from wallet.services.ledger_service import LedgerEntry, LedgerService
+from wallet.services.metrics import DB_COMMIT_SECONDS, EXECUTOR_QUEUE_DEPTH, REDIS_SECONDS, ROLLBACKS, observe
+from wallet.services.redis_scripts import (
+    CREDIT_SCRIPT,
+    RESERVE_BATCH_SCRIPT,
+    REVERSE_TRANSFER_SCRIPT,
+    SEED_BALANCE_SCRIPT,
+    TRANSFER_BATCH_SCRIPT,
+    TRANSFER_SCRIPT,
+    TRANSFERRED,
+    UNDO_ENTRY_SCRIPT,
+    WALLET_INACTIVE,
+    WALLET_MISSING,
+)
+from wallet.services.tracing import tracer
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
+
+class BulkChargeSaleResult(NamedTuple):
+    charge_sale: Optional[ChargeSale]
+    error: Optional[Exception]
+
+
+class BulkCreditRequestResult(NamedTuple):
+    credit_request: Optional[CreditRequest]
+    error: Optional[Exception]
+
+
 class AtomicWalletService:
+    LOCAL_LOCK_STRIPES = 1024
+
     def __init__(self):
-        self.redis_client = redis_client
-        self.local_locks = defaultdict(threading.Lock)
+        self.redis_client = wallet_redis_client
+        self.local_locks = StripedLock(self.LOCAL_LOCK_STRIPES)
         self.lock_timeout = 60
-        self.lock_retry_attempts = 20
-        self.lock_retry_delay = 0.2
+        self.lock_wait_budget = settings.WALLET_LOCK_WAIT_BUDGET
         self.app_lock_time_out = 5.0
+        self.transfer_script = self.redis_client.register_script(TRANSFER_SCRIPT)
+        self.transfer_batch_script = self.redis_client.register_script(TRANSFER_BATCH_SCRIPT)
+        self.reverse_transfer_script = self.redis_client.register_script(REVERSE_TRANSFER_SCRIPT)
+        self.reserve_batch_script = self.redis_client.register_script(RESERVE_BATCH_SCRIPT)
+        self.credit_script = self.redis_client.register_script(CREDIT_SCRIPT)
+        self.undo_entry_script = self.redis_client.register_script(UNDO_ENTRY_SCRIPT)
+        self.seed_balance_script = self.redis_client.register_script(SEED_BALANCE_SCRIPT)
+        self.bulk_pipeline_size = 500
+        self.write_behind = settings.WALLET_WRITE_BEHIND
+        self.event_stream = settings.WALLET_EVENT_STREAM
+        self.event_scan_count = 1000
 
     @contextmanager
     def dual_wallet_lock(self, user_id1: int, user_id2: int):
-        ids = sorted([user_id1, user_id2])
+        ids = sorted({user_id1, user_id2})
         lock_keys = [f"lock:wallet:{id}" for id in ids]
         locks = []
-        app_lock_key = f"app_lock_{ids[0]}_{ids[1]}"
-        
-        if not self.local_locks[app_lock_key].acquire(blocking=True, timeout=self.app_lock_time_out):
-            raise WalletLockException("Could not acquire application lock")
+
+        started = time.monotonic()
+        with tracer.span("lock.local", wallets=len(ids)):
+            local_stripes = self.local_locks.acquire(ids, timeout=self.app_lock_time_out)
+            if local_stripes is None:
+                contention_stats.record_lock_wait(time.monotonic() - started, timed_out=True)
+                raise WalletLockException("Could not acquire application lock")
         
         try:
+            deadline = time.monotonic() + self.lock_wait_budget
             for lock_key in lock_keys:
-                lock = RedisLock(self.redis_client, lock_key, self.lock_timeout)
-                attempts = 0
-                while attempts < self.lock_retry_attempts:
-                    if lock.acquire():
-                        locks.append(lock)
-                        break
-                    attempts += 1
-                    if attempts < self.lock_retry_attempts:
-                        time.sleep(self.lock_retry_delay)
-                else:
-                    raise WalletLockException(f"Could not acquire Redis lock: {lock_key} after {self.lock_retry_attempts} attempts")
-            yield locks
+                with tracer.span("lock.redis", key=lock_key):
+                    lock = FairRedisLock(self.redis_client, lock_key, self.lock_timeout)
+                    if not lock.acquire(timeout=max(deadline - time.monotonic(), 0)):
+                        contention_stats.record_lock_wait(time.monotonic() - started, timed_out=True)
+                        raise WalletLockException(f"Could not acquire Redis lock: {lock_key} within {self.lock_wait_budget}s")
+                locks.append(lock)
+            contention_stats.record_lock_wait(time.monotonic() - started)
+            acquired = time.monotonic()
+            try:
+                yield locks
+            finally:
+                contention_stats.record_lock_hold(time.monotonic() - acquired)
         finally:
             for lock in locks:
                 lock.release()
-            self.local_locks[app_lock_key].release()
+            self.local_locks.release(local_stripes)
 
     def get_or_create_wallet(self, user: User) -> Wallet:
-        wallet, created = Wallet.objects.get_or_create(
-            user=user,
-            defaults={'balance': Decimal('0.00'), 'status': WalletStatusEnums.ACTIVE}
-        )
-        user_key = f"wallet:user:{user.id}"
-        if self.redis_client.hget(user_key, "balance") is None:
-            self.redis_client.hset(user_key, "balance", str(wallet.balance))
-        return wallet
+        return self.load_wallet(user.id)
+
+    def load_wallet(self, user_id: int) -> Wallet:
+        """Fetch or create the wallet row and seed its balance and status into Redis."""
+        with tracer.span("wallet.get_or_create", user_id=user_id):
+            return self.load_wallets([user_id])[user_id]
+
+    def get_wallet_statuses(self, user_ids: list[int]) -> dict:
+        """Wallet status per user id, read from Redis; only wallets Redis doesn't hold are loaded from the DB."""
+        user_ids = list(dict.fromkeys(user_ids))
+        with self.redis_client.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.hmget(f"wallet:user:{user_id}", STATUS_FIELD, BALANCE_FIELD, LEGACY_BALANCE_FIELD)
+            cached = pipe.execute()
+        statuses = {}
+        missing = []
+        for user_id, (status, minor, legacy) in zip(user_ids, cached):
+            if status is None or (minor is None and legacy is None):
+                missing.append(user_id)
+            else:
+                statuses[user_id] = int(status)
+        balance_cache_stats.record(hits=len(statuses), misses=len(missing))
+        if missing:
+            statuses.update({user_id: wallet.status for user_id, wallet in self.load_wallets(missing).items()})
+        return statuses
+
+    def get_wallet_balance(self, user_id: int, client=None) -> Decimal:
+        """Balance held in Redis; a wallet Redis doesn't hold is reloaded from the DB first."""
+        client = client or self.redis_client
+        key = f"wallet:user:{user_id}"
+        minor, legacy = client.hmget(key, BALANCE_FIELD, LEGACY_BALANCE_FIELD)
+        if minor is None and legacy is None:
+            balance_cache_stats.record(misses=1)
+            self.load_wallet(user_id)
+            minor, legacy = client.hmget(key, BALANCE_FIELD, LEGACY_BALANCE_FIELD)
+        else:
+            balance_cache_stats.record(hits=1)
+        return decode_balance(minor, legacy)
+
+    @staticmethod
+    def _ledger_entry(amount: Decimal, balance_before: Decimal, balance_after: Decimal,
+                      reference_id: str, description: str) -> dict:
+        """Ledger entry in the same shape the Lua scripts write."""
+        return {
+            'id': str(uuid.uuid4()),
+            'amount_minor': str(to_minor(amount)),
+            'balance_before_minor': str(to_minor(balance_before)),
+            'balance_after_minor': str(to_minor(balance_after)),
+            'reference_id': reference_id,
+            'description': description,
+            'timestamp': int(time.time())
+        }
+
+    def transfer(self, seller_id: int, target_id: int, amount: Decimal, reference_id: str,
+                 seller_description: str, target_description: str,
+                 event_type: str = None, event_meta: dict = None) -> tuple[str, str]:
+        """Move ``amount`` between two Redis wallets and append both ledger entries in one round trip.
 
-    def get_wallet_balance(self, user_id: int) -> Decimal:
-        user_key = f"wallet:user:{user_id}"
-        balance_str = self.redis_client.hget(user_key, "balance")
-        return Decimal(balance_str) if balance_str else Decimal('0.00')
+        With ``event_type`` set the transfer is also published to the wallet event
+        stream in the same atomic step. Both wallets must be ACTIVE; the script
+        checks the status mirrored in Redis and a wallet Redis doesn't hold yet
+        is loaded from the DB before retrying. Returns the raw JSON ledger
+        entries; keep them as-is for ``reverse_transfer``.
+        """
+        seller_trans_id = str(uuid.uuid4())
+        target_trans_id = str(uuid.uuid4())
+        keys = [
+            f"wallet:user:{seller_id}",
+            f"wallet:user:{target_id}",
+            f"transactions:user:{seller_id}",
+            f"transactions:user:{target_id}",
+        ]
+        args = [
+            to_minor(amount),
+            reference_id,
+            seller_trans_id,
+            target_trans_id,
+            seller_description,
+            target_description,
+            int(time.time()),
+        ]
+        if event_type:
+            keys.append(self.event_stream)
+            args.extend([event_type, seller_id, target_id, json.dumps(event_meta or {})])
+        # At most one load per wallet before the transfer can run
+        reloads = 0
+        for attempt in range(3):
+            with tracer.span("redis.transfer", attempt=attempt), observe(REDIS_SECONDS, operation="transfer"):
+                result = self.transfer_script(keys=keys, args=args)
+            if int(result[0]) != WALLET_MISSING:
+                break
+            reloads += 1
+            self.load_wallet(seller_id if int(result[1]) == 1 else target_id)
+        balance_cache_stats.record(hits=max(2 - reloads, 0), misses=reloads)
+        return self._transfer_result(result)
+
+    @staticmethod
+    def _transfer_result(result: list) -> tuple[str, str]:
+        code = int(result[0])
+        if code == TRANSFERRED:
+            return result[1], result[2]
+        if code == WALLET_INACTIVE:
+            raise WalletInactiveException("Seller wallet is not active" if int(result[1]) == 1 else "Target wallet is not active")
+        if code == WALLET_MISSING:
+            raise WalletServiceException("Wallet could not be loaded into Redis")
+        raise InsufficientBalanceException("Insufficient balance in seller wallet")
+
+    def reverse_transfer(self, seller_id: int, target_id: int, amount: Decimal,
+                         seller_entry: str, target_entry: str) -> None:
+        self.reverse_transfer_script(
+            keys=[
+                f"wallet:user:{seller_id}",
+                f"wallet:user:{target_id}",
+                f"transactions:user:{seller_id}",
+                f"transactions:user:{target_id}",
+            ],
+            args=[to_minor(amount), seller_entry, target_entry],
+        )
 
     def create_charge_sale_atomic(self, user: User, phone_number: str, amount: Decimal) -> ChargeSale:
         if amount <= 0:
@@ -80,154 +238,536 @@ class AtomicWalletService:
         if amount < Decimal('1000.00'):
             raise ValidationError("Minimum charge amount is 1000")
 
-        target_user, _ = User.objects.get_or_create(
-            phone_number=phone_number,
-            defaults={"password": "", "user_type": UserTypeEnums.USER}
-        )
-        seller_wallet = self.get_or_create_wallet(user)
-        target_wallet = self.get_or_create_wallet(target_user)
+        # Wallet existence and status are checked by the transfer script
+        with tracer.span("user.lookup"):
+            target_user = UserService.get_or_create_receiver(phone_number)
 
-        if seller_wallet.status != WalletStatusEnums.ACTIVE:
-            raise WalletInactiveException("Seller wallet is not active")
-        if target_wallet.status != WalletStatusEnums.ACTIVE:
-            raise WalletInactiveException("Target wallet is not active")
+        if self.write_behind:
+            return self._create_charge_sale_write_behind(user, target_user, phone_number, amount)
+
+        with tracer.span("db.insert", table="wallet_chargesale"):
+            charge_sale = ChargeSale.objects.create(
+                id=uuid.uuid4(),
+                user=user,
+                phone_number=phone_number,
+                amount=amount,
+                status=ChargeSaleTypeEnums.PENDING
+            )
+        return self._execute_charge_sale(charge_sale, user, target_user)
+
+    @staticmethod
+    def charge_sale_claim_key(charge_sale_id) -> str:
+        return f"charge_sale:claim:{charge_sale_id}"
+
+    def process_queued_charge_sale(self, charge_sale_id: uuid.UUID) -> Optional[ChargeSale]:
+        """Run a PENDING sale accepted by ``ChargeSaleQueue.enqueue``.
+
+        Each sale is claimed once in Redis before any money moves, so a job
+        redelivered after a worker crash is skipped instead of charged twice.
+        The claim holds the time it was taken; ``release_stale_claim`` settles
+        sales whose worker died holding one. Returns None for skipped jobs.
+        """
+        with tracer.span("wallet.process_queued_charge_sale", charge_sale_id=str(charge_sale_id)):
+            return self._process_queued_charge_sale(charge_sale_id)
+
+    def _process_queued_charge_sale(self, charge_sale_id: uuid.UUID) -> Optional[ChargeSale]:
+        charge_sale = ChargeSale.objects.select_related('user').get(id=charge_sale_id)
+        if charge_sale.status != ChargeSaleTypeEnums.PENDING:
+            return None
+        if not self.redis_client.set(self.charge_sale_claim_key(charge_sale.id), time.time(), nx=True, ex=86400):
+            logger.warning(f"Charge sale {charge_sale.id} was already claimed, skipping redelivery")
+            return None
+
+        user = charge_sale.user
+        try:
+            target_user = UserService.get_or_create_receiver(charge_sale.phone_number)
+        except Exception as e:
+            charge_sale.status = ChargeSaleTypeEnums.FAILED
+            charge_sale.save(update_fields=['status', 'updated_at'])
+            logger.error(f"Charge sale failed: {charge_sale.id} - {str(e)}")
+            raise WalletServiceException(f"Charge sale failed: {str(e)}")
+        return self._execute_charge_sale(charge_sale, user, target_user)
+
+    def release_stale_claim(self, charge_sale: ChargeSale) -> Optional[int]:
+        """Settle a PENDING sale whose worker died after claiming it.
+
+        Drops the claim. If the transfer never ran, the sale can simply run
+        again: returns PENDING for the caller to requeue it. If it ran but
+        was never recorded, it is reversed and the sale marked FAILED, as when
+        recording fails: returns FAILED. Returns None when another reaper
+        released the claim first.
+        """
+        if not self.redis_client.delete(self.charge_sale_claim_key(charge_sale.id)):
+            return None
+        reference_id = str(charge_sale.id)
+        seller_entry = self._find_ledger_entry(charge_sale.user_id, reference_id)
+        if seller_entry is None:
+            logger.warning(f"Requeueing charge sale {charge_sale.id} abandoned before its transfer")
+            return ChargeSaleTypeEnums.PENDING
+
+        target_user = UserService.get_or_create_receiver(charge_sale.phone_number)
+        with tracer.span("rollback", cause="abandoned"):
+            self.reverse_transfer(charge_sale.user_id, target_user.id, charge_sale.amount, seller_entry,
+                                  self._find_ledger_entry(target_user.id, reference_id) or "")
+            ROLLBACKS.labels("charge_sale").inc()
+            ChargeSale.objects.filter(id=charge_sale.id, status=ChargeSaleTypeEnums.PENDING).update(
+                status=ChargeSaleTypeEnums.FAILED, updated_at=timezone.now()
+            )
+        logger.warning(f"Reversed charge sale {charge_sale.id} abandoned after its transfer")
+        return ChargeSaleTypeEnums.FAILED
+
+    def _find_ledger_entry(self, user_id: int, reference_id: str) -> Optional[str]:
+        """Raw entry of the user's Redis ledger for ``reference_id``, if any."""
+        for entry in self.redis_client.lrange(f"transactions:user:{user_id}", 0, -1):
+            if json.loads(entry).get('reference_id') == reference_id:
+                return entry
+        return None
+
+    def _execute_charge_sale(self, charge_sale: ChargeSale, user: User, target_user: User) -> ChargeSale:
+        """Move the funds for a saved PENDING sale and record it, marking it FAILED on any error."""
+        amount = charge_sale.amount
+        phone_number = charge_sale.phone_number
+        try:
+            seller_entry, target_entry = self.transfer(
+                user.id,
+                target_user.id,
+                amount,
+                reference_id=str(charge_sale.id),
+                seller_description=f"Charge sale deduction to {phone_number}",
+                target_description=f"Charge sale credit from {user.phone_number}",
+            )
+        except Exception as e:
+            charge_sale.status = ChargeSaleTypeEnums.FAILED
+            charge_sale.save(update_fields=['status', 'updated_at'])
+            logger.error(f"Charge sale failed: {charge_sale.id} - {str(e)}")
+            raise WalletServiceException(f"Charge sale failed: {str(e)}")
+
+        try:
+            self._record_charge_sale(charge_sale, user, target_user, seller_entry, target_entry)
+        except Exception as e:
+            # Rollback Redis
+            with tracer.span("rollback", cause=type(e).__name__):
+                self.reverse_transfer(user.id, target_user.id, amount, seller_entry, target_entry)
+                ROLLBACKS.labels("charge_sale").inc()
+                charge_sale.status = ChargeSaleTypeEnums.FAILED
+                charge_sale.save(update_fields=['status', 'updated_at'])
+            logger.error(f"Charge sale failed with rollback: {charge_sale.id} - {str(e)}")
+            raise WalletServiceException(f"Charge sale failed: {str(e)}")
+
+        logger.info(f"Charge sale completed: {charge_sale.id}")
+        return charge_sale
+
+    def _record_charge_sale(self, charge_sale: ChargeSale, user: User, target_user: User,
+                            seller_entry: str, target_entry: str) -> None:
+        """Write the DB side of a charge sale already committed in Redis, in one transaction."""
+        amount = charge_sale.amount
+        seller_trans = json.loads(seller_entry)
+        target_trans = json.loads(target_entry)
+        with tracer.span("db.transaction", operation="charge_sale"), \
+                observe(DB_COMMIT_SECONDS, operation="charge_sale"), transaction.atomic():
+            with tracer.span("db.insert", table="wallet_transaction"):
+                seller_transaction = Transaction.objects.create(
+                    id=uuid.UUID(seller_trans['id']),
+                    seller=user,
+                    transaction_type=TransactionTypeEnums.CHARGE_SALE,
+                    amount=-amount,
+                    balance_before=from_minor(seller_trans['balance_before_minor']),
+                    balance_after=from_minor(seller_trans['balance_after_minor']),
+                    reference_id=str(charge_sale.id),
+                    description=seller_trans['description']
+                )
+            with tracer.span("db.insert", table="wallet_transaction"):
+                Transaction.objects.create(
+                    id=uuid.UUID(target_trans['id']),
+                    seller=target_user,
+                    transaction_type=TransactionTypeEnums.CREDIT_INCREASE,
+                    amount=amount,
+                    balance_before=from_minor(target_trans['balance_before_minor']),
+                    balance_after=from_minor(target_trans['balance_after_minor']),
+                    reference_id=str(charge_sale.id),
+                    description=target_trans['description']
+                )
+            with tracer.span("db.update", table="wallet_wallet"):
+                Wallet.objects.apply_balance_deltas([(user.id, -amount), (target_user.id, amount)])
+            with tracer.span("db.update", table="wallet_chargesale"):
+                charge_sale.status = ChargeSaleTypeEnums.COMPLETED
+                charge_sale.transaction = seller_transaction
+                charge_sale.save(update_fields=['status', 'transaction', 'updated_at'])
 
-        charge_sale = ChargeSale.objects.create(
+    def _create_charge_sale_write_behind(self, user: User, target_user: User, phone_number: str,
+                                         amount: Decimal) -> ChargeSale:
+        """Commit the sale in Redis only; ``WalletEventConsumer`` persists it to Postgres later."""
+        charge_sale = ChargeSale(
             id=uuid.uuid4(),
             user=user,
             phone_number=phone_number,
             amount=amount,
             status=ChargeSaleTypeEnums.PENDING
         )
+        try:
+            self.transfer(
+                user.id,
+                target_user.id,
+                amount,
+                reference_id=str(charge_sale.id),
+                seller_description=f"Charge sale deduction to {phone_number}",
+                target_description=f"Charge sale credit from {user.phone_number}",
+                event_type=WalletEventTypes.CHARGE_SALE,
+                event_meta={"phone_number": phone_number},
+            )
+        except Exception as e:
+            charge_sale.status = ChargeSaleTypeEnums.FAILED
+            charge_sale.save()
+            logger.error(f"Charge sale failed: {charge_sale.id} - {str(e)}")
+            raise WalletServiceException(f"Charge sale failed: {str(e)}")
 
-        retry_count = 0
-        while retry_count < 3:
-            try:
-                with self.dual_wallet_lock(user.id, target_user.id):
-                    seller_key = f"wallet:user:{user.id}"
-                    target_key = f"wallet:user:{target_user.id}"
-                    seller_trans_key = f"transactions:user:{user.id}"
-                    target_trans_key = f"transactions:user:{target_user.id}"
+        charge_sale.status = ChargeSaleTypeEnums.COMPLETED
+        logger.info(f"Charge sale committed to Redis, DB write deferred: {charge_sale.id}")
+        return charge_sale
 
-                    seller_original_balance = self.get_wallet_balance(user.id)
-                    target_original_balance = self.get_wallet_balance(target_user.id)
-                    seller_trans_json = None
-                    target_trans_json = None
+    def load_wallets(self, user_ids: list[int]) -> dict:
+        """Bulk variant of ``load_wallet``, keyed by user id.
 
-                    try:
-                        # Check balance
-                        if seller_original_balance < amount:
-                            raise InsufficientBalanceException("Insufficient balance in seller wallet")
+        The balance seeded is ``Wallet.balance`` plus any write-behind sales of
+        the wallet still waiting in the event stream, so a wallet lost from
+        Redis comes back with every committed sale. The seed script only
+        writes a balance Redis doesn't hold yet, so concurrent reloads of one
+        wallet can't overwrite each other or a transfer made in between.
+        """
+        pending = self.pending_event_deltas(user_ids)
+        wallets = {w.user_id: w for w in Wallet.objects.filter(user_id__in=user_ids)}
+        missing = [user_id for user_id in user_ids if user_id not in wallets]
+        if missing:
+            Wallet.objects.bulk_create(
+                [Wallet(user_id=user_id, balance=Decimal('0.00'), status=WalletStatusEnums.ACTIVE) for user_id in missing],
+                ignore_conflicts=True,
+            )
+            wallets.update({w.user_id: w for w in Wallet.objects.filter(user_id__in=missing)})
 
-                        # Update Redis balances
-                        new_seller_balance = seller_original_balance - amount
-                        new_target_balance = target_original_balance + amount
+        deltas = {}
+        if pending:
+            with transaction.atomic():
+                # A flush touching these wallets blocks on the row locks, so each
+                # pending sale is either in the balance read here or not yet inserted
+                wallets.update({
+                    w.user_id: w
+                    for w in Wallet.objects.select_for_update().filter(user_id__in=pending).order_by('user_id')
+                })
+                deltas = self.unsettled_deltas(pending)
 
-                        with self.redis_client.pipeline() as pipe:
-                            pipe.watch(seller_key, target_key)
-                            current_seller_balance = Decimal(pipe.hget(seller_key, "balance") or '0.00')
-                            current_target_balance = Decimal(pipe.hget(target_key, "balance") or '0.00')
-                            if current_seller_balance != seller_original_balance or \
-                               current_target_balance != target_original_balance:
-                                raise redis.WatchError("Balance changed during transaction")
-                            if current_seller_balance < amount:
-                                raise InsufficientBalanceException("Insufficient balance in seller wallet")
+        self.seed_wallets([(w.user_id, w.balance, w.status) for w in wallets.values()], deltas)
+        return wallets
 
-                            pipe.multi()
-                            pipe.hset(seller_key, "balance", str(new_seller_balance))
-                            pipe.hset(target_key, "balance", str(new_target_balance))
-                            
-                            # Create transaction data
-                            seller_trans = {
-                                'id': str(uuid.uuid4()),
-                                'amount': str(-amount),
-                                'balance_before': str(seller_original_balance),
-                                'balance_after': str(new_seller_balance),
-                                'reference_id': str(charge_sale.id),
-                                'description': f"Charge sale deduction to {phone_number}",
-                                'timestamp': int(time.time())
-                            }
-                            target_trans = {
-                                'id': str(uuid.uuid4()),
-                                'amount': str(amount),
-                                'balance_before': str(target_original_balance),
-                                'balance_after': str(new_target_balance),
-                                'reference_id': str(charge_sale.id),
-                                'description': f"Charge sale credit from {user.phone_number}",
-                                'timestamp': int(time.time())
-                            }
-                            seller_trans_json = json.dumps(seller_trans)
-                            target_trans_json = json.dumps(target_trans)
-                            pipe.rpush(seller_trans_key, seller_trans_json)
-                            pipe.rpush(target_trans_key, target_trans_json)
-                            pipe.execute()
+    def seed_wallets(self, rows, deltas: dict = None) -> int:
+        """Seed ``(user_id, balance, status)`` rows into Redis in one pipeline.
 
-                        # Update database
-                        with transaction.atomic():
-                            seller_transaction = Transaction.objects.create(
-                                id=uuid.UUID(seller_trans['id']),
-                                seller=user,
-                                transaction_type=TransactionTypeEnums.CHARGE_SALE,
-                                amount=-amount,
-                                balance_before=seller_original_balance,
-                                balance_after=new_seller_balance,
-                                reference_id=str(charge_sale.id),
-                                description=seller_trans['description']
-                            )
-                            target_transaction = Transaction.objects.create(
-                                id=uuid.UUID(target_trans['id']),
-                                seller=target_user,
-                                transaction_type=TransactionTypeEnums.CREDIT_INCREASE,
-                                amount=amount,
-                                balance_before=target_original_balance,
-                                balance_after=new_target_balance,
-                                reference_id=str(charge_sale.id),
-                                description=target_trans['description']
-                            )
-                            seller_wallet.balance = new_seller_balance
-                            target_wallet.balance = new_target_balance
-                            seller_wallet.save(update_fields=['balance'])
-                            target_wallet.save(update_fields=['balance'])
-                            charge_sale.status = ChargeSaleTypeEnums.COMPLETED
-                            charge_sale.transaction = seller_transaction
-                            charge_sale.save(update_fields=['status', 'transaction'])
+        ``deltas`` (``{user_id: minor units}``, see ``unsettled_deltas``) is
+        added to the DB balances; without it the rows must belong to wallets
+        with nothing in the event stream. Returns the number of balances
+        written, i.e. not already held by Redis.
+        """
+        deltas = deltas or {}
+        with self.redis_client.pipeline(transaction=False) as pipe:
+            for user_id, balance, status in rows:
+                balance = to_minor(balance) + deltas.get(user_id, 0)
+                self.seed_balance_script(keys=[f"wallet:user:{user_id}"], args=[balance, status], client=pipe)
+            return sum(int(seeded) for seeded in pipe.execute())
 
-                        logger.info(f"Charge sale completed: {charge_sale.id}")
-                        return charge_sale
+    @staticmethod
+    def unsettled_deltas(pending: dict) -> dict:
+        """Net ``{user_id: minor units}`` of the ``pending_event_deltas`` sales not yet in Postgres."""
+        sale_ids = {sale_id for deltas in pending.values() for sale_id, _ in deltas}
+        settled = set(ChargeSale.objects.filter(id__in=sale_ids).values_list('id', flat=True))
+        return {
+            user_id: sum(delta for sale_id, delta in deltas if sale_id not in settled)
+            for user_id, deltas in pending.items()
+        }
 
-                    except Exception as e:
-                        # Rollback Redis
-                        self.redis_client.hset(seller_key, "balance", str(seller_original_balance))
-                        self.redis_client.hset(target_key, "balance", str(target_original_balance))
-                        if seller_trans_json:
-                            self.redis_client.lrem(seller_trans_key, 1, seller_trans_json)
-                        if target_trans_json:
-                            self.redis_client.lrem(target_trans_key, 1, target_trans_json)
-                        charge_sale.status = ChargeSaleTypeEnums.FAILED
-                        charge_sale.save(update_fields=['status'])
-                        logger.error(f"Charge sale failed with rollback: {charge_sale.id} - {str(e)}")
-                        raise WalletServiceException(f"Charge sale failed: {str(e)}")
+    def pending_event_deltas(self, user_ids: list[int] = None) -> dict:
+        """``{user_id: [(sale_id, balance_delta_minor), ...]}`` for sales still in the event stream.
 
-            except redis.WatchError:
-                retry_count += 1
-                logger.warning(f"Redis watch conflict, retry {retry_count}/3")
-                if retry_count >= 3:
-                    charge_sale.status = ChargeSaleTypeEnums.FAILED
-                    charge_sale.save(update_fields=['status'])
-                    raise ConcurrencyException("Max retries exceeded for charge sale")
-                time.sleep(0.1 * retry_count)
+        Covers every wallet when ``user_ids`` is None. Read before the wallet
+        rows: an event can only leave the stream after its sale is committed,
+        which the caller then sees.
+        """
+        wanted = None if user_ids is None else {str(user_id) for user_id in user_ids}
+        pending = defaultdict(list)
+        start = "-"
+        while True:
+            messages = self.redis_client.xrange(self.event_stream, min=start, count=self.event_scan_count)
+            for _, fields in messages:
+                if fields.get("type") != WalletEventTypes.CHARGE_SALE:
+                    continue
+                sale_id = uuid.UUID(fields["reference_id"])
+                amount = int(fields["amount_minor"])
+                if wanted is None or fields["seller_id"] in wanted:
+                    pending[int(fields["seller_id"])].append((sale_id, -amount))
+                if wanted is None or fields["target_id"] in wanted:
+                    pending[int(fields["target_id"])].append((sale_id, amount))
+            if len(messages) < self.event_scan_count:
+                return pending
+            start = f"({messages[-1][0]}"
+
+    def _undo_entries(self, entries: list) -> None:
+        """Undo ``(user_id, balance_delta, ledger_entry)`` triples in one pipeline."""
+        with self.redis_client.pipeline(transaction=False) as pipe:
+            for user_id, delta, entry in entries:
+                self.undo_entry_script(
+                    keys=[f"wallet:user:{user_id}", f"transactions:user:{user_id}"],
+                    args=[to_minor(delta), entry],
+                    client=pipe,
+                )
+            pipe.execute()
+
+    def _prepare_charge_sales(self, user: User, items: list) -> tuple[list, list]:
+        """Validate ``(phone_number, amount)`` items of one seller.
+
+        Returns the results list with the rejected items filled in, and
+        ``(index, ChargeSale, target user)`` for the rest, in order.
+        """
+        receivers = UserService.get_or_create_receivers([phone_number for phone_number, _ in items])
+        statuses = self.get_wallet_statuses([user.id] + [target_user.id for target_user in receivers.values()])
+        if statuses[user.id] != WalletStatusEnums.ACTIVE:
+            raise WalletInactiveException("Seller wallet is not active")
+
+        results = [None] * len(items)
+        sales = []
+        for index, (phone_number, amount) in enumerate(items):
+            amount = Decimal(amount)
+            if amount < Decimal('1000.00'):
+                results[index] = BulkChargeSaleResult(None, ValidationError("Minimum charge amount is 1000"))
+                continue
+            target_user = receivers[phone_number]
+            if statuses[target_user.id] != WalletStatusEnums.ACTIVE:
+                results[index] = BulkChargeSaleResult(None, WalletInactiveException("Target wallet is not active"))
+                continue
+            charge_sale = ChargeSale(
+                id=uuid.uuid4(),
+                user=user,
+                phone_number=phone_number,
+                amount=amount,
+                status=ChargeSaleTypeEnums.PENDING
+            )
+            sales.append((index, charge_sale, target_user))
+        return results, sales
+
+    def _record_charge_sales(self, user: User, sales: list, transferred: list, operation: str) -> None:
+        """Write a batch in one DB transaction: the ledger rows and balance deltas of the
+        ``(charge_sale, target_user, seller_entry, target_entry)`` transfers, and every sale of ``sales``."""
+        transactions = []
+        deltas = []
+        for charge_sale, target_user, seller_entry, target_entry in transferred:
+            seller_trans = json.loads(seller_entry)
+            target_trans = json.loads(target_entry)
+            transactions.append(Transaction(
+                id=uuid.UUID(seller_trans['id']),
+                seller=user,
+                transaction_type=TransactionTypeEnums.CHARGE_SALE,
+                amount=-charge_sale.amount,
+                balance_before=from_minor(seller_trans['balance_before_minor']),
+                balance_after=from_minor(seller_trans['balance_after_minor']),
+                reference_id=str(charge_sale.id),
+                description=seller_trans['description']
+            ))
+            transactions.append(Transaction(
+                id=uuid.UUID(target_trans['id']),
+                seller=target_user,
+                transaction_type=TransactionTypeEnums.CREDIT_INCREASE,
+                amount=charge_sale.amount,
+                balance_before=from_minor(target_trans['balance_before_minor']),
+                balance_after=from_minor(target_trans['balance_after_minor']),
+                reference_id=str(charge_sale.id),
+                description=target_trans['description']
+            ))
+            deltas.append((user.id, -charge_sale.amount))
+            deltas.append((target_user.id, charge_sale.amount))
+            charge_sale.status = ChargeSaleTypeEnums.COMPLETED
+            charge_sale.transaction_id = uuid.UUID(seller_trans['id'])
+
+        with observe(DB_COMMIT_SECONDS, operation=operation), transaction.atomic():
+            Transaction.objects.bulk_create(transactions)
+            ChargeSale.objects.bulk_create([charge_sale for _, charge_sale, _ in sales])
+            Wallet.objects.apply_balance_deltas(deltas)
+
+    def create_charge_sales_batch_atomic(self, user: User, items: list) -> list[BulkChargeSaleResult]:
+        """Run a small batch of ``(phone_number, amount)`` charge sales for one seller in one script.
+
+        Used by ``ChargeSaleCombiner``. Every item is transferred as
+        ``transfer`` would, in order, by a single Redis script, so the batch
+        commits in Redis all at once. With write-behind the script also
+        publishes each sale to the event stream and the DB is left to
+        ``WalletEventConsumer``. Otherwise the rows are written in one DB
+        transaction, and the whole batch is reversed if that fails. Returns
+        one ``BulkChargeSaleResult`` per item, in input order.
+        """
+        results, sales = self._prepare_charge_sales(user, items)
+        if not sales:
+            return results
+
+        keys = [f"wallet:user:{user.id}", f"transactions:user:{user.id}", self.event_stream]
+        args = [int(time.time()), int(self.write_behind), user.id, WalletEventTypes.CHARGE_SALE]
+        for _, charge_sale, target_user in sales:
+            keys.extend([f"wallet:user:{target_user.id}", f"transactions:user:{target_user.id}"])
+            args.extend([
+                to_minor(charge_sale.amount),
+                str(charge_sale.id),
+                str(uuid.uuid4()),
+                str(uuid.uuid4()),
+                f"Charge sale deduction to {charge_sale.phone_number}",
+                f"Charge sale credit from {user.phone_number}",
+                target_user.id,
+                json.dumps({"phone_number": charge_sale.phone_number}),
+            ])
+        # At most one load per wallet before the batch can run
+        for _ in range(len(sales) + 2):
+            with observe(REDIS_SECONDS, operation="transfer_batch"):
+                result = self.transfer_batch_script(keys=keys, args=args)
+            if int(result[0]) != WALLET_MISSING:
+                break
+            position = int(result[1])
+            self.load_wallet(user.id if position == 1 else sales[position - 2][2].id)
+        if int(result[0]) == WALLET_MISSING:
+            raise WalletServiceException("Wallet could not be loaded into Redis")
+        if int(result[0]) == WALLET_INACTIVE:
+            raise WalletInactiveException("Seller wallet is not active")
+
+        transferred = []
+        for position, (index, charge_sale, target_user) in enumerate(sales):
+            seller_entry, target_entry = result[1 + 2 * position], result[2 + 2 * position]
+            if target_entry:
+                transferred.append((index, charge_sale, target_user, seller_entry, target_entry))
+                continue
+            charge_sale.status = ChargeSaleTypeEnums.FAILED
+            if int(seller_entry) == WALLET_INACTIVE:
+                error = WalletInactiveException("Target wallet is not active")
+            else:
+                error = InsufficientBalanceException("Insufficient balance in seller wallet")
+            results[index] = BulkChargeSaleResult(charge_sale, error)
+
+        if self.write_behind:
+            # The committed sales reach the DB through the event stream; only the failed ones are written now
+            for _, charge_sale, _, _, _ in transferred:
+                charge_sale.status = ChargeSaleTypeEnums.COMPLETED
+            failed = [charge_sale for _, charge_sale, _ in sales if charge_sale.status == ChargeSaleTypeEnums.FAILED]
+            try:
+                ChargeSale.objects.bulk_create(failed)
+            except Exception as e:
+                # The committed sales stand either way
+                logger.error(f"Could not record {len(failed)} failed charge sales for user {user.id}: {str(e)}")
+        else:
+            try:
+                self._record_charge_sales(user, sales, [item[1:] for item in transferred], operation="charge_sale_batch")
+            except Exception as e:
+                # Rollback Redis: every transferred item on both sides
+                undo = []
+                for _, charge_sale, target_user, seller_entry, target_entry in transferred:
+                    undo.append((user.id, charge_sale.amount, seller_entry))
+                    undo.append((target_user.id, -charge_sale.amount, target_entry))
+                self._undo_entries(undo)
+                ROLLBACKS.labels("charge_sale_batch").inc()
+                logger.error(f"Charge sale batch failed for user {user.id}: {str(e)}")
+                raise WalletServiceException(f"Charge sale failed: {str(e)}")
+
+        for index, charge_sale, _, _, _ in transferred:
+            results[index] = BulkChargeSaleResult(charge_sale, None)
+        return results
+
+    def create_charge_sales_bulk_atomic(self, user: User, items: list) -> list[BulkChargeSaleResult]:
+        """Run a batch of ``(phone_number, amount)`` charge sales for one seller.
+
+        The seller is debited for the whole batch in one atomic step, item by
+        item in order while the balance lasts. Receivers are then credited in
+        pipelined groups and every DB row is written with bulk inserts. Returns
+        one ``BulkChargeSaleResult`` per item, in input order.
+        """
+        results, sales = self._prepare_charge_sales(user, items)
+        if not sales:
+            return results
+
+        timestamp = int(time.time())
+        reserve_args = [timestamp]
+        for _, charge_sale, _ in sales:
+            reserve_args.extend([
+                to_minor(charge_sale.amount),
+                str(charge_sale.id),
+                str(uuid.uuid4()),
+                f"Charge sale deduction to {charge_sale.phone_number}",
+            ])
+        with observe(REDIS_SECONDS, operation="reserve_batch"):
+            seller_entries = self.reserve_batch_script(
+                keys=[f"wallet:user:{user.id}", f"transactions:user:{user.id}"],
+                args=reserve_args,
+            )
+
+        accepted = []
+        for (index, charge_sale, target_user), seller_entry in zip(sales, seller_entries):
+            if seller_entry:
+                accepted.append((index, charge_sale, target_user, seller_entry))
+            else:
+                charge_sale.status = ChargeSaleTypeEnums.FAILED
+                results[index] = BulkChargeSaleResult(
+                    charge_sale, InsufficientBalanceException("Insufficient balance in seller wallet")
+                )
+
+        target_entries = []
+        try:
+            for start in range(0, len(accepted), self.bulk_pipeline_size):
+                with self.redis_client.pipeline(transaction=False) as pipe:
+                    for _, charge_sale, target_user, _ in accepted[start:start + self.bulk_pipeline_size]:
+                        self.credit_script(
+                            keys=[f"wallet:user:{target_user.id}", f"transactions:user:{target_user.id}"],
+                            args=[
+                                to_minor(charge_sale.amount),
+                                str(charge_sale.id),
+                                str(uuid.uuid4()),
+                                f"Charge sale credit from {user.phone_number}",
+                                timestamp,
+                            ],
+                            client=pipe,
+                        )
+                    with observe(REDIS_SECONDS, operation="credit_pipeline"):
+                        target_entries.extend(pipe.execute())
+
+            self._record_charge_sales(user, sales, [
+                (charge_sale, target_user, seller_entry, target_entry)
+                for (_, charge_sale, target_user, seller_entry), target_entry in zip(accepted, target_entries)
+            ], operation="bulk_charge_sale")
+        except Exception as e:
+            # Rollback Redis: credited items are undone on both sides, the rest only release the seller
+            undo = []
+            for position, (_, charge_sale, target_user, seller_entry) in enumerate(accepted):
+                undo.append((user.id, charge_sale.amount, seller_entry))
+                if position < len(target_entries):
+                    undo.append((target_user.id, -charge_sale.amount, target_entries[position]))
+            self._undo_entries(undo)
+            ROLLBACKS.labels("bulk_charge_sale").inc()
+            logger.error(f"Bulk charge sale failed with rollback for user {user.id}: {str(e)}")
+            raise WalletServiceException(f"Bulk charge sale failed: {str(e)}")
+
+        for index, charge_sale, _, _ in accepted:
+            results[index] = BulkChargeSaleResult(charge_sale, None)
+        logger.info(f"Bulk charge sale completed for user {user.id}: {len(accepted)}/{len(items)} items")
+        return results
 
-        charge_sale.status = ChargeSaleTypeEnums.FAILED
-        charge_sale.save(update_fields=['status'])
-        raise ConcurrencyException("Max retries exceeded for charge sale")
+    @staticmethod
+    def _mark_credit_request_failed(credit_request: CreditRequest) -> None:
+        """Mark a request whose approval failed FAILED, unless a concurrent call decided it meanwhile."""
+        failed = CreditRequest.objects.filter(
+            id=credit_request.id,
+            status=CreditRequestStatusEnums.WAITING
+        ).update(status=CreditRequestStatusEnums.FAILED, updated_at=timezone.now())
+        if failed:
+            credit_request.status = CreditRequestStatusEnums.FAILED
+            pending_credit_requests.removed([credit_request])
 
     def approve_credit_request_atomic(self, credit_request_id: int, admin_user: User) -> CreditRequest:
         """Approve credit request with atomic dual-wallet updates."""
         try:
-            credit_request = CreditRequest.objects.get(
-                id=credit_request_id,
-                status=CreditRequestStatusEnums.WAITING
-            )
+            with tracer.span("db.get", table="wallet_creditrequest"):
+                credit_request = CreditRequest.objects.get(
+                    id=credit_request_id,
+                    status=CreditRequestStatusEnums.WAITING
+                )
         except CreditRequest.DoesNotExist:
             raise ValidationError("Credit request not found or already processed")
 
@@ -252,54 +792,52 @@ class AtomicWalletService:
                 try:
                     # No balance change for self-transfer
                     with self.redis_client.pipeline() as pipe:
-                        pipe.watch(user_key)
-                        current_balance = Decimal(pipe.hget(user_key, "balance") or '0.00')
-                        if current_balance != user_original_balance:
-                            raise redis.WatchError("Balance changed")
+                        with tracer.span("redis.watch_check"):
+                            pipe.watch(user_key)
+                            current_balance = self.get_wallet_balance(user.id, client=pipe)
+                            if current_balance != user_original_balance:
+                                raise redis.WatchError("Balance changed")
                         if current_balance < amount:
                             raise InsufficientBalanceException("Insufficient balance for self-transfer")
 
-                        user_trans = {
-                            'id': str(uuid.uuid4()),
-                            'amount': "0.00",
-                            'balance_before': str(user_original_balance),
-                            'balance_after': str(user_original_balance),
-                            'reference_id': str(credit_request.id),
-                            'description': f"Self-transfer for credit request {credit_request.id}",
-                            'timestamp': int(time.time())
-                        }
+                        user_trans = self._ledger_entry(
+                            Decimal('0.00'), user_original_balance, user_original_balance,
+                            str(credit_request.id), f"Self-transfer for credit request {credit_request.id}",
+                        )
                         user_trans_json = json.dumps(user_trans)
                         pipe.multi()
-                        pipe.hset(user_key, "balance", str(user_original_balance))  # No change
                         pipe.rpush(user_trans_key, user_trans_json)
-                        pipe.execute()
+                        with tracer.span("redis.pipeline_execute"):
+                            pipe.execute()
 
-                    with transaction.atomic():
-                        Transaction.objects.create(
-                            id=uuid.UUID(user_trans['id']),
-                            seller=user,
-                            transaction_type=TransactionTypeEnums.CREDIT_INCREASE,
-                            amount=Decimal('0.00'),
-                            balance_before=user_original_balance,
-                            balance_after=user_original_balance,
-                            reference_id=str(credit_request.id),
-                            description=user_trans['description'],
-                            admin_user=admin_user
-                        )
-                        user_wallet.balance = user_original_balance
-                        user_wallet.save(update_fields=['balance'])
-                        credit_request.status = CreditRequestStatusEnums.ACCEPTED
-                        credit_request.admin = admin_user
-                        credit_request.save(update_fields=['status', 'admin'])
+                    with tracer.span("db.transaction", operation="credit_approval"), transaction.atomic():
+                        with tracer.span("db.insert", table="wallet_transaction"):
+                            Transaction.objects.create(
+                                id=uuid.UUID(user_trans['id']),
+                                seller=user,
+                                transaction_type=TransactionTypeEnums.CREDIT_INCREASE,
+                                amount=Decimal('0.00'),
+                                balance_before=user_original_balance,
+                                balance_after=user_original_balance,
+                                reference_id=str(credit_request.id),
+                                description=user_trans['description'],
+                                admin_user=admin_user
+                            )
+                        with tracer.span("db.update", table="wallet_creditrequest"):
+                            credit_request.status = CreditRequestStatusEnums.ACCEPTED
+                            credit_request.admin = admin_user
+                            credit_request.approved_at = timezone.now()
+                            credit_request.save(update_fields=['status', 'admin', 'approved_at', 'updated_at'])
+                        pending_credit_requests.removed([credit_request])
 
                     logger.info(f"Credit approval (self-transfer) completed: {credit_request.id}")
                     return credit_request
 
                 except Exception as e:
-                    if user_trans_json:
-                        self.redis_client.lrem(user_trans_key, 1, user_trans_json)
-                    credit_request.status = CreditRequestStatusEnums.FAILED
-                    credit_request.save(update_fields=['status'])
+                    with tracer.span("rollback", cause=type(e).__name__):
+                        if user_trans_json:
+                            self.redis_client.lrem(user_trans_key, 1, user_trans_json)
+                        self._mark_credit_request_failed(credit_request)
                     logger.error(f"Credit approval (self-transfer) failed with rollback: {credit_request.id} - {str(e)}")
                     raise WalletServiceException(f"Credit approval failed: {str(e)}")
 
@@ -312,10 +850,12 @@ class AtomicWalletService:
                     admin_trans_key = f"transactions:user:{admin_user.id}"
                     user_trans_key = f"transactions:user:{user.id}"
 
-                    admin_original_balance = self.get_wallet_balance(admin_user.id)
-                    user_original_balance = self.get_wallet_balance(user.id)
+                    with tracer.span("redis.read_balances"):
+                        admin_original_balance = self.get_wallet_balance(admin_user.id)
+                        user_original_balance = self.get_wallet_balance(user.id)
                     admin_trans_json = None
                     user_trans_json = None
+                    redis_committed = False
 
                     try:
                         if admin_original_balance < amount:
@@ -325,103 +865,257 @@ class AtomicWalletService:
                         new_user_balance = user_original_balance + amount
 
                         with self.redis_client.pipeline() as pipe:
-                            pipe.watch(admin_key, user_key)
-                            current_admin_balance = Decimal(pipe.hget(admin_key, "balance") or '0.00')
-                            current_user_balance = Decimal(pipe.hget(user_key, "balance") or '0.00')
-                            if current_admin_balance != admin_original_balance or \
-                               current_user_balance != user_original_balance:
-                                raise redis.WatchError("Balance changed")
+                            with tracer.span("redis.watch_check"):
+                                pipe.watch(admin_key, user_key)
+                                current_admin_balance = self.get_wallet_balance(admin_user.id, client=pipe)
+                                current_user_balance = self.get_wallet_balance(user.id, client=pipe)
+                                if current_admin_balance != admin_original_balance or \
+                                   current_user_balance != user_original_balance:
+                                    raise redis.WatchError("Balance changed")
                             if current_admin_balance < amount:
                                 raise InsufficientBalanceException("Admin insufficient balance")
 
                             pipe.multi()
-                            pipe.hset(admin_key, "balance", str(new_admin_balance))
-                            pipe.hset(user_key, "balance", str(new_user_balance))
-                            
-                            admin_trans = {
-                                'id': str(uuid.uuid4()),
-                                'amount': str(-amount),
-                                'balance_before': str(admin_original_balance),
-                                'balance_after': str(new_admin_balance),
-                                'reference_id': str(credit_request.id),
-                                'description': f"Transfer to user {user.id} for credit request",
-                                'timestamp': int(time.time())
-                            }
-                            user_trans = {
-                                'id': str(uuid.uuid4()),
-                                'amount': str(amount),
-                                'balance_before': str(user_original_balance),
-                                'balance_after': str(new_user_balance),
-                                'reference_id': str(credit_request.id),
-                                'description': f"Credit increase from admin {admin_user.id}",
-                                'timestamp': int(time.time())
-                            }
+                            pipe.hset(admin_key, BALANCE_FIELD, to_minor(new_admin_balance))
+                            pipe.hset(user_key, BALANCE_FIELD, to_minor(new_user_balance))
+                            pipe.hdel(admin_key, LEGACY_BALANCE_FIELD)
+                            pipe.hdel(user_key, LEGACY_BALANCE_FIELD)
+
+                            admin_trans = self._ledger_entry(
+                                -amount, admin_original_balance, new_admin_balance,
+                                str(credit_request.id), f"Transfer to user {user.id} for credit request",
+                            )
+                            user_trans = self._ledger_entry(
+                                amount, user_original_balance, new_user_balance,
+                                str(credit_request.id), f"Credit increase from admin {admin_user.id}",
+                            )
                             admin_trans_json = json.dumps(admin_trans)
                             user_trans_json = json.dumps(user_trans)
                             pipe.rpush(admin_trans_key, admin_trans_json)
                             pipe.rpush(user_trans_key, user_trans_json)
-                            pipe.execute()
+                            with tracer.span("redis.pipeline_execute"), \
+                                    observe(REDIS_SECONDS, operation="approval_pipeline"):
+                                pipe.execute()
+                            redis_committed = True
 
-                        with transaction.atomic():
-                            admin_transaction = Transaction.objects.create(
-                                id=uuid.UUID(admin_trans['id']),
-                                seller=admin_user,
-                                transaction_type=TransactionTypeEnums.CHARGE_SALE,
-                                amount=-amount,
-                                balance_before=admin_original_balance,
-                                balance_after=new_admin_balance,
-                                reference_id=str(credit_request.id),
-                                description=admin_trans['description'],
-                                admin_user=admin_user
-                            )
-                            user_transaction = Transaction.objects.create(
-                                id=uuid.UUID(user_trans['id']),
-                                seller=user,
-                                transaction_type=TransactionTypeEnums.CREDIT_INCREASE,
-                                amount=amount,
-                                balance_before=user_original_balance,
-                                balance_after=new_user_balance,
-                                reference_id=str(credit_request.id),
-                                description=user_trans['description'],
-                                admin_user=admin_user
-                            )
-                            admin_wallet.balance = new_admin_balance
-                            user_wallet.balance = new_user_balance
-                            admin_wallet.save(update_fields=['balance'])
-                            user_wallet.save(update_fields=['balance'])
-                            credit_request.status = CreditRequestStatusEnums.ACCEPTED
-                            credit_request.admin = admin_user
-                            credit_request.save(update_fields=['status', 'admin'])
+                        with tracer.span("db.transaction", operation="credit_approval"), \
+                                observe(DB_COMMIT_SECONDS, operation="credit_approval"), transaction.atomic():
+                            with tracer.span("db.insert", table="wallet_transaction"):
+                                admin_transaction = Transaction.objects.create(
+                                    id=uuid.UUID(admin_trans['id']),
+                                    seller=admin_user,
+                                    transaction_type=TransactionTypeEnums.CHARGE_SALE,
+                                    amount=-amount,
+                                    balance_before=admin_original_balance,
+                                    balance_after=new_admin_balance,
+                                    reference_id=str(credit_request.id),
+                                    description=admin_trans['description'],
+                                    admin_user=admin_user
+                                )
+                            with tracer.span("db.insert", table="wallet_transaction"):
+                                user_transaction = Transaction.objects.create(
+                                    id=uuid.UUID(user_trans['id']),
+                                    seller=user,
+                                    transaction_type=TransactionTypeEnums.CREDIT_INCREASE,
+                                    amount=amount,
+                                    balance_before=user_original_balance,
+                                    balance_after=new_user_balance,
+                                    reference_id=str(credit_request.id),
+                                    description=user_trans['description'],
+                                    admin_user=admin_user
+                                )
+                            with tracer.span("db.update", table="wallet_wallet"):
+                                Wallet.objects.apply_balance_deltas([(admin_user.id, -amount), (user.id, amount)])
+                            with tracer.span("db.update", table="wallet_creditrequest"):
+                                credit_request.status = CreditRequestStatusEnums.ACCEPTED
+                                credit_request.admin = admin_user
+                                credit_request.approved_at = timezone.now()
+                                credit_request.save(update_fields=['status', 'admin', 'approved_at', 'updated_at'])
+                            pending_credit_requests.removed([credit_request])
 
                         logger.info(f"Credit approval completed: {credit_request.id}")
                         return credit_request
 
                     except Exception as e:
-                        self.redis_client.hset(admin_key, "balance", str(admin_original_balance))
-                        self.redis_client.hset(user_key, "balance", str(user_original_balance))
-                        if admin_trans_json:
-                            self.redis_client.lrem(admin_trans_key, 1, admin_trans_json)
-                        if user_trans_json:
-                            self.redis_client.lrem(user_trans_key, 1, user_trans_json)
-                        credit_request.status = CreditRequestStatusEnums.FAILED
-                        credit_request.save(update_fields=['status'])
+                        with tracer.span("rollback", cause=type(e).__name__, redis_committed=redis_committed):
+                            # Charge sales no longer hold these locks, so undo relative to the current balances
+                            if redis_committed:
+                                self.reverse_transfer(admin_user.id, user.id, amount, admin_trans_json, user_trans_json)
+                                ROLLBACKS.labels("credit_approval").inc()
+                            self._mark_credit_request_failed(credit_request)
                         logger.error(f"Credit approval failed with rollback: {credit_request.id} - {str(e)}")
                         raise WalletServiceException(f"Credit approval failed: {str(e)}")
 
             except redis.WatchError:
                 retry_count += 1
+                contention_stats.record_retry()
+                tracer.event("watch_conflict", retry=retry_count)
                 logger.warning(f"Redis watch conflict, retry {retry_count}/3")
                 if retry_count >= 3:
-                    credit_request.status = CreditRequestStatusEnums.FAILED
-                    credit_request.admin = admin_user
-                    credit_request.save(update_fields=['status'])
+                    self._mark_credit_request_failed(credit_request)
                     raise ConcurrencyException("Max retries exceeded for credit approval")
                 time.sleep(0.1 * retry_count)
 
-        credit_request.status = CreditRequestStatusEnums.FAILED
-        credit_request.save(update_fields=['status'])
+        self._mark_credit_request_failed(credit_request)
         raise ConcurrencyException("Max retries exceeded for credit approval")
 
+    def approve_credit_requests_bulk_atomic(self, credit_request_ids: list[int],
+                                            admin_user: User) -> list[BulkCreditRequestResult]:
+        """Approve a batch of credit requests paid from one admin wallet.
+
+        The waiting requests are row-locked until the batch commits; requests
+        already locked by another approval or rejection are skipped. The admin
+        wallet is locked once and debited for the whole batch in one atomic
+        step, request by request in id order while the balance lasts. Users are
+        then credited in pipelined groups and every DB row is written with bulk
+        operations. Returns one ``BulkCreditRequestResult`` per id, in input
+        order; if the batch fails nothing is persisted and the requests stay WAITING.
+        """
+        not_found = ValidationError("Credit request not found or already processed")
+        outcomes = {}
+        with transaction.atomic():
+            credit_requests = list(
+                CreditRequest.objects.select_for_update(skip_locked=True, of=('self',))
+                .select_related('user')
+                .filter(id__in=credit_request_ids, status=CreditRequestStatusEnums.WAITING)
+                .order_by('id')
+            )
+            if not credit_requests:
+                return [BulkCreditRequestResult(None, not_found) for _ in credit_request_ids]
+
+            statuses = self.get_wallet_statuses([admin_user.id] + [credit_request.user_id for credit_request in credit_requests])
+            if statuses[admin_user.id] != WalletStatusEnums.ACTIVE:
+                raise WalletInactiveException("Admin wallet is not active")
+            payable = []
+            for credit_request in credit_requests:
+                if statuses[credit_request.user_id] != WalletStatusEnums.ACTIVE:
+                    outcomes[credit_request.id] = BulkCreditRequestResult(
+                        credit_request, WalletInactiveException("User wallet is not active")
+                    )
+                else:
+                    payable.append(credit_request)
+
+            with self.dual_wallet_lock(admin_user.id, admin_user.id):
+                accepted, user_entries = self._pay_credit_requests(payable, admin_user, outcomes)
+                try:
+                    approved_at = timezone.now()
+                    transactions = []
+                    deltas = []
+                    for (credit_request, admin_entry), user_entry in zip(accepted, user_entries):
+                        admin_trans = json.loads(admin_entry)
+                        user_trans = json.loads(user_entry)
+                        transactions.append(Transaction(
+                            id=uuid.UUID(admin_trans['id']),
+                            seller=admin_user,
+                            transaction_type=TransactionTypeEnums.CHARGE_SALE,
+                            amount=-credit_request.amount,
+                            balance_before=from_minor(admin_trans['balance_before_minor']),
+                            balance_after=from_minor(admin_trans['balance_after_minor']),
+                            reference_id=str(credit_request.id),
+                            description=admin_trans['description'],
+                            admin_user=admin_user
+                        ))
+                        transactions.append(Transaction(
+                            id=uuid.UUID(user_trans['id']),
+                            seller=credit_request.user,
+                            transaction_type=TransactionTypeEnums.CREDIT_INCREASE,
+                            amount=credit_request.amount,
+                            balance_before=from_minor(user_trans['balance_before_minor']),
+                            balance_after=from_minor(user_trans['balance_after_minor']),
+                            reference_id=str(credit_request.id),
+                            description=user_trans['description'],
+                            admin_user=admin_user
+                        ))
+                        deltas.append((admin_user.id, -credit_request.amount))
+                        deltas.append((credit_request.user_id, credit_request.amount))
+                        credit_request.status = CreditRequestStatusEnums.ACCEPTED
+                        credit_request.admin = admin_user
+                        credit_request.approved_at = approved_at
+
+                    with observe(DB_COMMIT_SECONDS, operation="bulk_credit_approval"), transaction.atomic():
+                        Transaction.objects.bulk_create(transactions)
+                        CreditRequest.objects.filter(id__in=[credit_request.id for credit_request, _ in accepted]).update(
+                            status=CreditRequestStatusEnums.ACCEPTED, admin=admin_user, approved_at=approved_at,
+                            updated_at=approved_at
+                        )
+                        Wallet.objects.apply_balance_deltas(deltas)
+                        pending_credit_requests.removed([credit_request for credit_request, _ in accepted])
+                except Exception as e:
+                    undo = []
+                    for (credit_request, admin_entry), user_entry in zip(accepted, user_entries):
+                        undo.append((admin_user.id, credit_request.amount, admin_entry))
+                        undo.append((credit_request.user_id, -credit_request.amount, user_entry))
+                    self._undo_entries(undo)
+                    ROLLBACKS.labels("bulk_credit_approval").inc()
+                    logger.error(f"Bulk credit approval failed with rollback for admin {admin_user.id}: {str(e)}")
+                    raise WalletServiceException(f"Bulk credit approval failed: {str(e)}")
+
+        for credit_request, _ in accepted:
+            outcomes[credit_request.id] = BulkCreditRequestResult(credit_request, None)
+        logger.info(f"Bulk credit approval completed by admin {admin_user.id}: {len(accepted)}/{len(credit_request_ids)} requests")
+        return [outcomes.get(credit_request_id, BulkCreditRequestResult(None, not_found))
+                for credit_request_id in credit_request_ids]
+
+    def _pay_credit_requests(self, credit_requests: list[CreditRequest], admin_user: User,
+                             outcomes: dict) -> tuple[list, list]:
+        """Debit the admin for ``credit_requests`` while the balance lasts and credit their users.
+
+        Requests the admin can't cover are recorded in ``outcomes``. Returns
+        the ``(credit_request, admin_entry)`` pairs paid and the users' ledger
+        entries; on failure everything written to Redis is undone.
+        """
+        if not credit_requests:
+            return [], []
+        timestamp = int(time.time())
+        reserve_args = [timestamp]
+        for credit_request in credit_requests:
+            reserve_args.extend([
+                to_minor(credit_request.amount),
+                str(credit_request.id),
+                str(uuid.uuid4()),
+                f"Transfer to user {credit_request.user_id} for credit request",
+            ])
+        with observe(REDIS_SECONDS, operation="reserve_batch"):
+            admin_entries = self.reserve_batch_script(
+                keys=[f"wallet:user:{admin_user.id}", f"transactions:user:{admin_user.id}"],
+                args=reserve_args,
+            )
+
+        accepted = []
+        for credit_request, admin_entry in zip(credit_requests, admin_entries):
+            if admin_entry:
+                accepted.append((credit_request, admin_entry))
+            else:
+                outcomes[credit_request.id] = BulkCreditRequestResult(
+                    credit_request, InsufficientBalanceException("Admin insufficient balance")
+                )
+
+        user_entries = []
+        try:
+            for start in range(0, len(accepted), self.bulk_pipeline_size):
+                with self.redis_client.pipeline(transaction=False) as pipe:
+                    for credit_request, _ in accepted[start:start + self.bulk_pipeline_size]:
+                        self.credit_script(
+                            keys=[f"wallet:user:{credit_request.user_id}", f"transactions:user:{credit_request.user_id}"],
+                            args=[
+                                to_minor(credit_request.amount),
+                                str(credit_request.id),
+                                str(uuid.uuid4()),
+                                f"Credit increase from admin {admin_user.id}",
+                                timestamp,
+                            ],
+                            client=pipe,
+                        )
+                    with observe(REDIS_SECONDS, operation="credit_pipeline"):
+                        user_entries.extend(pipe.execute())
+        except Exception:
+            undo = [(admin_user.id, credit_request.amount, admin_entry) for credit_request, admin_entry in accepted]
+            for (credit_request, _), user_entry in zip(accepted, user_entries):
+                undo.append((credit_request.user_id, -credit_request.amount, user_entry))
+            self._undo_entries(undo)
+            raise
+        return accepted, user_entries
+
 class WalletService:
     MAX_THREADS = 10
     MAX_RETRY_ATTEMPTS = 3
@@ -429,10 +1123,39 @@ class WalletService:
     LOCK_TIMEOUT = 30
     
     def __init__(self):
-        self.redis_client = redis_client
+        self.redis_client = wallet_redis_client
         self.atomic_service = AtomicWalletService()
         self.local_locks = {}
         self.executor = ThreadPoolExecutor(self.MAX_THREADS, "wallet_service")
+        self.combiner = None
+        if settings.WALLET_GROUP_COMMIT:
+            self.combiner = ChargeSaleCombiner(
+                self.atomic_service,
+                window=settings.WALLET_GROUP_COMMIT_WINDOW,
+                max_batch=settings.WALLET_GROUP_COMMIT_MAX_BATCH,
+            )
+        self.charge_sale_queue = ChargeSaleQueue(status_ttl=self.REDIS_TRANSACTION_TTL)
+        self.ledger = LedgerService(
+            max_entries=settings.WALLET_LEDGER_MAX_ENTRIES,
+            max_age=settings.WALLET_LEDGER_MAX_AGE,
+        )
+
+    def _submit(self, fn, *args):
+        """``executor.submit`` that keeps ``wallet_executor_queue_depth`` up to date.
+
+        The task runs in a copy of the caller's context, so a request profile
+        and the current trace follow it onto the executor thread.
+        """
+        EXECUTOR_QUEUE_DEPTH.inc()
+        context = contextvars.copy_context()
+        submitted = time.perf_counter()
+
+        def run():
+            EXECUTOR_QUEUE_DEPTH.dec()
+            queue_wait_ms = round((time.perf_counter() - submitted) * 1000, 3)
+            with follow_current_thread(), tracer.span(f"executor.{fn.__name__}", queue_wait_ms=queue_wait_ms):
+                return fn(*args)
+        return self.executor.submit(context.run, run)
 
     def _get_wallet_key(self, user_id: int) -> str:
         return f"wallet:user:{user_id}"
@@ -453,6 +1176,19 @@ class WalletService:
     def get_wallet_balance(self, user: User) -> Decimal:
         return self.atomic_service.get_wallet_balance(user.id)
 
+    def get_transaction_history(self, user: User, limit: int = 50, offset: int = 0) -> list[LedgerEntry]:
+        return self.ledger.history(user.id, limit=limit, offset=offset)
+
+    def get_pending_credit_requests(self, after: Optional[str] = None, limit: int = 50, user: Optional[User] = None,
+                                    min_amount: Optional[Decimal] = None,
+                                    max_amount: Optional[Decimal] = None) -> tuple[list[CreditRequest], Optional[str]]:
+        return pending_credit_requests.page(
+            after=after, limit=limit, user_id=user.id if user else None, min_amount=min_amount, max_amount=max_amount,
+        )
+
+    def get_pending_credit_request_totals(self) -> dict:
+        return pending_credit_requests.totals()
+
     def create_credit_request(self, user: User, amount: Decimal) -> CreditRequest:
         if Decimal(amount) < Decimal('1000.00'):
             raise ValidationError("Minimum credit request amount is 1000")
@@ -461,6 +1197,7 @@ class WalletService:
             amount=amount,
             status=CreditRequestStatusEnums.WAITING
         )
+        pending_credit_requests.added(credit_request)
         logger.info(f"Credit request created: {credit_request.id} for user {user.id}")
         return credit_request
 
@@ -475,33 +1212,99 @@ class WalletService:
                 raise ValidationError("Credit request not found or already processed")
             credit_request.status = CreditRequestStatusEnums.REJECTED
             credit_request.admin = admin_user
-            credit_request.save(update_fields=['status', 'admin'])
+            credit_request.save(update_fields=['status', 'admin', 'updated_at'])
+            pending_credit_requests.removed([credit_request])
             logger.info(f"Credit request rejected: {credit_request.id} by admin {admin_user.id}")
         return credit_request
 
+    def reject_credit_requests_bulk(self, credit_request_ids: list[int],
+                                    admin_user: User) -> list[BulkCreditRequestResult]:
+        """Reject every waiting request in ``credit_request_ids`` with one UPDATE; one result per id, in input order."""
+        not_found = ValidationError("Credit request not found or already processed")
+        with transaction.atomic():
+            credit_requests = {
+                credit_request.id: credit_request
+                for credit_request in CreditRequest.objects.select_for_update(skip_locked=True)
+                .filter(id__in=credit_request_ids, status=CreditRequestStatusEnums.WAITING)
+            }
+            CreditRequest.objects.filter(id__in=list(credit_requests)).update(
+                status=CreditRequestStatusEnums.REJECTED, admin=admin_user, updated_at=timezone.now()
+            )
+            pending_credit_requests.removed(list(credit_requests.values()))
+        for credit_request in credit_requests.values():
+            credit_request.status = CreditRequestStatusEnums.REJECTED
+            credit_request.admin = admin_user
+        logger.info(f"Bulk credit rejection by admin {admin_user.id}: {len(credit_requests)}/{len(credit_request_ids)} requests")
+        return [
+            BulkCreditRequestResult(credit_requests[credit_request_id], None) if credit_request_id in credit_requests
+            else BulkCreditRequestResult(None, not_found)
+            for credit_request_id in credit_request_ids
+        ]
+
     def create_charge_sale(self, user: User, phone_number: str, amount: Decimal) -> ChargeSale:
+        if self.combiner is not None:
+            # Runs on the calling thread so concurrent requests can share a batch
+            try:
+                return self.combiner.submit(user, phone_number, amount)
+            except Exception as e:
+                logger.error(f"Charge sale failed for user {user.id}: {str(e)}")
+                raise WalletServiceException(f"Charge sale failed: {str(e)}")
+        with tracer.span("wallet.create_charge_sale", seller_id=user.id, amount=str(amount)):
+            try:
+                future = self._submit(
+                    self.atomic_service.create_charge_sale_atomic,
+                    user,
+                    phone_number,
+                    amount
+                )
+                result = future.result()
+                return result
+            except Exception as e:
+                logger.error(f"Charge sale failed for user {user.id}: {str(e)}")
+                raise WalletServiceException(f"Charge sale failed: {str(e)}")
+
+    def submit_charge_sale(self, user: User, phone_number: str, amount: Decimal) -> ChargeSale:
+        """Queue a charge sale and return it PENDING; ``run_charge_sale_workers`` executes it."""
+        return self.charge_sale_queue.enqueue(user, phone_number, amount)
+
+    def get_charge_sale_status(self, charge_sale_id: uuid.UUID) -> Optional[dict]:
+        return self.charge_sale_queue.get_status(charge_sale_id)
+
+    def create_charge_sales_bulk(self, user: User, items: list) -> list[BulkChargeSaleResult]:
         try:
-            future = self.executor.submit(
-                self.atomic_service.create_charge_sale_atomic,
+            future = self._submit(
+                self.atomic_service.create_charge_sales_bulk_atomic,
                 user,
-                phone_number,
-                amount
+                items
             )
-            result = future.result()
-            return result
+            return future.result()
         except Exception as e:
-            logger.error(f"Charge sale failed for user {user.id}: {str(e)}")
-            raise WalletServiceException(f"Charge sale failed: {str(e)}")
+            logger.error(f"Bulk charge sale failed for user {user.id}: {str(e)}")
+            raise WalletServiceException(f"Bulk charge sale failed: {str(e)}")
 
     def approve_credit_request_single(self, credit_request_id: int, admin_user: User) -> CreditRequest:
+        with tracer.span("wallet.approve_credit_request", credit_request_id=credit_request_id, admin_id=admin_user.id):
+            try:
+                future = self._submit(
+                    self.atomic_service.approve_credit_request_atomic,
+                    credit_request_id,
+                    admin_user
+                )
+                result = future.result()
+                return result
+            except Exception as e:
+                logger.error(f"Credit approval failed for request {credit_request_id}: {str(e)}")
+                raise WalletServiceException(f"Credit approval failed: {str(e)}")
+
+    def approve_credit_requests_bulk(self, credit_request_ids: list[int],
+                                     admin_user: User) -> list[BulkCreditRequestResult]:
         try:
-            future = self.executor.submit(
-                self.atomic_service.approve_credit_request_atomic,
-                credit_request_id,
+            future = self._submit(
+                self.atomic_service.approve_credit_requests_bulk_atomic,
+                credit_request_ids,
                 admin_user
             )
-            result = future.result()
-            return result
+            return future.result()
         except Exception as e:
-            logger.error(f"Credit approval failed for request {credit_request_id}: {str(e)}")
-            raise WalletServiceException(f"Credit approval failed: {str(e)}")
+            logger.error(f"Bulk credit approval failed for admin {admin_user.id}: {str(e)}")
+            raise WalletServiceException(f"Bulk credit approval failed: {str(e)}")
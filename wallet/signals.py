@@ -0,0 +1,33 @@
+import logging
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from infrastructure.database.redis.redis import wallet_redis_client
+from wallet.models import Wallet
+from wallet.services.balance_codec import STATUS_FIELD
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Wallet)
+def write_through_wallet_status(sender, instance, update_fields=None, **kwargs):
+    # Balance-only saves leave the mirrored status alone; the Redis balance is authoritative
+    if update_fields and STATUS_FIELD not in update_fields:
+        return
+    key = f"wallet:user:{instance.user_id}"
+    status = int(instance.status)
+    transaction.on_commit(lambda: _write_status(key, status))
+
+
+@receiver(post_delete, sender=Wallet)
+def drop_cached_wallet(sender, instance, **kwargs):
+    key = f"wallet:user:{instance.user_id}"
+    transaction.on_commit(lambda: wallet_redis_client.delete(key))
+
+
+def _write_status(key: str, status: int) -> None:
+    try:
+        wallet_redis_client.hset(key, STATUS_FIELD, status)
+    except Exception as e:
+        # The old status stays cached until the hash is dropped and reloaded from the DB
+        logger.error(f"Could not write wallet status to {key}: {str(e)}")
@@ -1,42 +1,109 @@
+import asyncio
+import datetime
+import io
+import json
+import os
+import uuid
 import random
-from django.test import TransactionTestCase
+import time
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
 from decimal import Decimal
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from django.db import connection
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 from user.enums import UserTypeEnums
 from wallet.models import User, Wallet  
 from decimal import Decimal
 import threading
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
 from django.contrib.auth import get_user_model
 
-from wallet.models import Wallet, Transaction, ChargeSale
+from wallet.models import Wallet, Transaction, ChargeSale, CreditRequest, SellerDailySales
 from wallet.enums import (
     ChargeSaleTypeEnums, 
     CreditRequestStatusEnums, 
     TransactionTypeEnums, 
+    WalletStatusEnums,
 )
 from user.enums import UserTypeEnums
-from infrastructure.database.redis.redis import redis_client
+import redis
+from infrastructure.database.redis.locks import FairRedisLock
+from infrastructure.database.redis.redis import create_redis_client, pool_stats, redis_client, wallet_redis_client
+from user.services.user_service import UserService, user_cache
+from utils.middleware import ProfileStore, RequestProfilerMiddleware
+from utils.locks import StripedLock
+from utils.profiling import SamplingProfiler
+from wallet.services.async_wallet_service import AsyncWalletService
+from wallet.services.balance_cache import balance_cache_stats
+from wallet.services.balance_codec import BALANCE_FIELD, from_minor, to_minor
+from wallet.services.benchmark_service import SCENARIOS, WalletBenchmark
+from wallet.services.sales_rollup_service import SellerSalesRollup
+from wallet.services.tracing import FileSpanExporter, tracer
 from wallet.services.wallet_service import WalletService
+from wallet.services.wallet_event_service import WalletEventConsumer
+from wallet.core.exceptions.wallet_exceptions import InsufficientBalanceException, WalletServiceException
+from wallet.services.charge_sale_combiner import ChargeSaleCombiner
+from wallet.services.charge_sale_queue import ChargeSaleWorker
+from wallet.services.ledger_service import LedgerService
+from wallet.services.partition_service import TransactionPartitionManager
+from wallet.services.reconciliation_service import LEDGER_DRIFT, REDIS_DRIFT, WalletReconciler
 
 User = get_user_model()
 
 from django.db.models import Sum
 
+
+class WalletRedisTestCase(TransactionTestCase):
+    """Starts every test with both Redis databases empty, a cold user cache and a new ``WalletService``."""
+    reset_sequences = True
+
+    SELLER_PHONE = "08994562531"
+    ADMIN_PHONE = "09332823692"
+
+    def setUp(self):
+        self.redis_client = wallet_redis_client
+        self.redis_client.flushall()
+        redis_client.flushall()
+        user_cache.clear_local()
+        self.wallet_service = WalletService()
+
+    @staticmethod
+    def create_user(phone_number: str = SELLER_PHONE, user_type: int = UserTypeEnums.SELLER) -> User:
+        return User.objects.create(phone_number=phone_number, password="132456789", user_type=user_type)
+
+    def create_admin(self, phone_number: str = ADMIN_PHONE) -> User:
+        return self.create_user(phone_number, UserTypeEnums.ADMIN)
+
+    def fund(self, user: User, balance, cache: bool = True) -> Wallet:
+        """Set ``user``'s wallet balance in Postgres and, unless ``cache`` is false, in the wallet Redis."""
+        wallet = self.wallet_service.get_or_create_wallet(user)
+        wallet.balance = Decimal(balance)
+        wallet.save(update_fields=["balance"])
+        if cache:
+            self.redis_client.hset(f"wallet:user:{user.id}", BALANCE_FIELD, to_minor(wallet.balance))
+        return wallet
+
+
 class ConcurrencyChargeSaleTest(TransactionTestCase):
     reset_sequences = True
 
     def setUp(self):
-        self.redis_client = redis_client
+        self.redis_client = wallet_redis_client
         self.wallet_service = WalletService()
         self.redis_client.flushall()
+        redis_client.flushall()
+        user_cache.clear_local()
         self.user = User.objects.create(phone_number="08994562531", password="132456789", user_type=UserTypeEnums.ADMIN)
         wallet = self.wallet_service.get_or_create_wallet(self.user)
         self.initialize_balance = Decimal("30000000")
         wallet.balance = self.initialize_balance # 10,000,000,000
         wallet.save(update_fields=["balance"])
-        self.redis_client.hset(f"wallet:user:{self.user.id}", "balance", str(wallet.balance))
+        self.redis_client.hset(f"wallet:user:{self.user.id}", BALANCE_FIELD, to_minor(wallet.balance))
 
     def tearDown(self):
         cursor = connection.cursor()
@@ -66,8 +133,7 @@ class ConcurrencyChargeSaleTest(TransactionTestCase):
                         phone = phone_numbers[key]["phone_number"]
                     sale = self.wallet_service.create_charge_sale(self.user, phone, amount)
                     results.append(sale.status)
-                except (WalletLockException, InsufficientBalanceException) as e:
-                    logger.warning(f"Charge sale failed: {str(e)}")
+                except WalletServiceException as e:
                     results.append(str(e))
                 finally:
                     connection.close()
@@ -81,7 +147,7 @@ class ConcurrencyChargeSaleTest(TransactionTestCase):
 
         wallet = Wallet.objects.get(user=self.user)
         final_balance = wallet.balance
-        redis_balance = Decimal(self.redis_client.hget(f"wallet:user:{self.user.id}", "balance"))
+        redis_balance = from_minor(self.redis_client.hget(f"wallet:user:{self.user.id}", BALANCE_FIELD))
 
         seller_transactions = Transaction.objects.filter(
             seller=self.user,
@@ -151,19 +217,14 @@ class ConcurrencyChargeSaleTest(TransactionTestCase):
         results = []
         admin_wallet = Wallet.objects.get(user=self.user)
         admin_wallet_balance_before_request = admin_wallet.balance
-        admin_wallet_balance_before_request_redis = Decimal(
-            self.redis_client.hget(f"wallet:user:{self.user.id}", "balance")
+        admin_wallet_balance_before_request_redis = from_minor(
+            self.redis_client.hget(f"wallet:user:{self.user.id}", BALANCE_FIELD)
         )
         def worker(request_id):
             try:
                 request = self.wallet_service.approve_credit_request_single(request_id, self.user)
                 return request.status
-            except (
-                WalletLockException,
-                InsufficientBalanceException,
-                ValidationError,
-                ConcurrencyException,
-            ) as e:
+            except ValidationError as e:
                 return str(e)
             finally:
                 connection.close()
@@ -178,11 +239,11 @@ class ConcurrencyChargeSaleTest(TransactionTestCase):
         successful_approvals = sum(
             1 for r in results if r == CreditRequestStatusEnums.ACCEPTED
         )
-        redis_user_balance = Decimal(
-            self.redis_client.hget(f"wallet:user:{user.id}", "balance")
+        redis_user_balance = from_minor(
+            self.redis_client.hget(f"wallet:user:{user.id}", BALANCE_FIELD)
         )
-        redis_admin_balance = Decimal(
-            self.redis_client.hget(f"wallet:user:{self.user.id}", "balance")
+        redis_admin_balance = from_minor(
+            self.redis_client.hget(f"wallet:user:{self.user.id}", BALANCE_FIELD)
         )
         wallet_admin_balance = Wallet.objects.get(user=self.user)
         expected_user_balance = credit_request_amount * len(results)
@@ -199,3 +260,1222 @@ class ConcurrencyChargeSaleTest(TransactionTestCase):
             f"User final balance: {user_wallet.balance}, Redis balance: {redis_user_balance}, "
             f"Successful approvals: {successful_approvals}"
         )
+
+
+class WriteBehindChargeSaleTest(WalletRedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.wallet_service.atomic_service.write_behind = True
+        self.user = self.create_user(user_type=UserTypeEnums.ADMIN)
+        self.fund(self.user, "1000000")
+
+    def test_events_are_flushed_exactly_once(self):
+        amount = Decimal("5000")
+        sales = [
+            self.wallet_service.create_charge_sale(self.user, phone, amount)
+            for phone in ["09123456789", "09129129122"] * 10
+        ]
+        self.assertEqual(ChargeSale.objects.count(), 0, "Nothing is written to the DB before the flush")
+
+        consumer = WalletEventConsumer("test-consumer", batch_size=7, block_ms=10)
+        consumer.ensure_group()
+        messages = self.redis_client.xrange(consumer.stream)
+        self.assertEqual(consumer.flush(messages), len(sales))
+        # A redelivered batch must not be applied twice
+        self.assertEqual(consumer.flush(messages), 0)
+        consumer.run(once=True)
+
+        self.assertEqual(ChargeSale.objects.filter(status=ChargeSaleTypeEnums.COMPLETED).count(), len(sales))
+        self.assertEqual(Transaction.objects.count(), len(sales) * 2)
+        for phone in ["08994562531", "09123456789", "09129129122"]:
+            wallet = Wallet.objects.get(user__phone_number=phone)
+            redis_balance = from_minor(self.redis_client.hget(f"wallet:user:{wallet.user_id}", BALANCE_FIELD))
+            self.assertEqual(wallet.balance, redis_balance, f"Redis and DB balances must match for {phone}")
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal("1000000") - amount * len(sales))
+
+    def test_redelivered_entry_in_a_later_batch_is_skipped(self):
+        for phone in ("09123456789", "09129129122", "09123456780"):
+            self.wallet_service.create_charge_sale(self.user, phone, Decimal("5000"))
+        consumer = WalletEventConsumer("test-consumer", block_ms=10)
+        consumer.ensure_group()
+        messages = self.redis_client.xrange(consumer.stream)
+        self.assertEqual(consumer.flush(messages[:1]), 1)
+
+        # The first entry comes back with the rest, as after a crash between commit and XACK
+        self.assertEqual(consumer.flush(messages), 2)
+
+        self.assertEqual(ChargeSale.objects.count(), 3)
+        self.assertEqual(Transaction.objects.count(), 6)
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal("985000"))
+        first = messages[0][1]
+        self.assertAlmostEqual(ChargeSale.objects.get(id=first["reference_id"]).created_at.timestamp(),
+                               json.loads(first["seller_entry"])["timestamp"], places=3)
+
+
+class BalanceReloadTest(WalletRedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.wallet_service.atomic_service.write_behind = True
+        self.user = self.create_user()
+        self.fund(self.user, "100000")
+
+    def test_lost_wallet_is_reloaded_with_pending_sales(self):
+        amount = Decimal("5000")
+        for phone in ["09123456789", "09129129122"] * 3:
+            self.wallet_service.create_charge_sale(self.user, phone, amount)
+        consumer = WalletEventConsumer("test-consumer", batch_size=2, block_ms=10)
+        consumer.ensure_group()
+        # Persist only part of the stream, then lose every wallet hash
+        consumer.flush(consumer.read_batch())
+        for key in self.redis_client.scan_iter("wallet:user:*"):
+            self.redis_client.delete(key)
+        balance_cache_stats.reset()
+
+        expected = Decimal("100000") - amount * 6
+        self.assertEqual(self.wallet_service.get_wallet_balance(self.user), expected)
+        self.wallet_service.create_charge_sale(self.user, "09123456789", amount)
+        self.assertEqual(self.wallet_service.get_wallet_balance(self.user), expected - amount)
+        stats = balance_cache_stats.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 2))
+
+        consumer.run(once=True)
+        for phone in ["08994562531", "09123456789", "09129129122"]:
+            wallet = Wallet.objects.select_related("user").get(user__phone_number=phone)
+            # 09129129122 wasn't touched since the loss; reading it reloads it
+            redis_balance = self.wallet_service.get_wallet_balance(wallet.user)
+            self.assertEqual(wallet.balance, redis_balance, f"Redis and DB balances must match for {phone}")
+
+
+class WarmWalletCacheTest(WalletRedisTestCase):
+    def setUp(self):
+        super().setUp()
+        for index in range(7):
+            user = self.create_user(f"0912000000{index}")
+            Wallet.objects.create(user=user, balance=Decimal(1000 * index), status=WalletStatusEnums.ACTIVE)
+
+    def test_every_wallet_is_loaded_without_overwriting_redis(self):
+        live = Wallet.objects.order_by("user_id").first()
+        self.redis_client.hset(f"wallet:user:{live.user_id}", mapping={BALANCE_FIELD: 123, "status": live.status})
+
+        out = io.StringIO()
+        call_command("warm_wallet_cache", workers=3, batch_size=2, stdout=out)
+
+        self.assertIn("Loaded 7 wallets (6 balances written", out.getvalue())
+        for wallet in Wallet.objects.exclude(pk=live.pk):
+            key = f"wallet:user:{wallet.user_id}"
+            self.assertEqual(from_minor(self.redis_client.hget(key, BALANCE_FIELD)), wallet.balance)
+            self.assertEqual(self.redis_client.hget(key, "status"), str(wallet.status))
+        self.assertEqual(self.redis_client.hget(f"wallet:user:{live.user_id}", BALANCE_FIELD), "123")
+
+
+class LedgerCompactionTest(WalletRedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+        self.fund(self.user, "100000")
+        for index in range(10):
+            self.wallet_service.create_charge_sale(self.user, "09123456789", Decimal(1000 + index))
+        self.ledger = LedgerService(max_entries=3, max_age=3600)
+
+    def test_only_durable_entries_are_trimmed(self):
+        key = self.ledger.key(self.user.id)
+        pending = json.dumps({"id": str(uuid.uuid4()), "amount_minor": "0", "balance_before_minor": "0",
+                              "balance_after_minor": "0", "reference_id": "", "description": "", "timestamp": 0})
+        self.redis_client.lpush(key, pending)
+        self.assertEqual(self.ledger.compact(self.user.id), 0, "An entry missing from Postgres blocks the trim")
+
+        self.redis_client.lpop(key)
+        self.assertEqual(self.ledger.compact(self.user.id), 7)
+        self.assertEqual(self.redis_client.llen(key), 3)
+
+        history = self.wallet_service.get_transaction_history(self.user, limit=20)
+        self.assertEqual([entry.amount for entry in history], [-Decimal(1000 + index) for index in reversed(range(10))])
+        self.assertEqual(
+            [entry.amount for entry in self.wallet_service.get_transaction_history(self.user, limit=2, offset=4)],
+            [-Decimal(1005), -Decimal(1004)],
+        )
+
+
+class WalletReconciliationTest(WalletRedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+        self.fund(self.user, "100000")
+        self.wallet_service.create_charge_sale(self.user, "09123456789", Decimal("1000"))
+        self.receiver = User.objects.get(phone_number="09123456789")
+
+    def test_drift_is_reported_and_repaired(self):
+        self.redis_client.hincrby(f"wallet:user:{self.receiver.id}", BALANCE_FIELD, 50000)
+
+        result = WalletReconciler(repair=True, recheck_delay=0).run()
+        self.assertEqual(result.examined, 2)
+        self.assertEqual(result.drifts, [
+            (self.receiver.id, REDIS_DRIFT, Decimal("1000.00"), Decimal("1500.00"), True),
+        ])
+        self.assertEqual(self.wallet_service.get_wallet_balance(self.receiver), Decimal("1000"))
+
+        # Incremental run: only the wallets touched by this sale, all consistent
+        self.wallet_service.create_charge_sale(self.user, "09123456789", Decimal("1000"))
+        result = WalletReconciler(check_ledger=True, recheck_delay=0).run()
+        self.assertEqual(result.examined, 2)
+        # The seller's opening balance was set directly, without a ledger entry
+        self.assertEqual(result.drifts, [
+            (self.user.id, LEDGER_DRIFT, Decimal("98000.00"), Decimal("-2000.00"), False),
+        ])
+
+    def test_sale_between_its_redis_and_db_writes_is_not_repaired(self):
+        # Committed in Redis, DB transaction not started yet
+        self.wallet_service.atomic_service.transfer(
+            self.user.id, self.receiver.id, Decimal("1000"), reference_id=str(uuid.uuid4()),
+            seller_description="in flight", target_description="in flight",
+        )
+
+        result = WalletReconciler(repair=True, recheck_delay=0).run(full=True)
+        self.assertEqual(result.drifts, [])
+        self.assertEqual(self.wallet_service.get_wallet_balance(self.receiver), Decimal("2000"))
+
+        # Past the window the entry is no longer in flight
+        result = WalletReconciler(recheck_delay=0, in_flight_window=-5).run(full=True)
+        self.assertEqual(sorted(drift.user_id for drift in result.drifts), sorted([self.user.id, self.receiver.id]))
+
+
+class TransactionPartitionTest(TransactionTestCase):
+    reset_sequences = True
+
+    def setUp(self):
+        self.manager = TransactionPartitionManager()
+        self.user = User.objects.create(phone_number="08994562531", password="132456789", user_type=UserTypeEnums.SELLER)
+
+    def drop_partitions(self, names):
+        with connection.cursor() as cursor:
+            for name in names:
+                cursor.execute(f"DROP TABLE IF EXISTS {connection.ops.quote_name(name)}")
+        # Restore the partitions the other tests write to
+        self.manager.create_ahead()
+
+    def drop_detached_partitions(self, names):
+        self.drop_partitions(set(names) - set(self.manager.partitions().values()))
+
+    def test_partitions_are_created_ahead_and_detached(self):
+        today = datetime.date(2030, 11, 15)
+        created = self.manager.create_ahead(months_ahead=2, today=today)
+        self.addCleanup(self.drop_partitions, created)
+        self.assertEqual(created, [
+            "wallet_transaction_p2030_11", "wallet_transaction_p2030_12", "wallet_transaction_p2031_01",
+        ])
+        self.assertEqual(self.manager.create_ahead(months_ahead=2, today=today), [])
+
+        # Rows are routed to the month of their created_at
+        for created_at in ("2030-11-30T23:59:59+00:00", "2030-12-01T00:00:00+00:00"):
+            entry = Transaction.objects.create(seller=self.user, amount=Decimal("1000"), balance_before=Decimal("0"),
+                                               balance_after=Decimal("1000"), transaction_type=TransactionTypeEnums.CREDIT_INCREASE)
+            Transaction.objects.filter(pk=entry.pk).update(created_at=datetime.datetime.fromisoformat(created_at))
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT tableoid::regclass::text FROM wallet_transaction WHERE created_at >= '2030-11-01' ORDER BY created_at")
+            self.assertEqual([row[0] for row in cursor.fetchall()], ["wallet_transaction_p2030_11", "wallet_transaction_p2030_12"])
+
+        # This detaches the current months' partitions too. Registered first, so they are dropped
+        # and recreated even if detaching fails partway
+        self.addCleanup(self.drop_detached_partitions, list(self.manager.partitions().values()))
+        detached = self.manager.detach_older_than(retain_months=1, today=datetime.date(2031, 1, 10))
+        self.assertIn("wallet_transaction_p2030_11", detached)
+        self.assertNotIn("wallet_transaction_p2030_12", detached)
+        self.assertEqual(Transaction.objects.filter(created_at__gte=datetime.datetime(2030, 11, 1, tzinfo=datetime.timezone.utc)).count(), 1)
+
+    def test_id_is_unique_within_a_partition(self):
+        created = self.manager.create_ahead(months_ahead=0, today=datetime.date(2030, 11, 15))
+        self.addCleanup(self.drop_partitions, created)
+        entry = Transaction.objects.create(seller=self.user, amount=Decimal("1000"), balance_before=Decimal("0"),
+                                           balance_after=Decimal("1000"), transaction_type=TransactionTypeEnums.CREDIT_INCREASE)
+        Transaction.objects.filter(pk=entry.pk).update(created_at=datetime.datetime(2030, 11, 1, tzinfo=datetime.timezone.utc))
+
+        # Same id, different created_at: the (id, created_at) primary key alone would accept it
+        with self.assertRaises(IntegrityError), transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO wallet_transaction SELECT (jsonb_populate_record("
+                "t, jsonb_build_object('created_at', t.created_at + interval '1 day'))).* "
+                "FROM wallet_transaction t WHERE id = %s",
+                [entry.pk],
+            )
+
+
+class QueryPlanTest(TransactionTestCase):
+    """Fails when a hot lookup can no longer be answered from its index.
+
+    Sequential scans are disabled for the EXPLAIN, so the planner only picks
+    one when no index fits the query. Where a lookup has an index of its own,
+    the plan must use that one; indexes of a partition count as their parent's.
+    Lookups that several indexes serve equally well only name the leading
+    column the plan's index must have.
+    """
+    reset_sequences = True
+
+    def setUp(self):
+        sellers = User.objects.bulk_create([
+            User(phone_number=f"0899{index:07d}", password="132456789", user_type=UserTypeEnums.SELLER)
+            for index in range(50)
+        ])
+        self.seller = sellers[0]
+        Wallet.objects.bulk_create([Wallet(user=seller, balance=Decimal("100000")) for seller in sellers])
+        CreditRequest.objects.bulk_create([
+            CreditRequest(user=sellers[index % 50], amount=Decimal("1000"),
+                          status=CreditRequestStatusEnums.WAITING if index % 20 == 0 else CreditRequestStatusEnums.ACCEPTED,
+                          approved_at=None if index % 20 == 0 else timezone.now())
+            for index in range(2000)
+        ])
+        sales = ChargeSale.objects.bulk_create([
+            ChargeSale(user=sellers[index % 50], phone_number="09123456789", amount=Decimal("1000"),
+                       status=(ChargeSaleTypeEnums.PENDING, ChargeSaleTypeEnums.FAILED)[index % 2] if index % 10 == 0
+                       else ChargeSaleTypeEnums.COMPLETED)
+            for index in range(2000)
+        ])
+        Transaction.objects.bulk_create([
+            Transaction(seller=sale.user, amount=-sale.amount, transaction_type=TransactionTypeEnums.CHARGE_SALE,
+                        reference_id=str(sale.id))
+            for sale in sales
+        ])
+        self.sale = sales[0]
+        self.sellers = sellers
+        # Spread the sales over 40 days, as a seller's history would be
+        for day in range(40):
+            ChargeSale.objects.filter(id__in=[sale.id for sale in sales[day::40]]).update(
+                created_at=timezone.now() - datetime.timedelta(days=day)
+            )
+        with connection.cursor() as cursor:
+            for table in ("wallet_wallet", "wallet_creditrequest", "wallet_chargesale", "wallet_transaction"):
+                cursor.execute(f"ANALYZE {table}")
+
+    def assertUsesIndex(self, queryset, index=None, leading=None):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            plan = json.loads(queryset.explain(format="json"))
+
+        def nodes(node):
+            yield node
+            for child in node.get("Plans", []):
+                yield from nodes(child)
+
+        scanned = [node["Relation Name"] for node in nodes(plan[0]["Plan"]) if node["Node Type"] == "Seq Scan"]
+        self.assertEqual(scanned, [], f"Sequential scan on {', '.join(scanned)}:\n{json.dumps(plan, indent=2)}")
+        if index is None and leading is None:
+            return
+        used = {node["Index Name"] for node in nodes(plan[0]["Plan"]) if "Index Name" in node}
+        with connection.cursor() as cursor:
+            # {index: its first column}, partition indexes resolved to their parent
+            cursor.execute(
+                "SELECT root::text, attribute.attname FROM ("
+                "  SELECT COALESCE(pg_partition_root(name::regclass), name::regclass) AS root"
+                "  FROM unnest(%s::text[]) AS name"
+                ") AS used"
+                " JOIN pg_index ON pg_index.indexrelid = used.root"
+                " JOIN pg_attribute AS attribute"
+                "  ON attribute.attrelid = pg_index.indrelid AND attribute.attnum = pg_index.indkey[0]",
+                [sorted(used)],
+            )
+            used = dict(cursor.fetchall())
+        if index is not None:
+            self.assertIn(index, used, f"Plan doesn't use {index}:\n{json.dumps(plan, indent=2)}")
+        if leading is not None:
+            self.assertIn(leading, used.values(), f"Plan uses no index on {leading}:\n{json.dumps(plan, indent=2)}")
+
+    def test_lookups_use_indexes(self):
+        now = timezone.now()
+        self.assertUsesIndex(Transaction.objects.filter(reference_id=str(self.sale.id), seller=self.seller),
+                             "transaction_reference_seller")
+        self.assertUsesIndex(Transaction.objects.filter(seller=self.seller).order_by("-created_at", "-id")[:20])
+        self.assertUsesIndex(Transaction.objects.filter(created_at__gte=now).values_list("seller_id", flat=True).distinct())
+        self.assertUsesIndex(ChargeSale.objects.filter(user=self.seller, status=ChargeSaleTypeEnums.PENDING),
+                             leading="user_id")
+        self.assertUsesIndex(ChargeSale.objects.filter(updated_at__gte=now), "charge_sale_updated_at")
+        self.assertUsesIndex(CreditRequest.objects.filter(id=1, status=CreditRequestStatusEnums.WAITING))
+        self.assertUsesIndex(CreditRequest.objects.filter(status=CreditRequestStatusEnums.WAITING).order_by("created_at", "id")[:50],
+                             "credit_request_waiting")
+        self.assertUsesIndex(
+            CreditRequest.objects.filter(status=CreditRequestStatusEnums.WAITING, created_at__gte=now)
+            .exclude(created_at=now, id__lte=1).order_by("created_at", "id")[:50],
+            "credit_request_waiting",
+        )
+        self.assertUsesIndex(CreditRequest.objects.filter(user=self.seller, status=CreditRequestStatusEnums.WAITING),
+                             leading="user_id")
+        self.assertUsesIndex(CreditRequest.objects.filter(approved_at__gte=now, status=CreditRequestStatusEnums.ACCEPTED),
+                             "credit_request_approved_at")
+        self.assertUsesIndex(Wallet.objects.filter(updated_at__gte=now), "wallet_updated_at")
+
+    def test_rollup_refresh_uses_user_created_index(self):
+        # SellerSalesRollup._aggregate for one day and a batch of sellers
+        start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0) - datetime.timedelta(days=3)
+        self.assertUsesIndex(
+            ChargeSale.objects.filter(
+                status__in=[ChargeSaleTypeEnums.COMPLETED, ChargeSaleTypeEnums.FAILED],
+                created_at__gte=start, created_at__lt=start + datetime.timedelta(days=1),
+                user_id__in=[seller.id for seller in self.sellers[:10]],
+            ),
+            "charge_sale_user_created",
+        )
+
+
+class BulkChargeSaleTest(WalletRedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+        self.fund(self.user, "10000")
+
+    def test_bulk_charge_sale_reserves_in_order(self):
+        items = [
+            ("09123456789", Decimal("4000")),
+            ("09129129122", Decimal("4000")),
+            ("09123456789", Decimal("4000")),
+            ("09120000000", Decimal("2000")),
+        ]
+        results = self.wallet_service.create_charge_sales_bulk(self.user, items)
+
+        self.assertEqual([result.error is None for result in results], [True, True, False, True])
+        self.assertIsInstance(results[2].error, InsufficientBalanceException)
+        self.assertEqual(ChargeSale.objects.filter(status=ChargeSaleTypeEnums.COMPLETED).count(), 3)
+        self.assertEqual(ChargeSale.objects.filter(status=ChargeSaleTypeEnums.FAILED).count(), 1)
+        self.assertEqual(Transaction.objects.count(), 6)
+        expected = {"08994562531": Decimal("0"), "09123456789": Decimal("4000"),
+                    "09129129122": Decimal("4000"), "09120000000": Decimal("2000")}
+        for phone, balance in expected.items():
+            wallet = Wallet.objects.get(user__phone_number=phone)
+            self.assertEqual(wallet.balance, balance, f"DB balance for {phone}")
+            self.assertEqual(
+                from_minor(self.redis_client.hget(f"wallet:user:{wallet.user_id}", BALANCE_FIELD)), balance,
+                f"Redis balance for {phone}",
+            )
+
+
+class BulkCreditRequestTest(WalletRedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = self.create_admin()
+        self.fund(self.admin, "10000")
+        self.sellers = [self.create_user(f"0899456253{index}") for index in range(3)]
+
+    def test_bulk_approval_pays_in_order_while_balance_lasts(self):
+        requests = [
+            self.wallet_service.create_credit_request(seller, amount)
+            for seller, amount in zip(self.sellers, (Decimal("4000"), Decimal("7000"), Decimal("5000")))
+        ]
+        already_rejected = self.wallet_service.create_credit_request(self.sellers[0], Decimal("1000"))
+        self.wallet_service.reject_credit_request(already_rejected.id, self.admin)
+
+        credit_ids = [request.id for request in requests] + [already_rejected.id]
+        results = self.wallet_service.approve_credit_requests_bulk(credit_ids, self.admin)
+
+        self.assertEqual([result.error is None for result in results], [True, False, True, False])
+        self.assertIsInstance(results[1].error, InsufficientBalanceException)
+        self.assertEqual(
+            list(CreditRequest.objects.filter(id__in=credit_ids).order_by("id").values_list("status", flat=True)),
+            [CreditRequestStatusEnums.ACCEPTED, CreditRequestStatusEnums.WAITING,
+             CreditRequestStatusEnums.ACCEPTED, CreditRequestStatusEnums.REJECTED],
+        )
+        self.assertEqual(Transaction.objects.count(), 4)
+        expected = {self.admin: Decimal("1000"), self.sellers[0]: Decimal("4000"),
+                    self.sellers[1]: Decimal("0"), self.sellers[2]: Decimal("5000")}
+        for user, balance in expected.items():
+            self.assertEqual(Wallet.objects.get(user=user).balance, balance, f"DB balance for {user.phone_number}")
+            self.assertEqual(self.wallet_service.get_wallet_balance(user), balance, f"Redis balance for {user.phone_number}")
+
+        results = self.wallet_service.reject_credit_requests_bulk([requests[0].id, requests[1].id], self.admin)
+        self.assertEqual([result.error is None for result in results], [False, True])
+        self.assertEqual(CreditRequest.objects.get(id=requests[1].id).status, CreditRequestStatusEnums.REJECTED)
+
+
+class PendingCreditRequestQueueTest(WalletRedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = self.create_admin()
+        self.sellers = [self.create_user(f"0899456253{index}") for index in range(2)]
+
+    def test_keyset_pages_and_totals(self):
+        self.assertEqual(self.wallet_service.get_pending_credit_request_totals(), {"count": 0, "amount": Decimal("0.00")})
+        requests = [
+            self.wallet_service.create_credit_request(self.sellers[index % 2], Decimal(1000 * (index + 1)))
+            for index in range(5)
+        ]
+        self.wallet_service.reject_credit_request(requests[2].id, self.admin)
+        self.assertEqual(self.wallet_service.get_pending_credit_request_totals(), {"count": 4, "amount": Decimal("12000.00")})
+
+        seen = []
+        cursor = None
+        while True:
+            page, cursor = self.wallet_service.get_pending_credit_requests(after=cursor, limit=3)
+            seen.extend(credit_request.id for credit_request in page)
+            if cursor is None:
+                break
+        self.assertEqual(seen, [requests[index].id for index in (0, 1, 3, 4)])
+
+        page, cursor = self.wallet_service.get_pending_credit_requests(user=self.sellers[0], min_amount=Decimal("2000"))
+        self.assertEqual([credit_request.id for credit_request in page], [requests[4].id])
+        self.assertIsNone(cursor)
+
+        # Lost totals are rebuilt from the waiting rows
+        redis_client.flushall()
+        self.assertEqual(self.wallet_service.get_pending_credit_request_totals(), {"count": 4, "amount": Decimal("12000.00")})
+
+
+class ChargeSaleBenchmarkTest(WalletRedisTestCase):
+    def tearDown(self):
+        cursor = connection.cursor()
+        cursor.execute("SELECT pg_terminate_backend(pg_stat_activity.pid) FROM pg_stat_activity WHERE pg_stat_activity.datname = 'test_django_db' AND pid <> pg_backend_pid();")
+        return super().tearDown()
+
+    def test_every_scenario_reports(self):
+        for scenario in SCENARIOS:
+            report = WalletBenchmark(scenario, operations=40, concurrency=4, sellers=5, receivers=20,
+                                     approval_ratio=0.25).run()
+            self.assertEqual(report["errors"], {}, scenario)
+            self.assertEqual(report["latency"]["count"], 40, scenario)
+            self.assertLessEqual(report["latency"]["p50_ms"], report["latency"]["p99_ms"])
+            self.assertIn("watch_retries", report["contention"])
+        self.assertIn("approval", report["latency_by_operation"])
+        json.dumps(report)
+
+
+class MetricsEndpointTest(WalletRedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = self.create_admin()
+        self.fund(self.admin, "100000")
+
+    def test_hot_path_is_exported(self):
+        self.wallet_service.create_charge_sale(self.admin, "09123456789", Decimal("1000"))
+        seller = self.create_user()
+        credit_request = self.wallet_service.create_credit_request(seller, Decimal("1000"))
+        self.wallet_service.approve_credit_request_single(credit_request.id, self.admin)
+
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        for sample in (
+            'wallet_redis_seconds_count{operation="transfer"}',
+            'wallet_db_commit_seconds_count{operation="charge_sale"}',
+            'wallet_db_commit_seconds_count{operation="credit_approval"}',
+            'wallet_lock_wait_seconds_count{result="acquired"}',
+            "wallet_lock_hold_seconds_count",
+            "wallet_executor_queue_depth",
+            'wallet_balance_cache_lookups_total{result="hit"}',
+        ):
+            self.assertIn(sample, body)
+
+
+@override_settings(PROFILER_TOKEN="profile-token", PROFILER_SAMPLE_RATE=0, PROFILER_INTERVAL=0.001, PROFILER_RETENTION=2)
+class RequestProfilerTest(WalletRedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = self.create_admin()
+        self.seller = self.create_user()
+        self.fund(self.seller, "100000")
+
+    def charge_sale(self, **headers):
+        return self.client.post(reverse("charge sale"), data={
+            "seller_phone_number": self.seller.phone_number,
+            "receiver_phone_number": "09123456789",
+            "amount": "1000",
+        }, content_type="application/json", headers=headers)
+
+    def test_token_header_stores_profile(self):
+        response = self.charge_sale(x_profile_token="profile-token")
+        self.assertEqual(response.status_code, 201)
+        profile_id = response["X-Profile-Id"]
+
+        response = self.client.get(reverse("request profile detail", args=[profile_id]),
+                                    {"phone_number": self.admin.phone_number})
+        self.assertEqual(response.status_code, 200)
+        profile = response.json()
+        self.assertEqual(profile["endpoint"], "charge sale")
+        self.assertEqual(profile["status"], 201)
+        self.assertEqual(profile["reason"], "header")
+        self.assertLessEqual(len(profile["stacks"]), 500)
+        if profile["samples"]:
+            self.assertTrue(profile["top"])
+
+    def test_unprofiled_requests(self):
+        self.assertNotIn("X-Profile-Id", self.charge_sale())
+        self.assertNotIn("X-Profile-Id", self.charge_sale(x_profile_token="wrong-token"))
+        response = self.client.get(reverse("request profiles"), {"phone_number": self.admin.phone_number})
+        self.assertEqual(response.json(), {})
+
+    def test_keeps_slowest_per_endpoint(self):
+        for _ in range(4):
+            self.charge_sale(x_profile_token="profile-token")
+
+        response = self.client.get(reverse("request profiles"), {"phone_number": self.admin.phone_number})
+        self.assertEqual(response.status_code, 200)
+        profiles = response.json()["charge sale"]
+        self.assertEqual(len(profiles), 2)
+        self.assertGreaterEqual(profiles[0]["duration_ms"], profiles[1]["duration_ms"])
+
+    def test_listing_requires_admin(self):
+        response = self.client.get(reverse("request profiles"), {"phone_number": self.seller.phone_number})
+        self.assertEqual(response.status_code, 403)
+
+    def test_executor_thread_is_followed(self):
+        profiler = SamplingProfiler(interval=0.001)
+        profiler.start()
+        try:
+            self.wallet_service._submit(time.sleep, 0.05).result()
+        finally:
+            profiler.stop()
+        # Only the executor thread runs the task wrapper
+        self.assertTrue(any("wallet.services.wallet_service:run" in stack for stack in profiler.stacks))
+
+    async def test_async_request_profiles_only_its_own_task(self):
+        def view_work():
+            time.sleep(0.05)
+
+        def neighbour_work():
+            time.sleep(0.05)
+
+        async def view(request):
+            view_work()
+            await asyncio.sleep(0.1)
+            return HttpResponse()
+
+        async def neighbour():
+            await asyncio.sleep(0.01)
+            neighbour_work()
+
+        middleware = RequestProfilerMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = RequestFactory().get("/profiled", headers={"x-profile-token": "profile-token"})
+        response, _ = await asyncio.gather(middleware(request), neighbour())
+
+        profile = await sync_to_async(ProfileStore().get)(response["X-Profile-Id"])
+        stacks = "\n".join(profile["stacks"])
+        self.assertIn("view_work", stacks)
+        # The neighbour ran on the same loop thread while the request was suspended
+        self.assertNotIn("neighbour_work", stacks)
+
+
+class ListSpanExporter:
+    def __init__(self):
+        self.payloads = []
+
+    def export(self, payload):
+        self.payloads.append(payload)
+
+    def spans(self):
+        return [span for payload in self.payloads for span in payload["resourceSpans"][0]["scopeSpans"][0]["spans"]]
+
+
+class TracingTest(WalletRedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = self.create_admin()
+        self.seller = self.create_user()
+        for user in (self.admin, self.seller):
+            self.fund(user, "100000")
+        self.exporter = ListSpanExporter()
+        self.saved = (tracer.enabled, tracer.sample_rate, tracer.slow_ms, tracer.exporter)
+        tracer.enabled, tracer.sample_rate, tracer.slow_ms, tracer.exporter = True, 1.0, 0, self.exporter
+
+    def tearDown(self):
+        tracer.flush()
+        tracer.enabled, tracer.sample_rate, tracer.slow_ms, tracer.exporter = self.saved
+
+    def exported_spans(self):
+        tracer.flush()
+        return self.exporter.spans()
+
+    def test_charge_sale_phases_cross_executor(self):
+        self.wallet_service.create_charge_sale(self.seller, "09123456789", Decimal("1000"))
+
+        spans = self.exported_spans()
+        by_name = {span["name"]: span for span in spans}
+        root = by_name["wallet.create_charge_sale"]
+        task = by_name["executor.create_charge_sale_atomic"]
+        self.assertNotIn("parentSpanId", root)
+        self.assertEqual(task["parentSpanId"], root["spanId"])
+        self.assertEqual({span["traceId"] for span in spans}, {root["traceId"]})
+        for name in ("user.lookup", "db.insert", "redis.transfer", "db.transaction", "db.update"):
+            self.assertIn(name, by_name)
+        # Phases are exported in start order
+        self.assertEqual(spans, sorted(spans, key=lambda span: int(span["startTimeUnixNano"])))
+
+    def test_credit_approval_phases(self):
+        credit_request = self.wallet_service.create_credit_request(self.seller, Decimal("1000"))
+        self.wallet_service.approve_credit_request_single(credit_request.id, self.admin)
+
+        names = [span["name"] for span in self.exported_spans()]
+        for name in ("wallet.approve_credit_request", "db.get", "lock.local", "lock.redis",
+                     "redis.read_balances", "redis.watch_check", "redis.pipeline_execute", "db.transaction"):
+            self.assertIn(name, names)
+        self.assertEqual(names.count("lock.redis"), 2)
+
+    def test_failure_is_exported_with_error_status(self):
+        tracer.slow_ms = 60_000
+        with self.assertRaises(WalletServiceException):
+            self.wallet_service.create_charge_sale(self.seller, "09123456789", Decimal("1000000"))
+
+        root = next(span for span in self.exported_spans() if span["name"] == "wallet.create_charge_sale")
+        self.assertEqual(root["status"]["code"], 2)
+        self.assertIn("Insufficient", root["status"]["message"])
+
+    def test_fast_traces_below_threshold_are_not_exported(self):
+        tracer.slow_ms = 60_000
+        self.wallet_service.create_charge_sale(self.seller, "09123456789", Decimal("1000"))
+        self.assertEqual(self.exported_spans(), [])
+
+    def test_unsampled_trace_records_nothing(self):
+        tracer.sample_rate = 0
+        self.wallet_service.create_charge_sale(self.seller, "09123456789", Decimal("1000"))
+        self.assertEqual(self.exported_spans(), [])
+
+    def test_file_exporter_writes_otlp_json_lines(self):
+        path = f"/tmp/wallet-traces-{uuid.uuid4()}.jsonl"
+        tracer.exporter = FileSpanExporter(path)
+        self.addCleanup(os.remove, path)
+        self.wallet_service.create_charge_sale(self.seller, "09123456789", Decimal("1000"))
+        tracer.flush()
+        with open(path) as file:
+            lines = file.readlines()
+        self.assertEqual(len(lines), 1)
+        resource_spans = json.loads(lines[0])["resourceSpans"][0]
+        self.assertIn({"key": "service.name", "value": {"stringValue": "wallet"}},
+                      resource_spans["resource"]["attributes"])
+
+
+class SellerSalesRollupTest(WalletRedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.rollup = SellerSalesRollup()
+        self.admin = self.create_admin()
+        self.seller = self.create_user()
+        for user in (self.admin, self.seller):
+            self.fund(user, "10000")
+        self.today = timezone.now().date()
+
+    def sell(self, amount):
+        try:
+            self.wallet_service.create_charge_sale(self.seller, "09123456789", Decimal(amount))
+        except WalletServiceException:
+            pass
+
+    def bucket(self, day=None):
+        return SellerDailySales.objects.get(seller=self.seller, day=day or self.today)
+
+    def test_rebuild_then_refresh_changed_buckets(self):
+        self.sell("1000")
+        self.sell("2000")
+        self.sell("1000000")  # insufficient balance
+        credit_request = self.wallet_service.create_credit_request(self.seller, Decimal("1500"))
+        self.wallet_service.approve_credit_request_single(credit_request.id, self.admin)
+
+        result = self.rollup.run()
+        self.assertTrue(result.full)
+        bucket = self.bucket()
+        self.assertEqual((bucket.sales_count, bucket.gross_amount, bucket.failed_count, bucket.credit_received),
+                         (2, Decimal("3000.00"), 1, Decimal("1500.00")))
+
+        self.sell("1000")
+        result = self.rollup.run()
+        self.assertFalse(result.full)
+        self.assertEqual(result.buckets, 1)
+        self.assertEqual(self.bucket().sales_count, 3)
+        self.assertEqual(self.bucket().gross_amount, Decimal("4000.00"))
+
+    def test_sales_count_on_their_own_day(self):
+        self.sell("1000")
+        self.sell("2000")
+        yesterday = self.today - datetime.timedelta(days=1)
+        ChargeSale.objects.filter(amount=Decimal("2000")).update(created_at=timezone.now() - datetime.timedelta(days=1))
+
+        self.rollup.run(full=True)
+        self.assertEqual(self.bucket().gross_amount, Decimal("1000.00"))
+        self.assertEqual(self.bucket(yesterday).gross_amount, Decimal("2000.00"))
+
+    def test_refresh_skips_untouched_buckets(self):
+        self.sell("1000")
+        self.rollup.run()
+        # Past the overlap, nothing changed
+        self.rollup.overlap = 0
+        self.assertEqual(self.rollup.run().buckets, 0)
+
+    def test_credit_counts_on_its_approval_day(self):
+        credit_request = self.wallet_service.create_credit_request(self.seller, Decimal("1500"))
+        self.wallet_service.approve_credit_request_single(credit_request.id, self.admin)
+        yesterday = self.today - datetime.timedelta(days=1)
+        CreditRequest.objects.filter(id=credit_request.id).update(approved_at=timezone.now() - datetime.timedelta(days=1))
+        self.rollup.run()
+
+        # A later save must not move the credit to the day it happened
+        credit_request.refresh_from_db()
+        credit_request.save()
+        self.rollup.run()
+        self.assertEqual(self.bucket(yesterday).credit_received, Decimal("1500.00"))
+        self.assertFalse(SellerDailySales.objects.filter(seller=self.seller, day=self.today,
+                                                         credit_received__gt=0).exists())
+
+    def test_every_approval_path_stamps_approved_at(self):
+        single, bulk = (self.wallet_service.create_credit_request(self.seller, Decimal("1000")) for _ in range(2))
+        own = self.wallet_service.create_credit_request(self.admin, Decimal("1000"))
+        self.wallet_service.approve_credit_request_single(single.id, self.admin)
+        self.wallet_service.approve_credit_requests_bulk([bulk.id], self.admin)
+        self.wallet_service.approve_credit_request_single(own.id, self.admin)
+        rejected = self.wallet_service.create_credit_request(self.seller, Decimal("1000"))
+        self.wallet_service.reject_credit_request(rejected.id, self.admin)
+
+        approved = CreditRequest.objects.filter(status=CreditRequestStatusEnums.ACCEPTED)
+        self.assertEqual(approved.count(), 3)
+        self.assertFalse(approved.filter(approved_at__isnull=True).exists())
+        self.assertIsNone(CreditRequest.objects.get(id=rejected.id).approved_at)
+
+    async def test_async_approval_stamps_approved_at(self):
+        service = AsyncWalletService()
+        credit_request = await service.create_credit_request(self.seller, Decimal("1000"))
+        await service.approve_credit_request_single(credit_request.id, self.admin)
+        await credit_request.arefresh_from_db()
+        self.assertIsNotNone(credit_request.approved_at)
+
+    def test_reports_read_only_the_rollup(self):
+        self.sell("1000")
+        self.rollup.run()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("seller sales report"), {"phone_number": self.seller.phone_number})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"], [{
+            "day": self.today.isoformat(), "sales_count": 1, "gross_amount": "1000.00",
+            "failed_count": 0, "credit_received": "0.00",
+        }])
+        self.assertIsNotNone(response.json()["as_of"])
+        self.assertFalse(any("wallet_chargesale" in query["sql"] for query in queries.captured_queries))
+
+        response = self.client.get(reverse("sales report"), {"phone_number": self.admin.phone_number})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["active_sellers"], 1)
+        self.assertEqual(response.json()["results"][0]["gross_amount"], "1000.00")
+
+        response = self.client.get(reverse("sales report"), {"phone_number": self.seller.phone_number})
+        self.assertEqual(response.status_code, 403)
+
+    def test_report_range_is_validated(self):
+        response = self.client.get(reverse("seller sales report"), {
+            "phone_number": self.seller.phone_number, "start": "2026-02-01", "end": "2026-01-01",
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+class FairRedisLockTest(SimpleTestCase):
+    def setUp(self):
+        wallet_redis_client.flushall()
+        self.key = "lock:wallet:test"
+
+    def lock(self, lock_timeout=60, recovery_interval=5.0):
+        return FairRedisLock(wallet_redis_client, self.key, lock_timeout, recovery_interval=recovery_interval)
+
+    def test_waiters_are_served_in_arrival_order(self):
+        holder = self.lock()
+        self.assertTrue(holder.acquire())
+        order = []
+
+        def wait(name):
+            lock = self.lock()
+            self.assertTrue(lock.acquire(timeout=10))
+            order.append(name)
+            lock.release()
+
+        threads = []
+        for name in ("first", "second", "third"):
+            thread = threading.Thread(target=wait, args=(name,))
+            thread.start()
+            threads.append(thread)
+            # Let it block in BLMOVE before the next one arrives
+            time.sleep(0.2)
+        holder.release()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, ["first", "second", "third"])
+
+    def test_acquire_gives_up_after_timeout(self):
+        holder = self.lock()
+        self.assertTrue(holder.acquire())
+        started = time.monotonic()
+        self.assertFalse(self.lock().acquire(timeout=0.3))
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+        self.assertFalse(self.lock().acquire())
+
+    def test_expired_hold_is_taken_over(self):
+        holder = self.lock(lock_timeout=1)
+        self.assertTrue(holder.acquire())
+        # The holder never releases
+        waiter = self.lock(lock_timeout=1, recovery_interval=0.1)
+        started = time.monotonic()
+        self.assertTrue(waiter.acquire(timeout=3))
+        self.assertGreaterEqual(time.monotonic() - started, 0.9)
+
+    def test_waiter_dying_before_claiming_the_token_is_recovered(self):
+        holder = self.lock(lock_timeout=1)
+        self.assertTrue(holder.acquire())
+        holder.release()
+        # A waiter moved the free token out and crashed before stamping it as its own
+        wallet_redis_client.blmove(f"{self.key}:queue", f"{self.key}:held", 1, "LEFT", "RIGHT")
+        self.assertFalse(self.lock(lock_timeout=1).acquire())
+        self.assertTrue(self.lock(lock_timeout=1, recovery_interval=0.1).acquire(timeout=3))
+
+    def test_release_after_expiry_keeps_the_new_owners_hold(self):
+        stale = self.lock(lock_timeout=1)
+        self.assertTrue(stale.acquire())
+        time.sleep(1.1)
+        owner = self.lock(lock_timeout=60)
+        self.assertTrue(owner.acquire())
+
+        stale.release()
+        self.assertEqual(wallet_redis_client.lrange(f"{self.key}:held", 0, -1), [owner.token])
+        self.assertFalse(self.lock().acquire())
+        owner.release()
+        self.assertTrue(self.lock().acquire())
+
+
+class StripedLockTest(SimpleTestCase):
+    # Small ints hash to themselves, so key % 4 is the stripe
+    def setUp(self):
+        self.locks = StripedLock(stripes=4)
+
+    def test_stripes_are_sorted_and_deduplicated(self):
+        self.assertEqual(self.locks.stripes_for([6, 1, 5, 3]), [1, 2, 3])
+        # 1 and 5 share a stripe: locking both takes it once instead of waiting on itself
+        self.assertEqual(self.locks.acquire([5, 1], timeout=1), [1])
+        self.locks.release([1])
+
+    def test_timeout_releases_stripes_already_taken(self):
+        held = self.locks.acquire([2])
+        self.assertIsNone(self.locks.acquire([1, 2, 3], timeout=0.05))
+        # Stripe 1 was taken before the wait on stripe 2 timed out, and must be free again
+        self.assertEqual(self.locks.acquire([1], timeout=0), [1])
+        self.locks.release([1])
+        self.locks.release(held)
+        self.assertEqual(self.locks.acquire([1, 2, 3], timeout=0), [1, 2, 3])
+
+    def test_opposite_key_orders_do_not_deadlock(self):
+        def lock_repeatedly(keys):
+            for _ in range(2000):
+                stripes = self.locks.acquire(keys)
+                self.locks.release(stripes)
+
+        threads = [threading.Thread(target=lock_repeatedly, args=(keys,), daemon=True) for keys in ([1, 2], [2, 1])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+
+
+class GroupCommitChargeSaleTest(WalletRedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.wallet_service.combiner = ChargeSaleCombiner(self.wallet_service.atomic_service, window=0.05, max_batch=10)
+        self.user = self.create_user()
+        self.fund(self.user, "100000")
+
+    def tearDown(self):
+        cursor = connection.cursor()
+        cursor.execute("SELECT pg_terminate_backend(pg_stat_activity.pid) FROM pg_stat_activity WHERE pg_stat_activity.datname = 'test_django_db' AND pid <> pg_backend_pid();")
+        return super().tearDown()
+
+    def test_concurrent_sales_are_group_committed(self):
+        amount = Decimal("4000")
+        num_threads = 30
+        batches = []
+        apply_batch = self.wallet_service.atomic_service.create_charge_sales_batch_atomic
+
+        def counting_apply_batch(user, items):
+            batches.append(len(items))
+            return apply_batch(user, items)
+
+        self.wallet_service.atomic_service.create_charge_sales_batch_atomic = counting_apply_batch
+
+        def worker(index):
+            try:
+                return self.wallet_service.create_charge_sale(self.user, f"0912000{index % 3:04d}", amount)
+            except WalletServiceException as e:
+                return e
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            results = list(executor.map(worker, range(num_threads)))
+
+        completed = [result for result in results if isinstance(result, ChargeSale)]
+        self.assertEqual(len(completed), 25, "Only the sales the balance covers may complete")
+        self.assertEqual(ChargeSale.objects.filter(status=ChargeSaleTypeEnums.COMPLETED).count(), 25)
+        self.assertEqual(sum(batches), num_threads)
+        self.assertLess(len(batches), num_threads, "Concurrent sales must share batches")
+        seller_wallet = Wallet.objects.get(user=self.user)
+        self.assertEqual(seller_wallet.balance, Decimal("0"))
+        self.assertEqual(from_minor(self.redis_client.hget(f"wallet:user:{self.user.id}", BALANCE_FIELD)), Decimal("0"))
+
+    def test_group_committed_sales_honor_write_behind(self):
+        self.wallet_service.atomic_service.write_behind = True
+        amount = Decimal("4000")
+        num_threads = 30
+
+        def worker(index):
+            try:
+                return self.wallet_service.create_charge_sale(self.user, f"0912000{index % 3:04d}", amount)
+            except WalletServiceException as e:
+                return e
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            results = list(executor.map(worker, range(num_threads)))
+
+        completed = [result for result in results if isinstance(result, ChargeSale)]
+        self.assertEqual(len(completed), 25, "Only the sales the balance covers may complete")
+        self.assertEqual(ChargeSale.objects.filter(status=ChargeSaleTypeEnums.COMPLETED).count(), 0,
+                         "Committed sales are left to the event consumer")
+        self.assertEqual(ChargeSale.objects.filter(status=ChargeSaleTypeEnums.FAILED).count(), 5)
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal("100000"))
+
+        consumer = WalletEventConsumer("test-consumer", block_ms=10)
+        consumer.ensure_group()
+        messages = self.redis_client.xrange(consumer.stream)
+        self.assertEqual(len(messages), 25)
+        self.assertEqual(consumer.flush(messages), 25)
+
+        self.assertEqual(
+            set(ChargeSale.objects.filter(status=ChargeSaleTypeEnums.COMPLETED).values_list("id", flat=True)),
+            {charge_sale.id for charge_sale in completed},
+        )
+        for wallet in Wallet.objects.all():
+            redis_balance = from_minor(self.redis_client.hget(f"wallet:user:{wallet.user_id}", BALANCE_FIELD))
+            self.assertEqual(wallet.balance, redis_balance, f"Redis and DB balances must match for {wallet.user_id}")
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal("0"))
+
+
+class MinorUnitBalanceTest(WalletRedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+        # Redis is filled in the legacy format by each test
+        self.fund(self.user, "5000.50", cache=False)
+
+    def test_legacy_balance_is_upgraded_on_first_write(self):
+        key = f"wallet:user:{self.user.id}"
+        self.redis_client.delete(key)
+        self.redis_client.hset(key, "balance", "5000.50")
+        self.assertEqual(self.wallet_service.get_wallet_balance(self.user), Decimal("5000.50"))
+
+        self.wallet_service.create_charge_sale(self.user, "09123456789", Decimal("1000.25"))
+
+        self.assertEqual(self.redis_client.hget(key, BALANCE_FIELD), "400025")
+        self.assertFalse(self.redis_client.hexists(key, "balance"))
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal("4000.25"))
+
+    def test_migrate_command_converts_balances_and_ledgers(self):
+        key = f"wallet:user:{self.user.id}"
+        ledger_key = f"transactions:user:{self.user.id}"
+        self.redis_client.delete(key)
+        self.redis_client.hset(key, "balance", "5000.50")
+        self.redis_client.rpush(ledger_key, json.dumps({
+            "id": "legacy", "amount": "-1000.25", "balance_before": "6000.75", "balance_after": "5000.50",
+            "reference_id": "ref", "description": "legacy entry", "timestamp": 1700000000,
+        }))
+
+        call_command("migrate_wallet_balances", ledgers=True, stdout=io.StringIO())
+
+        self.assertEqual(self.redis_client.hgetall(key), {BALANCE_FIELD: "500050"})
+        entry = json.loads(self.redis_client.lindex(ledger_key, 0))
+        self.assertEqual(
+            (entry["amount_minor"], entry["balance_before_minor"], entry["balance_after_minor"]),
+            ("-100025", "600075", "500050"),
+        )
+        self.assertNotIn("amount", entry)
+
+
+class WalletStatusCacheTest(WalletRedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user()
+        self.fund(self.user, "10000")
+
+    def test_warm_charge_sale_reads_no_wallet_rows(self):
+        self.wallet_service.create_charge_sale(self.user, "09123456789", Decimal("1000"))
+        with CaptureQueriesContext(connection) as queries:
+            self.wallet_service.create_charge_sale(self.user, "09123456789", Decimal("1000"))
+        wallet_reads = [
+            query["sql"] for query in queries.captured_queries
+            if query["sql"].startswith("SELECT") and Wallet._meta.db_table in query["sql"]
+        ]
+        self.assertEqual(wallet_reads, [])
+
+    def test_status_change_is_written_through(self):
+        wallet = Wallet.objects.get(user=self.user)
+        wallet.status = WalletStatusEnums.SUSPEND
+        wallet.save(update_fields=["status"])
+        self.assertEqual(self.redis_client.hget(f"wallet:user:{self.user.id}", "status"), str(WalletStatusEnums.SUSPEND.value))
+
+        with self.assertRaises(WalletServiceException):
+            self.wallet_service.create_charge_sale(self.user, "09123456789", Decimal("1000"))
+        self.assertEqual(self.wallet_service.get_wallet_balance(self.user), Decimal("10000"))
+
+
+class RedisPoolStatsTest(SimpleTestCase):
+    @override_settings(REDIS_MAX_CONNECTIONS=1, REDIS_POOL_TIMEOUT=0.05)
+    def test_pool_exhaustion_is_reported(self):
+        client = create_redis_client("pool-stats-test")
+        pool = client.connection_pool
+        held = pool.get_connection()
+        try:
+            with self.assertRaises(redis.ConnectionError):
+                client.ping()
+        finally:
+            pool.release(held)
+        self.assertTrue(client.ping())
+
+        stats = pool_stats()["pool-stats-test"]
+        self.assertEqual(stats["max_connections"], 1)
+        self.assertEqual(stats["peak_in_use"], 1)
+        self.assertEqual(stats["exhausted"], 1)
+        self.assertEqual(stats["in_use"], 0)
+        pool.disconnect()
+
+
+class AsyncWalletApiTest(WalletRedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = self.create_user("09125129188")
+        self.admin = self.create_admin()
+        self.fund(self.seller, "10000")
+        self.fund(self.admin, "100000")
+
+    async def test_concurrent_async_charge_sales(self):
+        payload = {"seller_phone_number": "09125129188", "receiver_phone_number": "09123456789", "amount": "6000.00"}
+        responses = await asyncio.gather(*[
+            self.async_client.post(reverse("async charge sale"), payload, content_type="application/json")
+            for _ in range(2)
+        ])
+
+        self.assertEqual(sorted(response.status_code for response in responses), [201, 400])
+        seller_wallet = await Wallet.objects.aget(user=self.seller)
+        self.assertEqual(seller_wallet.balance, Decimal("4000"))
+        self.assertEqual(from_minor(await sync_to_async(self.redis_client.hget)(
+            f"wallet:user:{self.seller.id}", BALANCE_FIELD
+        )), Decimal("4000"))
+        self.assertEqual(await ChargeSale.objects.filter(status=ChargeSaleTypeEnums.COMPLETED).acount(), 1)
+
+    async def test_async_credit_request_is_approved_once(self):
+        response = await self.async_client.post(
+            reverse("async credit_request"),
+            {"seller_phone_number": "09125129188", "amount": "5000.00"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        approval = {"phone_number": "09332823692", "credit_id": response.json()["code"],
+                    "status": CreditRequestStatusEnums.ACCEPTED.value}
+        responses = await asyncio.gather(*[
+            self.async_client.post(reverse("async process credit request"), approval, content_type="application/json")
+            for _ in range(3)
+        ])
+
+        self.assertEqual(sorted(response.status_code for response in responses), [202, 400, 400])
+        self.assertEqual((await Wallet.objects.aget(user=self.seller)).balance, Decimal("15000"))
+        self.assertEqual((await Wallet.objects.aget(user=self.admin)).balance, Decimal("95000"))
+        self.assertEqual(from_minor(await sync_to_async(self.redis_client.hget)(
+            f"wallet:user:{self.admin.id}", BALANCE_FIELD
+        )), Decimal("95000"))
+        self.assertEqual(await Transaction.objects.acount(), 2)
+
+    async def test_failed_async_approval_marks_request_failed(self):
+        service = AsyncWalletService()
+        credit_request = await service.create_credit_request(self.seller, Decimal("200000"))
+
+        with self.assertRaises(WalletServiceException):
+            await service.approve_credit_request_single(credit_request.id, self.admin)
+
+        await credit_request.arefresh_from_db()
+        self.assertEqual(credit_request.status, CreditRequestStatusEnums.FAILED)
+        self.assertEqual((await Wallet.objects.aget(user=self.admin)).balance, Decimal("100000"))
+        self.assertEqual(await Transaction.objects.acount(), 0)
+        self.assertEqual(await sync_to_async(self.wallet_service.get_pending_credit_request_totals)(), {"count": 0, "amount": Decimal("0.00")})
+
+
+@override_settings(WALLET_ASYNC_SUBMISSION=True)
+class AsyncSubmissionChargeSaleTest(WalletRedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user("09125129188")
+        self.fund(self.user, "10000")
+
+    def test_queued_sales_are_processed_once(self):
+        payload = {"seller_phone_number": "09125129188", "receiver_phone_number": "09123456789", "amount": "6000.00"}
+        codes = []
+        for _ in range(2):
+            response = self.client.post(reverse("charge sale"), payload, content_type="application/json")
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.json()["status"], ChargeSaleTypeEnums.PENDING)
+            codes.append(response.json()["code"])
+        for code in codes:
+            response = self.client.get(reverse("charge sale status", args=[code]))
+            self.assertEqual(response.json()["status"], ChargeSaleTypeEnums.PENDING)
+
+        worker = ChargeSaleWorker(self.wallet_service.atomic_service, self.wallet_service.charge_sale_queue,
+                                  name="test-worker", threads=2, block_timeout=0.1)
+        worker.run(once=True)
+        # A redelivered job must not charge the seller twice
+        self.redis_client.lpush(self.wallet_service.charge_sale_queue.queue_key, codes[0])
+        worker.run(once=True)
+
+        statuses = [self.client.get(reverse("charge sale status", args=[code])).json() for code in codes]
+        self.assertEqual(
+            sorted(status["status"] for status in statuses),
+            [ChargeSaleTypeEnums.COMPLETED, ChargeSaleTypeEnums.FAILED],
+        )
+        failed = next(status for status in statuses if status["status"] == ChargeSaleTypeEnums.FAILED)
+        self.assertEqual(failed["error"], "Insufficient balance in seller wallet")
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal("4000"))
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    def abandoned_sale(self, transferred: bool) -> ChargeSale:
+        """A queued sale whose worker claimed it 15 minutes ago and died, before or after the transfer."""
+        atomic_service = self.wallet_service.atomic_service
+        charge_sale = self.wallet_service.charge_sale_queue.enqueue(self.user, "09123456789", Decimal("6000"))
+        # Taken off the queue by the dead worker
+        self.redis_client.delete(self.wallet_service.charge_sale_queue.queue_key)
+        ChargeSale.objects.filter(id=charge_sale.id).update(updated_at=timezone.now() - datetime.timedelta(minutes=20))
+        self.redis_client.set(atomic_service.charge_sale_claim_key(charge_sale.id), time.time() - 900)
+        if transferred:
+            receiver = UserService.get_or_create_receiver("09123456789")
+            atomic_service.transfer(self.user.id, receiver.id, charge_sale.amount, reference_id=str(charge_sale.id),
+                                    seller_description="Charge sale", target_description="Charge sale")
+        return charge_sale
+
+    def worker(self):
+        return ChargeSaleWorker(self.wallet_service.atomic_service, self.wallet_service.charge_sale_queue,
+                                name="test-worker", threads=1, block_timeout=0.1, claim_timeout=600)
+
+    def test_sale_abandoned_before_transfer_is_requeued(self):
+        charge_sale = self.abandoned_sale(transferred=False)
+        worker = self.worker()
+        # The claim blocks every redelivery until it is released
+        worker.process(charge_sale.id)
+        self.assertEqual(ChargeSale.objects.get(id=charge_sale.id).status, ChargeSaleTypeEnums.PENDING)
+
+        self.assertEqual(worker.reap(), (1, 0))
+        self.assertEqual(worker.reap(), (0, 0))
+        worker.run(once=True)
+
+        self.assertEqual(ChargeSale.objects.get(id=charge_sale.id).status, ChargeSaleTypeEnums.COMPLETED)
+        self.assertEqual(self.wallet_service.get_wallet_balance(self.user), Decimal("4000"))
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal("4000"))
+
+    def test_sale_abandoned_after_transfer_is_reversed(self):
+        charge_sale = self.abandoned_sale(transferred=True)
+        self.assertEqual(self.wallet_service.get_wallet_balance(self.user), Decimal("4000"))
+
+        self.assertEqual(self.worker().reap(), (0, 1))
+
+        self.assertEqual(ChargeSale.objects.get(id=charge_sale.id).status, ChargeSaleTypeEnums.FAILED)
+        self.assertEqual(self.wallet_service.charge_sale_queue.get_status(charge_sale.id)["status"], ChargeSaleTypeEnums.FAILED)
+        self.assertEqual(self.wallet_service.get_wallet_balance(self.user), Decimal("10000"))
+        self.assertEqual(self.redis_client.lrange(f"transactions:user:{self.user.id}", 0, -1), [])
+        self.assertEqual(Transaction.objects.count(), 0)
+
+    def test_recent_claims_are_left_alone(self):
+        charge_sale = self.abandoned_sale(transferred=False)
+        self.redis_client.set(self.wallet_service.atomic_service.charge_sale_claim_key(charge_sale.id), time.time())
+        self.assertEqual(self.worker().reap(), (0, 0))
+        self.assertEqual(ChargeSale.objects.get(id=charge_sale.id).status, ChargeSaleTypeEnums.PENDING)